@@ -0,0 +1,207 @@
+"""
+Benchmarks for the temporenc module.
+
+This measures the throughput (operations per second) and the memory
+usage (peak bytes allocated per operation, including the results) of
+the most important code paths, for all types and precisions.
+
+Run this using ``make bench``, or directly::
+
+    python benchmarks/bench_temporenc.py --help
+
+Use ``--json`` to write machine readable results, e.g. to compare the
+performance of different versions.
+"""
+
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import temporenc
+
+import data
+
+
+def cases(n, seed):
+    """
+    Generate all benchmark cases.
+
+    Each case is a (name, type, precision, func) tuple. Calling `func`
+    performs `n` operations and returns a list with the results.
+    """
+
+    for type in data.TYPES:
+        precisions = data.PRECISIONS if type in ('DTS', 'DTSZ') else [None]
+        for precision in precisions:
+            kwargs, encoded = data.generate(n, type, precision, seed=seed)
+            stream = b''.join(encoded)
+            moments = [temporenc.unpackb(value) for value in encoded]
+
+            # Only complete values can be converted and compared.
+            _, complete_encoded = data.generate(
+                n, type, precision, seed=seed, partial=0)
+            complete = [temporenc.unpackb(v) for v in complete_encoded]
+
+            def packb(kwargs=kwargs):
+                return [temporenc.packb(**kw) for kw in kwargs]
+
+            def unpackb(encoded=encoded):
+                return [temporenc.unpackb(value) for value in encoded]
+
+            def unpackb_trusted(encoded=encoded):
+                return [temporenc.unpackb(value, validate=False)
+                        for value in encoded]
+
+            def pack(kwargs=kwargs):
+                fp = io.BytesIO()
+                return [temporenc.pack(fp, **kw) for kw in kwargs]
+
+            def unpack(stream=stream):
+                fp = io.BytesIO(stream)
+                return [temporenc.unpack(fp) for _ in range(n)]
+
+            def iter_unpack(stream=stream):
+                return list(temporenc.iter_unpack(io.BytesIO(stream)))
+
+            def to_str(moments=moments):
+                return [str(moment) for moment in moments]
+
+            def to_hash(moments=moments):
+                return [hash(moment) for moment in moments]
+
+            def compare(moments=complete):
+                return [a < b for a, b in zip(moments, moments[1:])]
+
+            yield 'packb', type, precision, packb
+            yield 'unpackb', type, precision, unpackb
+            yield 'unpackb(trusted)', type, precision, unpackb_trusted
+            yield 'pack', type, precision, pack
+            yield 'unpack', type, precision, unpack
+            yield 'iter_unpack', type, precision, iter_unpack
+            yield 'str', type, precision, to_str
+            yield 'hash', type, precision, to_hash
+            yield 'compare', type, precision, compare
+
+            if type != 'T':
+                def to_date(moments=complete):
+                    return [moment.date() for moment in moments]
+
+                yield 'Moment.date', type, precision, to_date
+
+            if type != 'D':
+                def to_time(moments=complete):
+                    return [moment.time() for moment in moments]
+
+                yield 'Moment.time', type, precision, to_time
+
+            if type not in ('D', 'T'):
+                def to_datetime(moments=complete):
+                    return [moment.datetime() for moment in moments]
+
+                yield 'Moment.datetime', type, precision, to_datetime
+
+    # Packing instances of the datetime classes
+    naive = data.datetimes(n, seed=seed)
+    aware = data.datetimes(n, seed=seed, aware=True)
+    for type in data.TYPES:
+        values = aware if type in ('DTZ', 'DTSZ') else naive
+
+        def packb_datetime(values=values, type=type):
+            return [temporenc.packb(value, type=type) for value in values]
+
+        def writer(values=values, type=type):
+            fp = io.BytesIO()
+            with temporenc.TemporencWriter(fp, type=type) as writer:
+                writer.write_many(values)
+            return fp
+
+        yield 'packb(datetime)', type, None, packb_datetime
+        yield 'TemporencWriter', type, None, writer
+
+
+def measure(func, n, repeat):
+    """
+    Measure a benchmark case.
+
+    This returns the number of operations per second (using the fastest
+    of `repeat` runs), and the peak number of bytes allocated per
+    operation.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+
+    return n / min(timings), peak / n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--size', type=int, default=10000,
+        help="number of operations per run (default: %(default)s)")
+    parser.add_argument(
+        '--repeat', type=int, default=5,
+        help="number of runs per benchmark (default: %(default)s)")
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help="seed for the data generator (default: %(default)s)")
+    parser.add_argument(
+        '--filter', default=None,
+        help="only run benchmarks whose name contains this string")
+    parser.add_argument(
+        '--json', metavar='PATH', default=None,
+        help="write results as JSON to this file ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    results = []
+    out = sys.stderr if args.json == '-' else sys.stdout
+    print("{0:<20} {1:<5} {2:<5} {3:>14} {4:>10}".format(
+        "benchmark", "type", "prec", "ops/sec", "bytes/op"), file=out)
+
+    for name, type, precision, func in cases(args.size, args.seed):
+        if args.filter and args.filter not in name:
+            continue
+        ops, bytes_per_op = measure(func, args.size, args.repeat)
+        results.append({
+            'name': name,
+            'type': type,
+            'precision': precision,
+            'ops_per_sec': ops,
+            'bytes_per_op': bytes_per_op,
+        })
+        print("{0:<20} {1:<5} {2:<5} {3:>14,.0f} {4:>10,.1f}".format(
+            name, type, precision or '-', ops, bytes_per_op), file=out)
+
+    if args.json:
+        report = {
+            'temporenc': temporenc.__version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'size': args.size,
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'results': results,
+        }
+        if args.json == '-':
+            json.dump(report, sys.stdout, indent=2)
+        else:
+            with open(args.json, 'w') as fp:
+                json.dump(report, fp, indent=2)
+
+
+if __name__ == '__main__':
+    main()
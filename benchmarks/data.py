@@ -0,0 +1,109 @@
+"""
+Synthetic data generator for the benchmarks.
+
+The generated data mimics real world usage: most timestamps are recent
+and close together, some values only contain partial date and time
+information, and time zone aware values use a mix of common offsets.
+All data is generated from a seeded random number generator, so runs
+are reproducible.
+"""
+
+import datetime
+import random
+
+import temporenc
+from temporenc.temporenc import FixedOffset
+
+# Fixed reference point instead of 'now', for reproducibility.
+REFERENCE = datetime.datetime(2020, 6, 1, 12, 0, 0)
+
+# Common time zone offsets (in minutes), most frequent first.
+OFFSETS = [0, 60, 120, -300, -240, -420, 330, 480, 540, -180, 345, 600]
+
+TYPES = ['D', 'T', 'DT', 'DTZ', 'DTS', 'DTSZ']
+PRECISIONS = ['ms', 'us', 'ns', None]
+
+SUBSECOND_NAMES = {
+    'ms': 'millisecond',
+    'us': 'microsecond',
+    'ns': 'nanosecond',
+}
+
+
+def recent_datetime(rng):
+    """
+    Generate a recent timestamp.
+
+    Timestamps are dense close to the reference point and become sparse
+    further back, with a mean age of one day.
+    """
+    age = rng.expovariate(1.0 / 86400)
+    return REFERENCE - datetime.timedelta(
+        seconds=age, microseconds=rng.randrange(1000000))
+
+
+def offset(rng):
+    """
+    Generate a time zone offset, preferring the most common ones.
+    """
+    index = min(int(rng.expovariate(0.5)), len(OFFSETS) - 1)
+    return OFFSETS[index]
+
+
+def fields(rng, type, precision, partial=0.1):
+    """
+    Generate keyword arguments for packb().
+
+    A fraction of the values (`partial`) has some of its components
+    missing.
+    """
+    dt = recent_datetime(rng)
+    kwargs = {
+        'type': type,
+        'year': dt.year, 'month': dt.month, 'day': dt.day,
+        'hour': dt.hour, 'minute': dt.minute, 'second': dt.second,
+    }
+
+    if type in ('DTS', 'DTSZ') and precision is not None:
+        subsecond = dt.microsecond * 1000 + rng.randrange(1000)
+        kwargs[SUBSECOND_NAMES[precision]] = {
+            'ms': subsecond // 1000000,
+            'us': subsecond // 1000,
+            'ns': subsecond,
+        }[precision]
+
+    if type in ('DTZ', 'DTSZ'):
+        kwargs['tz_offset'] = offset(rng)
+
+    if rng.random() < partial:
+        for name in rng.sample(['year', 'month', 'day', 'hour', 'minute',
+                                'second'], rng.randrange(1, 4)):
+            del kwargs[name]
+
+    return kwargs
+
+
+def generate(n, type, precision, seed=0, partial=0.1):
+    """
+    Generate `n` values for the specified type and precision.
+
+    This returns a list of keyword arguments for packb(), and a list of
+    the corresponding encoded values.
+    """
+    rng = random.Random('{0}-{1}-{2}'.format(seed, type, precision))
+    kwargs = [fields(rng, type, precision, partial) for _ in range(n)]
+    encoded = [temporenc.packb(**kw) for kw in kwargs]
+    return kwargs, encoded
+
+
+def datetimes(n, seed=0, aware=False):
+    """
+    Generate `n` recent ``datetime.datetime`` instances.
+    """
+    rng = random.Random('{0}-datetimes-{1}'.format(seed, aware))
+    values = [recent_datetime(rng) for _ in range(n)]
+    if aware:
+        values = [
+            value.replace(tzinfo=FixedOffset(offset(rng)))
+            for value in values]
+    return values
@@ -16,6 +16,9 @@ setup(
     author_email="uws@xs4all.nl",
     url='https://github.com/wbolster/temporenc-python',
     packages=['temporenc'],
+    extras_require={
+        'numpy': ['numpy'],
+    },
     license='BSD',
     classifiers=[
         'Development Status :: 4 - Beta',
@@ -5,12 +5,63 @@ Temporenc, a comprehensive binary encoding format for dates and times
 __version__ = '0.1.0'
 __version_info__ = tuple(map(int, __version__.split('.')))
 
+import sys
+
 
 # Export public API
 from .temporenc import (  # noqa
     pack,
     packb,
+    TemporencWriter,
+    make_packer,
+    packb_epoch,
+    transcode,
+    transcode_buffer,
     unpack,
     unpackb,
+    unpackb_datetime,
+    unpackb_date,
+    unpackb_time,
+    unpackb_epoch,
+    unpack_from,
+    iter_unpack,
+    sort_key,
+    compare_encoded,
+    sorted_encoded,
+    ordering_key,
+    from_ordering_key,
     Moment,
+    Cache,
+)
+from .columns import (  # noqa
+    write_column,
+    ColumnWriter,
+    TemporencColumn,
+)
+from .blocks import (  # noqa
+    write_blocks,
+    BlockWriter,
+    BlockReader,
+)
+from .arrays import (  # noqa
+    MomentArray,
 )
+from . import stats  # noqa
+
+if sys.version_info >= (3, 5):
+    from .aio import (  # noqa
+        pack_async,
+        pack_many_async,
+        unpack_async,
+        iter_unpack_async,
+    )
+
+
+def __getattr__(name):
+    # Import the parallel module lazily, since it pulls in the
+    # multiprocessing machinery and requires Python 3.8+.
+    if name == 'unpack_parallel':
+        from .parallel import unpack_parallel
+        return unpack_parallel
+    raise AttributeError(
+        "module {0!r} has no attribute {1!r}".format(__name__, name))
@@ -0,0 +1,171 @@
+"""
+Support for ``asyncio`` streams.
+
+This module requires Python 3.5 or newer. Its functions are also
+available from the top-level ``temporenc`` package.
+"""
+
+import asyncio
+
+from .temporenc import (
+    DEFAULT_BUFFER_SIZE,
+    tag_table,
+    _moment,
+    _read_1,
+    packb,
+)
+
+
+async def pack_async(writer, *args, **kwargs):
+    """
+    Pack date and time information and write it to an asyncio stream.
+
+    This is the asynchronous counterpart of :py:func:`pack()`. All
+    arguments except `writer` are passed on to :py:func:`packb()`. This
+    waits until the write buffer of the `writer` is drained.
+
+    :param asyncio.StreamWriter writer: stream writer
+    :param args: propagated to :py:func:`packb()`
+    :param kwargs: propagated to :py:func:`packb()`
+    :return: number of bytes written
+    :rtype: int
+    """
+    value = packb(*args, **kwargs)
+    writer.write(value)
+    await writer.drain()
+    return len(value)
+
+
+async def pack_many_async(writer, values, type=None,
+                          buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Pack many values and write them to an asyncio stream.
+
+    Each item from the `values` iterable is packed using
+    ``packb(value, type=type)``. Packed values are collected until
+    there are `buffer_size` bytes, which are then written to the
+    `writer` at once, followed by waiting until its write buffer is
+    drained. This is much more efficient than writing each value
+    separately.
+
+    :param asyncio.StreamWriter writer: stream writer
+    :param iterable values: values to pack
+    :param str type: *temporenc* type
+    :param int buffer_size: number of bytes to write at once
+    :return: number of bytes written
+    :rtype: int
+    """
+    if buffer_size < 1:
+        raise ValueError("buffer_size must be positive")
+    buf = bytearray()
+    total = 0
+    for value in values:
+        buf += packb(value, type=type)
+        if len(buf) >= buffer_size:
+            writer.write(bytes(buf))
+            total += len(buf)
+            del buf[:]
+            await writer.drain()
+
+    if buf:
+        writer.write(bytes(buf))
+        total += len(buf)
+        await writer.drain()
+
+    return total
+
+
+async def unpack_async(reader):
+    """
+    Unpack a *temporenc* value from an asyncio stream.
+
+    This is the asynchronous counterpart of :py:func:`unpack()`. It
+    consumes exactly the number of bytes required to unpack a single
+    *temporenc* value.
+
+    If no valid value could be read, this raises :py:exc:`ValueError`.
+
+    :param asyncio.StreamReader reader: stream reader
+    :return: a parsed *temporenc* structure
+    :rtype: :py:class:`Moment`
+    """
+    try:
+        first = await reader.readexactly(1)
+    except asyncio.IncompleteReadError:
+        raise ValueError("unexpected end of stream")
+
+    _, _, size, decode, _ = tag_table[first[0]]
+    if size is None:
+        raise ValueError("first byte does not contain a valid tag")
+
+    try:
+        value = first + await reader.readexactly(size - 1)
+    except asyncio.IncompleteReadError:
+        raise ValueError("unexpected end of stream")
+
+    return _moment(decode(value, 0))
+
+
+class _AsyncUnpacker(object):
+    """
+    Asynchronous iterator returned by :py:func:`iter_unpack_async()`.
+    """
+
+    def __init__(self, reader, buffer_size):
+        # Reading zero bytes would look like the end of the stream.
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be positive")
+        self._reader = reader
+        self._buffer_size = buffer_size
+        self._buf = b''
+        self._pos = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        buf = self._buf
+        pos = self._pos
+
+        while True:
+            if pos < len(buf):
+                _, _, size, decode, _ = tag_table[_read_1(buf, pos)]
+                if size is None:
+                    raise ValueError(
+                        "first byte does not contain a valid tag")
+
+                if pos + size <= len(buf):
+                    self._pos = pos + size
+                    return _moment(decode(buf, pos))
+
+            chunk = await self._reader.read(self._buffer_size)
+            if not chunk:
+                if pos < len(buf):
+                    raise ValueError("unexpected end of stream")
+                raise StopAsyncIteration
+
+            # Keep any trailing partial value from the previous chunk.
+            self._buf = buf = buf[pos:] + chunk if pos < len(buf) else chunk
+            self._pos = pos = 0
+
+
+def iter_unpack_async(reader, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Unpack all *temporenc* values from an asyncio stream.
+
+    This is the asynchronous counterpart of :py:func:`iter_unpack()`.
+    It returns an asynchronous iterator, which reads data from `reader`
+    in chunks of up to `buffer_size` bytes, and yields each value
+    contained in it, until the end of the stream is reached::
+
+        async for moment in temporenc.iter_unpack_async(reader):
+            print(moment)
+
+    If no valid value could be read, or if the stream ends with an
+    incomplete value, this raises :py:exc:`ValueError`.
+
+    :param asyncio.StreamReader reader: stream reader
+    :param int buffer_size: maximum number of bytes to read at once
+    :return: asynchronous iterator yielding parsed *temporenc* structures
+    """
+    return _AsyncUnpacker(reader, buffer_size)
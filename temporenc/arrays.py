@@ -0,0 +1,310 @@
+"""
+Compact in-memory sequences of same-type *temporenc* values.
+"""
+
+import datetime
+
+from .temporenc import (
+    TAG_MASKS,
+    tag_table,
+    _moment,
+    _read_1,
+    _to_bytes,
+    Moment,
+)
+from .columns import (
+    PRECISION_NAMES,
+    _type_info,
+    _make_encoder,
+)
+
+
+class MomentArray(object):
+    """
+    Array of values with the same *temporenc* type and precision.
+
+    Values are stored in encoded form, back to back in a single buffer,
+    which takes only as many bytes per value as the encoded size (e.g.
+    8 bytes for type ``DTS`` with microsecond precision). This is much
+    more compact than a list of :py:class:`Moment` instances or a list
+    of byte strings. :py:class:`Moment` instances are only created when
+    accessing individual values.
+
+    Instances support ``len()``, indexing, slicing (which returns a new
+    array), and iteration. Values can be added using :py:meth:`append()`,
+    :py:meth:`extend()`, and :py:meth:`frombytes()`. These accept
+    encoded values with the type and precision of the array, instances
+    of the ``datetime`` classes, and :py:class:`Moment` instances, which
+    are encoded first (truncating any sub-second information beyond the
+    array precision).
+
+    Encoded values of the same type and precision sort in the same order
+    as the corresponding :py:class:`Moment` instances, so
+    :py:meth:`sort()`, :py:meth:`searchsorted()`, :py:meth:`min()`, and
+    :py:meth:`max()` work on the encoded values directly, without
+    unpacking anything.
+
+    :param str type: *temporenc* type
+    :param str precision: sub-second precision (only for ``DTS`` and
+        ``DTSZ``)
+    :param values: initial values (optional), see :py:meth:`extend()`
+    """
+
+    def __init__(self, type, precision='us', values=None):
+        tag, size = _type_info(type, precision)
+        self._tag = tag
+        self._decode = tag_table[tag][4]
+        self._encode = _make_encoder(type, precision)
+        self._buf = bytearray()
+
+        #: The *temporenc* type of the values.
+        self.type = type
+
+        #: The sub-second precision of the values, e.g. ``'us'``. This
+        #: is `None` for types without sub-second precision.
+        self.precision = PRECISION_NAMES.get(tag_table[tag][1])
+
+        #: The size of each value in bytes.
+        self.size = size
+
+        if values is not None:
+            self.extend(values)
+
+    def _empty_copy(self):
+        result = MomentArray.__new__(MomentArray)
+        result.__dict__.update(self.__dict__)
+        result._buf = bytearray()
+        return result
+
+    def __repr__(self):
+        return "<temporenc.MomentArray type={0} count={1}>".format(
+            self.type, len(self))
+
+    def __len__(self):
+        return len(self._buf) // self.size
+
+    def __getitem__(self, index):
+        size = self.size
+        count = len(self._buf) // size
+
+        if isinstance(index, slice):
+            start, stop, step = index.indices(count)
+            result = self._empty_copy()
+            if step == 1:
+                result._buf = self._buf[start * size:stop * size]
+            else:
+                buf = self._buf
+                result._buf = bytearray().join(
+                    buf[i * size:(i + 1) * size]
+                    for i in range(start, stop, step))
+            return result
+
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("array index out of range")
+        return _moment(self._decode(self._buf, index * size))
+
+    def __iter__(self):
+        buf = self._buf
+        decode = self._decode
+        for offset in range(0, len(buf), self.size):
+            yield _moment(decode(buf, offset))
+
+    def __eq__(self, other):
+        if not isinstance(other, MomentArray):
+            return NotImplemented
+        return (self._tag == other._tag and self.size == other.size
+                and self._buf == other._buf)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    # Arrays are mutable.
+    __hash__ = None
+
+    def raw(self, index):
+        """
+        Get the encoded value at an index.
+
+        :param int index: index
+        :return: encoded value
+        :rtype: bytes
+        """
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("array index out of range")
+        offset = index * self.size
+        return bytes(self._buf[offset:offset + self.size])
+
+    #
+    # Adding values
+    #
+
+    def append(self, value):
+        """
+        Append a value.
+
+        The `value` can be an encoded value with the type and precision
+        of this array, an instance of one of the ``datetime`` classes,
+        or a :py:class:`Moment`.
+
+        :param value: value to append
+        """
+        encoded = self._encode(value)
+        if encoded is value:
+            # Encoded values are checked in the same way as values that
+            # are unpacked.
+            tag_table[self._tag][3](encoded, 0)
+        self._buf += encoded
+
+    def extend(self, values):
+        """
+        Append all values from an iterable, or from another array.
+
+        A buffer (e.g. `bytes`) is treated as containing encoded values
+        back to back; see :py:meth:`frombytes()`. Any other iterable can
+        contain the same kinds of values as accepted by
+        :py:meth:`append()`.
+
+        :param values: values to append
+        """
+        if isinstance(values, (bytes, bytearray, memoryview)):
+            self.frombytes(values)
+        elif isinstance(values, MomentArray) and values._tag == self._tag:
+            self._buf += values._buf
+        else:
+            for value in values:
+                self.append(value)
+
+    def frombytes(self, buffer, validate=True):
+        """
+        Append encoded values from a buffer.
+
+        The `buffer` must contain values of the type and precision of
+        this array, back to back. All values are validated, unless
+        `validate` is false, in which case the buffer must be known to
+        contain valid values, e.g. from :py:meth:`tobytes()`.
+
+        :param buffer: buffer, e.g. `bytes`
+        :param bool validate: whether to validate the values
+        """
+        size = self.size
+        if len(buffer) % size:
+            raise ValueError(
+                "buffer size is not a multiple of the value size")
+
+        if validate:
+            tag = self._tag
+            tag_mask = TAG_MASKS[self.type]
+            decode = tag_table[tag][3]
+            for offset in range(0, len(buffer), size):
+                if _read_1(buffer, offset) & tag_mask != tag:
+                    raise ValueError(
+                        "value does not match the array type and "
+                        "precision")
+                decode(buffer, offset)
+
+        self._buf += buffer
+
+    def tobytes(self):
+        """
+        Get all values as a contiguous buffer of encoded values.
+
+        :return: encoded values, back to back
+        :rtype: bytes
+        """
+        return bytes(self._buf)
+
+    #
+    # Sorting and searching
+    #
+
+    def _records(self):
+        size = self.size
+        data = bytes(self._buf)
+        return (data[i:i + size] for i in range(0, len(data), size))
+
+    def sort(self, reverse=False):
+        """
+        Sort the values in place.
+
+        :param bool reverse: whether to sort in descending order
+        """
+        self._buf[:] = b''.join(sorted(self._records(), reverse=reverse))
+
+    def _is_truncated(self, value, key):
+        # Encoding a datetime or Moment truncates sub-second information
+        # beyond the array precision, which makes the key smaller than
+        # the value itself.
+        if isinstance(value, Moment):
+            original = value
+        elif isinstance(value, (datetime.date, datetime.time)):
+            original = Moment.from_datetime(value)
+        else:
+            return False
+        return _moment(self._decode(key, 0)) < original
+
+    def searchsorted(self, value, side='left'):
+        """
+        Find the index where a value should be inserted to keep the
+        array sorted.
+
+        This works like ``numpy.searchsorted()``, and assumes the array
+        is sorted. With ``side='left'``, this returns the index of the
+        first value that is not less than `value`; with
+        ``side='right'``, this returns the index of the first value that
+        is greater than `value`. The `value` can be an encoded value, an
+        instance of one of the ``datetime`` classes, or a
+        :py:class:`Moment`. Values with sub-second information beyond the
+        array precision are compared exactly, e.g. for an array with
+        millisecond precision, ``12:00:00.000500`` sorts after
+        ``12:00:00.000``.
+
+        :param value: value to search for
+        :param str side: ``'left'`` or ``'right'``
+        :return: index
+        :rtype: int
+        """
+        if side not in ('left', 'right'):
+            raise ValueError("side must be 'left' or 'right'")
+        key = _to_bytes(self._encode(value))
+        buf = self._buf
+        size = self.size
+        lo, hi = 0, len(buf) // size
+        # If encoding truncated the value, values equal to the key are
+        # less than the value itself, for both sides.
+        right = side == 'right' or self._is_truncated(value, key)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = buf[mid * size:(mid + 1) * size]
+            if current < key or (right and current == key):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def min(self):
+        """
+        Get the smallest value.
+
+        :rtype: :py:class:`Moment`
+        """
+        if not self._buf:
+            raise ValueError("min() of an empty array")
+        return _moment(self._decode(min(self._records()), 0))
+
+    def max(self):
+        """
+        Get the largest value.
+
+        :rtype: :py:class:`Moment`
+        """
+        if not self._buf:
+            raise ValueError("max() of an empty array")
+        return _moment(self._decode(max(self._records()), 0))
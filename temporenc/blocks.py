@@ -0,0 +1,592 @@
+"""
+Delta-compressed block format for sequences of *temporenc* values.
+
+Consecutive values in a time series are usually close together, so
+storing the difference between values takes much less space than
+storing each value in full. A block file stores values of the same
+*temporenc* type and precision in blocks. Each block contains one full
+encoded value (the anchor), followed by the differences between
+consecutive values as variable-length integers, counted in units of the
+precision (e.g. microseconds). The block payload can optionally be
+compressed using ``zlib`` or ``lzma``. An index at the end of the file
+makes it possible to read any block without reading the ones before it.
+
+Only values with complete date and time information (i.e. types ``DT``,
+``DTZ``, ``DTS``, and ``DTSZ``) can be stored. Leap seconds are not
+supported.
+
+The file layout is as follows (all integers are big-endian):
+
+* An 8 byte header, consisting of the magic bytes ``TENB``, a format
+  version (1 byte), the tag bits of the type (1 byte), the size of
+  encoded values (1 byte), and the compression method (1 byte).
+
+* The blocks. Each block starts with the number of values (4 bytes) and
+  the size of the (possibly compressed) payload (4 bytes), followed by
+  the payload. The uncompressed payload contains the anchor value,
+  followed by a variable-length integer for each subsequent value. For
+  types with a time zone, the lowest bit of that integer indicates that
+  the time zone changed, in which case a byte with the new time zone
+  component follows. The remaining bits contain the zigzag-encoded
+  difference.
+
+* The index, containing the file offset (8 bytes), the number of values
+  (4 bytes), and the anchor value of each block.
+
+* A 16 byte trailer, consisting of the file offset of the index
+  (8 bytes), the number of blocks (4 bytes), and the magic bytes
+  ``TENB``.
+"""
+
+import bisect
+import datetime
+import struct
+import zlib
+
+try:
+    import lzma
+except ImportError:  # pragma: no cover
+    lzma = None
+
+from .temporenc import (
+    TAG_MASKS,
+    TIMEZONE_EMPTY,
+    decoders,
+    tag_table,
+    unpackb,
+    _detect_type,
+    _days_from_civil,
+    _civil_from_days,
+    _moment,
+    _to_bytes,
+    Moment,
+)
+from .columns import (
+    PRECISION_NAMES,
+    _type_info,
+    _make_encoder,
+    _map_source,
+)
+
+
+#
+# Format
+#
+
+MAGIC = b'TENB'
+VERSION = 1
+
+HEADER = struct.Struct('>4sBBBB')
+BLOCK_HEADER = struct.Struct('>LL')
+INDEX_ENTRY = struct.Struct('>QL')
+TRAILER = struct.Struct('>QL4s')
+
+COMPRESSION_METHODS = {None: 0, 'zlib': 1, 'lzma': 2}
+COMPRESSION_NAMES = dict((v, k) for k, v in COMPRESSION_METHODS.items())
+
+# Default number of values per block.
+DEFAULT_BLOCK_SIZE = 4096
+
+# Number of units per second, indexed by precision bits.
+UNITS_PER_SECOND = [1000, 1000000, 1000000000, 1]
+
+
+#
+# Helpers
+#
+
+def _compress(data, compression):
+    if compression == 'zlib':
+        return zlib.compress(data)
+    elif compression == 'lzma':
+        return lzma.compress(data)
+    return data
+
+
+def _decompress(data, compression):
+    if compression == 'zlib':
+        return zlib.decompress(data)
+    elif compression == 'lzma':
+        return lzma.decompress(data)
+    return data
+
+
+def _as_moment(value):
+    # Convert a range bound to a Moment.
+    if isinstance(value, Moment):
+        return value
+    if isinstance(value, (datetime.date, datetime.time)):
+        return Moment.from_datetime(value)
+    return unpackb(value)
+
+
+def _read_varint(data, offset):
+    result = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+
+def _write_varint(out, n):
+    while n > 0x7f:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+#
+# Writing
+#
+
+class BlockWriter(object):
+    """
+    Writer for block files.
+
+    This writes a header to `fp` right away. Values added using
+    :py:meth:`write()` are collected until a block is complete, which is
+    then written to `fp`. Each block contains at most `block_size`
+    values. :py:meth:`close()` writes the remaining values and the
+    index. Unlike :py:class:`ColumnWriter`, this does not require `fp`
+    to be seekable. Instances can be used as a context manager, which
+    calls :py:meth:`close()` on successful completion.
+
+    Closing the writer does not close `fp`.
+
+    :param file-like fp: writeable file-like object
+    :param str type: *temporenc* type (``DT``, ``DTZ``, ``DTS``, or
+        ``DTSZ``)
+    :param str precision: sub-second precision (only for ``DTS`` and
+        ``DTSZ``)
+    :param int block_size: maximum number of values per block
+    :param str compression: compression method (``'zlib'``, ``'lzma'``,
+        or `None`)
+    """
+
+    def __init__(self, fp, type, precision='us', block_size=None,
+                 compression=None):
+        if type not in ('DT', 'DTZ', 'DTS', 'DTSZ'):
+            raise ValueError(
+                "block files only support types DT, DTZ, DTS, and DTSZ")
+        if compression not in COMPRESSION_METHODS:
+            raise ValueError(
+                "invalid compression method: {0!r}".format(compression))
+        if compression == 'lzma' and lzma is None:  # pragma: no cover
+            raise ValueError("lzma compression is not available")
+        if block_size is None:
+            block_size = DEFAULT_BLOCK_SIZE
+        elif block_size < 1:
+            raise ValueError("block_size must be positive")
+
+        tag, size = _type_info(type, precision)
+        self._type, self._precision, size = _detect_type(tag)
+        self._size = size
+        self._encode = _make_encoder(type, precision)
+        self._decode = decoders[self._type, self._precision]
+        self._units = UNITS_PER_SECOND[
+            0b11 if self._precision is None else self._precision]
+        self._divisor = 1000000000 // self._units
+        self._has_tz = type == 'DTZ' or type == 'DTSZ'
+        self._block_size = block_size
+        self._compression = compression
+        self._fp = fp
+        self._closed = False
+
+        self._index = bytearray()
+        self._block_count = 0
+        self._offset = HEADER.size
+        self._count = 0
+
+        # State of the current block
+        self._payload = bytearray()
+        self._anchor = None
+        self._block_values = 0
+        self._ticks = 0
+        self._z = 0
+
+        fp.write(HEADER.pack(
+            MAGIC, VERSION, tag, size, COMPRESSION_METHODS[compression]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+    def write(self, value):
+        """
+        Write a value.
+
+        The `value` can be an encoded value with the type and precision
+        of this file, an instance of one of the ``datetime`` classes, or
+        a :py:class:`Moment`. The value must have complete date and time
+        information, and must not be a leap second.
+
+        :param value: value to write
+        """
+        if self._closed:
+            raise ValueError("writer is closed")
+
+        value = self._encode(value)
+        (year, month, day, hour, minute, second, nanosecond,
+         tz_offset) = self._decode(value, 0)
+
+        if (year is None or month is None or day is None or hour is None
+                or minute is None or second is None):
+            raise ValueError("cannot store incomplete values in a block")
+        if second == 60:
+            raise ValueError("cannot store leap seconds in a block")
+
+        ticks = (
+            _days_from_civil(year, month, day) * 86400
+            + hour * 3600 + minute * 60 + second) * self._units
+        if nanosecond is not None:
+            ticks += nanosecond // self._divisor
+        z = TIMEZONE_EMPTY if tz_offset is None else tz_offset // 15 + 64
+
+        if self._anchor is None:
+            self._anchor = bytes(value)
+            self._payload += value
+        else:
+            delta = ticks - self._ticks
+            delta = delta << 1 if delta >= 0 else (-delta << 1) - 1
+            if self._has_tz:
+                if z != self._z:
+                    _write_varint(self._payload, delta << 1 | 1)
+                    self._payload.append(z)
+                else:
+                    _write_varint(self._payload, delta << 1)
+            else:
+                _write_varint(self._payload, delta)
+
+        self._ticks = ticks
+        self._z = z
+        self._block_values += 1
+        self._count += 1
+        if self._block_values >= self._block_size:
+            self._flush()
+
+    @property
+    def count(self):
+        """Number of values written so far."""
+        return self._count
+
+    def write_many(self, values):
+        """
+        Write all values from an iterable.
+
+        See :py:meth:`write()` for more information.
+
+        :param iterable values: values to write
+        """
+        for value in values:
+            self.write(value)
+
+    def close(self):
+        """
+        Write any remaining values and the index.
+        """
+        if self._closed:
+            return
+        self._flush()
+        self._closed = True
+        self._fp.write(bytes(self._index))
+        self._fp.write(TRAILER.pack(self._offset, self._block_count, MAGIC))
+
+    def _flush(self):
+        if self._anchor is None:
+            return
+
+        payload = _compress(bytes(self._payload), self._compression)
+        self._fp.write(
+            BLOCK_HEADER.pack(self._block_values, len(payload)))
+        self._fp.write(payload)
+
+        self._index += INDEX_ENTRY.pack(self._offset, self._block_values)
+        self._index += self._anchor
+        self._block_count += 1
+        self._offset += BLOCK_HEADER.size + len(payload)
+
+        del self._payload[:]
+        self._anchor = None
+        self._block_values = 0
+
+
+def write_blocks(fp, values, type, precision='us', block_size=None,
+                 compression=None):
+    """
+    Write a block file containing all values from an iterable.
+
+    This is a shortcut for using a :py:class:`BlockWriter`; see its
+    documentation for more information.
+
+    :param file-like fp: writeable file-like object
+    :param iterable values: values to write
+    :param str type: *temporenc* type (``DT``, ``DTZ``, ``DTS``, or
+        ``DTSZ``)
+    :param str precision: sub-second precision (only for ``DTS`` and
+        ``DTSZ``)
+    :param int block_size: maximum number of values per block
+    :param str compression: compression method (``'zlib'``, ``'lzma'``,
+        or `None`)
+    :return: number of values written
+    :rtype: int
+    """
+    with BlockWriter(fp, type, precision, block_size, compression) as writer:
+        writer.write_many(values)
+    return writer.count
+
+
+#
+# Reading
+#
+
+class BlockReader(object):
+    """
+    Reader for block files.
+
+    The `source` can be a file name (or a path-like object, e.g.
+    ``pathlib.Path``), a file-like object backed by a real file, or an
+    object supporting the buffer protocol that contains the complete
+    file contents (e.g. `bytes`). Files are memory-mapped, and
+    only the blocks that are actually accessed are read and
+    decompressed.
+
+    Instances support ``len()``, which returns the total number of
+    values, and iteration, which yields :py:class:`Moment` instances for
+    all values. Use :py:meth:`block()` to read a single block. Instances
+    can be used as a context manager, which calls :py:meth:`close()` at
+    the end.
+
+    :param source: file name, path, file-like object, or buffer
+    """
+
+    def __init__(self, source):
+        buffer, self._mmap, self._file = _map_source(source)
+        try:
+            self._read_index(buffer)
+        except Exception:
+            self.close()
+            raise
+
+    def _read_index(self, buffer):
+        if len(buffer) < HEADER.size + TRAILER.size:
+            raise ValueError("not a temporenc block file: too short")
+
+        magic, version, tag, size, compression = HEADER.unpack_from(
+            buffer, 0)
+        index_offset, block_count, trailer_magic = TRAILER.unpack_from(
+            buffer, len(buffer) - TRAILER.size)
+        if magic != MAGIC or trailer_magic != MAGIC:
+            raise ValueError(
+                "not a temporenc block file: invalid magic bytes")
+        if version != VERSION:
+            raise ValueError(
+                "unsupported block format version: {0}".format(version))
+
+        type, precision, length = _detect_type(tag)
+        if (type not in ('DT', 'DTZ', 'DTS', 'DTSZ') or length != size
+                or tag & TAG_MASKS[type] != tag
+                or compression not in COMPRESSION_NAMES):
+            raise ValueError("invalid block file type information")
+
+        entry_size = INDEX_ENTRY.size + size
+        if index_offset + block_count * entry_size + TRAILER.size != len(
+                buffer):
+            raise ValueError("invalid block index")
+
+        self._buffer = buffer
+        self._precision_bits = precision
+        self._units = UNITS_PER_SECOND[
+            0b11 if precision is None else precision]
+        self._multiplier = 1000000000 // self._units
+        self._has_tz = type == 'DTZ' or type == 'DTSZ'
+        self._index = []
+        self._anchors = []
+        self._count = 0
+        decode_anchor = tag_table[tag][3]
+        for i in range(block_count):
+            position = index_offset + i * entry_size
+            offset, count = INDEX_ENTRY.unpack_from(buffer, position)
+            self._index.append((offset, count))
+            self._anchors.append(_moment(
+                decode_anchor(buffer, position + INDEX_ENTRY.size)))
+            self._count += count
+
+        #: The *temporenc* type of the values.
+        self.type = type
+
+        #: The sub-second precision of the values, e.g. ``'us'``. This
+        #: is `None` for types without sub-second precision.
+        self.precision = PRECISION_NAMES.get(precision)
+
+        #: The compression method, e.g. ``'zlib'``.
+        self.compression = COMPRESSION_NAMES[compression]
+
+        #: The number of blocks.
+        self.block_count = block_count
+
+        self._size = size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        return "<temporenc.BlockReader type={0} count={1}>".format(
+            self.type, self._count)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for i in range(self.block_count):
+            for moment in self.block(i):
+                yield moment
+
+    def block(self, index):
+        """
+        Read all values in a block.
+
+        :param int index: block index
+        :return: unpacked values
+        :rtype: list of :py:class:`Moment`
+        """
+        if index < 0:
+            index += self.block_count
+        if not 0 <= index < self.block_count:
+            raise IndexError("block index out of range")
+
+        offset, count = self._index[index]
+        buffer = self._buffer
+        if offset + BLOCK_HEADER.size > len(buffer):
+            raise ValueError("block header is truncated")
+        stored_count, length = BLOCK_HEADER.unpack_from(buffer, offset)
+        if stored_count != count:
+            raise ValueError("block header does not match the index")
+        offset += BLOCK_HEADER.size
+        payload = bytearray(_decompress(
+            _to_bytes(buffer[offset:offset + length]), self.compression))
+
+        type = self.type
+        size = self._size
+        if len(payload) < size:
+            raise ValueError("block payload is truncated")
+        units = self._units
+        multiplier = self._multiplier
+        has_subsecond = type in ('DTS', 'DTSZ') and units != 1
+        has_tz = self._has_tz
+
+        fields = decoders[type, self._precision_bits](payload, 0)
+        result = [Moment(*fields)]
+        (year, month, day, hour, minute, second, nanosecond,
+         tz_offset) = fields
+        ticks = (
+            _days_from_civil(year, month, day) * 86400
+            + hour * 3600 + minute * 60 + second) * units
+        if nanosecond is not None:
+            ticks += nanosecond // multiplier
+
+        position = size
+        try:
+            for _ in range(count - 1):
+                delta, position = _read_varint(payload, position)
+                if has_tz:
+                    tz_changed = delta & 1
+                    delta >>= 1
+                    if tz_changed:
+                        z = payload[position]
+                        position += 1
+                        tz_offset = None if z == TIMEZONE_EMPTY else (
+                            (z - 64) * 15)
+                ticks += -(delta + 1 >> 1) if delta & 1 else delta >> 1
+
+                seconds, subsecond = divmod(ticks, units)
+                days, seconds = divmod(seconds, 86400)
+                year, month, day = _civil_from_days(days)
+                hour, seconds = divmod(seconds, 3600)
+                minute, second = divmod(seconds, 60)
+                result.append(Moment(
+                    year, month, day, hour, minute, second,
+                    subsecond * multiplier if has_subsecond else None,
+                    tz_offset))
+        except IndexError:
+            raise ValueError("block payload is truncated")
+
+        if position != len(payload):
+            raise ValueError("block payload has trailing data")
+        return result
+
+    def anchor(self, index):
+        """
+        Get the first value of a block.
+
+        This uses the index, so the block itself is not read.
+
+        :param int index: block index
+        :rtype: :py:class:`Moment`
+        """
+        if index < 0:
+            index += self.block_count
+        if not 0 <= index < self.block_count:
+            raise IndexError("block index out of range")
+        return self._anchors[index]
+
+    def range(self, start=None, end=None):
+        """
+        Get all values in a half-open range from a file with sorted
+        values.
+
+        This returns a list containing the unpacked values that are
+        greater than or equal to `start`, and less than `end`. If `start`
+        or `end` is `None`, the range is unbounded on that side. The
+        bounds can be encoded values, instances of the ``datetime``
+        classes, or :py:class:`Moment` instances, and are compared like
+        :py:class:`Moment` instances.
+
+        This assumes the values in the file are sorted. The first value
+        of each block is stored in the index, so only the blocks that
+        may contain values in the range are read.
+
+        :param start: start of the range (inclusive)
+        :param end: end of the range (exclusive)
+        :return: list of unpacked values
+        :rtype: list of :py:class:`Moment`
+        """
+        anchors = self._anchors
+        lo, hi = 0, self.block_count
+        if start is not None:
+            start = _as_moment(start)
+            # Values equal to `start` may be at the end of the block
+            # before the first block with that anchor.
+            lo = max(bisect.bisect_left(anchors, start) - 1, 0)
+        if end is not None:
+            end = _as_moment(end)
+            hi = bisect.bisect_left(anchors, end, lo)
+
+        result = []
+        for index in range(lo, hi):
+            for moment in self.block(index):
+                if start is not None and moment < start:
+                    continue
+                if end is not None and not moment < end:
+                    break
+                result.append(moment)
+        return result
+
+    def close(self):
+        """
+        Close the underlying memory map and file (if any).
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,587 @@
+"""
+Bulk encoding and decoding of *temporenc* values using NumPy arrays.
+
+This module requires NumPy, which is not a dependency of the
+``temporenc`` package itself; importing this module without NumPy
+installed raises :py:exc:`ImportError`.
+"""
+
+import numpy as np
+
+from .temporenc import (
+    SUPPORTED_TYPES,
+    PRECISIONS,
+    D_MASK, T_MASK, Z_MASK,
+    YEAR_MAX, YEAR_EMPTY, YEAR_MASK,
+    MONTH_MAX, MONTH_EMPTY, MONTH_MASK,
+    DAY_EMPTY, DAY_MASK,
+    HOUR_MAX, HOUR_EMPTY, HOUR_MASK,
+    MINUTE_MAX, MINUTE_EMPTY, MINUTE_MASK,
+    SECOND_MAX, SECOND_EMPTY, SECOND_MASK,
+    MILLISECOND_MASK, MICROSECOND_MASK, NANOSECOND_MAX, NANOSECOND_MASK,
+    TIMEZONE_MAX, TIMEZONE_EMPTY,
+    D_LENGTH, T_LENGTH, DT_LENGTH, DTZ_LENGTH, DTS_LENGTHS, DTSZ_LENGTHS,
+    TAG_MASKS,
+    _detect_type,
+)
+
+
+#
+# Constants
+#
+
+#: Data type of the structured arrays returned by :py:func:`unpack_array`.
+DTYPE = np.dtype([
+    ('year', np.int16),
+    ('month', np.int8),
+    ('day', np.int8),
+    ('hour', np.int8),
+    ('minute', np.int8),
+    ('second', np.int8),
+    ('nanosecond', np.int32),
+    ('tz_offset', np.int16),
+    ('has_year', np.bool_),
+    ('has_month', np.bool_),
+    ('has_day', np.bool_),
+    ('has_hour', np.bool_),
+    ('has_minute', np.bool_),
+    ('has_second', np.bool_),
+    ('has_nanosecond', np.bool_),
+    ('has_tz_offset', np.bool_),
+])
+
+# Number of units per second for the supported datetime64 units.
+UNITS_PER_SECOND = {
+    's': 1,
+    'ms': 1000,
+    'us': 1000000,
+    'ns': 1000000000,
+}
+
+
+#
+# Helpers
+#
+
+def _civil_from_days(days):
+    """
+    Convert days since 1970-01-01 into (year, month, day) arrays.
+
+    This is a vectorized version of the algorithm described in
+    http://howardhinnant.github.io/date_algorithms.html, which works for
+    the proleptic Gregorian calendar, including negative years.
+    """
+    z = days + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = np.where(mp < 10, mp + 3, mp - 9)
+    year = yoe + era * 400 + (month <= 2)
+    return year, month, day
+
+
+def _days_from_civil(year, month, day):
+    """
+    Convert (year, month, day) arrays into days since 1970-01-01.
+
+    This is the inverse of :py:func:`_civil_from_days`.
+    """
+    y = year - (month <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def _tz_components(tz_offset, shape):
+    """
+    Convert time zone offsets (in minutes) into Z components.
+    """
+    if tz_offset is None:
+        return np.full(shape, TIMEZONE_EMPTY, dtype=np.uint64)
+
+    tz_offset = np.broadcast_to(np.asarray(tz_offset, dtype=np.int64), shape)
+    z, remainder = np.divmod(tz_offset, 15)
+    if remainder.any():
+        raise ValueError("tz_offset must be a multiple of 15")
+    z += 64
+    if ((z < 0) | (z > TIMEZONE_MAX)).any():
+        raise ValueError("tz_offset not within supported range")
+    return z.astype(np.uint64)
+
+
+def _to_bytes(hi, lo, length):
+    """
+    Convert big-endian integer arrays into an ``(N, length)`` array.
+
+    The `lo` array contains the last 8 bytes (or less), and `hi` the
+    remaining leading bytes (if any) for values longer than 8 bytes.
+    """
+    out = np.empty((lo.shape[0], length), dtype=np.uint8)
+    lo_bytes = lo.astype('>u8').view(np.uint8).reshape(-1, 8)
+    if length <= 8:
+        out[:] = lo_bytes[:, 8 - length:]
+    else:
+        hi_bytes = hi.astype('>u8').view(np.uint8).reshape(-1, 8)
+        out[:, :length - 8] = hi_bytes[:, 16 - length:]
+        out[:, length - 8:] = lo_bytes
+    return out
+
+
+def _as_rows(buffer, validate=True):
+    """
+    Convert a buffer of same-type values into an ``(N, length)`` array.
+
+    This also returns the type information for the values. If `validate`
+    is false, only the first value is checked.
+    """
+    if isinstance(buffer, np.ndarray):
+        rows = buffer.astype(np.uint8, copy=False)
+        if rows.ndim == 2:
+            rows = rows.reshape(-1)
+    else:
+        rows = np.frombuffer(buffer, dtype=np.uint8)
+
+    if rows.ndim != 1:
+        raise ValueError("buffer must be one- or two-dimensional")
+
+    if not rows.size:
+        return rows.reshape(0, 0), None, None
+
+    first = int(rows[0])
+    type, precision, length = _detect_type(first)
+    if type is None:
+        raise ValueError("first byte does not contain a valid tag")
+
+    if rows.size % length:
+        raise ValueError(
+            "buffer size must be a multiple of the value size "
+            "({0:d} bytes); got {1:d}".format(length, rows.size))
+
+    rows = rows.reshape(-1, length)
+    # All values must have the same tag (and precision) bits set.
+    mask = TAG_MASKS[type]
+    if validate and ((rows[:, 0] & mask) != (first & mask)).any():
+        raise ValueError("all values must have the same type and precision")
+
+    return rows, type, precision
+
+
+def _from_bytes(rows):
+    """
+    Convert an ``(N, k)`` array (``k <= 8``) into big-endian integers.
+    """
+    padded = np.zeros((rows.shape[0], 8), dtype=np.uint8)
+    padded[:, 8 - rows.shape[1]:] = rows
+    return padded.view('>u8').reshape(-1).astype(np.uint64)
+
+
+def _unpack_components(buffer, validate=True):
+    """
+    Unpack a buffer into arrays with the D, T, S, and Z components.
+
+    Components that are not part of the type are `None`. The S
+    component is normalized to nanoseconds.
+    """
+    rows, type, precision = _as_rows(buffer, validate)
+    date = time = tz_offset = nanosecond = padding = None
+
+    if type == 'D':
+        # 100DDDDD DDDDDDDD DDDDDDDD
+        date = _from_bytes(rows) & D_MASK
+
+    elif type == 'T':
+        # 1010000T TTTTTTTT TTTTTTTT
+        time = _from_bytes(rows) & T_MASK
+
+    elif type == 'DT':
+        # 00DDDDDD DDDDDDDD DDDDDDDT TTTTTTTT
+        # TTTTTTTT
+        n = _from_bytes(rows)
+        date = n >> 17 & D_MASK
+        time = n & T_MASK
+
+    elif type == 'DTZ':
+        # 110DDDDD DDDDDDDD DDDDDDDD TTTTTTTT
+        # TTTTTTTT TZZZZZZZ
+        n = _from_bytes(rows)
+        date = n >> 24 & D_MASK
+        time = n >> 7 & T_MASK
+        tz_offset = n & Z_MASK
+
+    elif type == 'DTS':
+        # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
+        # TTTTTTTT TT...... (first 6 bytes)
+        n = _from_bytes(rows[:, :6]) >> 6
+        date = n >> 17 & D_MASK
+        time = n & T_MASK
+
+        # Extract S component from last 4 bytes
+        n = _from_bytes(rows[:, -4:])
+        if precision == 0b00:
+            nanosecond = (n >> 4 & MILLISECOND_MASK) * 1000000
+            padding = n & 0b1111
+        elif precision == 0b01:
+            nanosecond = (n >> 2 & MICROSECOND_MASK) * 1000
+            padding = n & 0b11
+        elif precision == 0b10:
+            nanosecond = n & NANOSECOND_MASK
+        elif precision == 0b11:
+            padding = n & 0b111111
+
+    elif type == 'DTSZ':
+        # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
+        # TTTTTTTT TTT..... (first 6 bytes)
+        n = _from_bytes(rows[:, :6]) >> 5
+        date = n >> 17 & D_MASK
+        time = n & T_MASK
+
+        # Extract S and Z components from last 5 bytes
+        n = _from_bytes(rows[:, -5:])
+        if precision == 0b00:
+            nanosecond = (n >> 11 & MILLISECOND_MASK) * 1000000
+            tz_offset = n >> 4 & Z_MASK
+            padding = n & 0b1111
+        elif precision == 0b01:
+            nanosecond = (n >> 9 & MICROSECOND_MASK) * 1000
+            tz_offset = n >> 2 & Z_MASK
+            padding = n & 0b11
+        elif precision == 0b10:
+            nanosecond = n >> 7 & NANOSECOND_MASK
+            tz_offset = n & Z_MASK
+        elif precision == 0b11:
+            tz_offset = n >> 6 & Z_MASK
+            padding = n & 0b111111
+
+    if validate and padding is not None and padding.any():
+        raise ValueError("padding bits must be zero")
+
+    return rows.shape[0], type, date, time, nanosecond, tz_offset
+
+
+def _unpack_array(buffer, validate=True):
+    """
+    Unpack a buffer into a structured array; see :py:func:`unpack_array`.
+
+    This also returns the type of the values.
+    """
+    size, type, date, time, nanosecond, tz_offset = _unpack_components(
+        buffer, validate)
+    out = np.zeros(size, dtype=DTYPE)
+
+    if date is not None:
+        year = date >> 9 & YEAR_MASK  # always within range
+        month = date >> 5 & MONTH_MASK
+        day = date & DAY_MASK  # always within range
+        has_month = month != MONTH_EMPTY
+        if validate and (month[has_month] > MONTH_MAX).any():
+            raise ValueError("month not within supported range")
+        out['has_year'] = has_year = year != YEAR_EMPTY
+        out['has_month'] = has_month
+        out['has_day'] = has_day = day != DAY_EMPTY
+        out['year'] = np.where(has_year, year, 0)
+        out['month'] = np.where(has_month, month + 1, 0)
+        out['day'] = np.where(has_day, day + 1, 0)
+
+    if time is not None:
+        hour = time >> 12 & HOUR_MASK
+        minute = time >> 6 & MINUTE_MASK
+        second = time & SECOND_MASK
+        has_hour = hour != HOUR_EMPTY
+        has_minute = minute != MINUTE_EMPTY
+        has_second = second != SECOND_EMPTY
+        if validate:
+            if (hour[has_hour] > HOUR_MAX).any():
+                raise ValueError("hour not within supported range")
+            if (minute[has_minute] > MINUTE_MAX).any():
+                raise ValueError("minute not within supported range")
+            if (second[has_second] > SECOND_MAX).any():
+                raise ValueError("second not within supported range")
+        out['has_hour'] = has_hour
+        out['has_minute'] = has_minute
+        out['has_second'] = has_second
+        out['hour'] = np.where(has_hour, hour, 0)
+        out['minute'] = np.where(has_minute, minute, 0)
+        out['second'] = np.where(has_second, second, 0)
+
+    if nanosecond is not None:
+        if validate and (nanosecond > NANOSECOND_MAX).any():
+            raise ValueError(
+                "sub-second precision not within supported range")
+        out['has_nanosecond'] = True
+        out['nanosecond'] = nanosecond
+
+    if tz_offset is not None:
+        has_tz_offset = tz_offset != TIMEZONE_EMPTY
+        out['has_tz_offset'] = has_tz_offset
+        out['tz_offset'] = np.where(
+            has_tz_offset, 15 * (tz_offset.astype(np.int64) - 64), 0)
+
+    return out, type
+
+
+#
+# Public API
+#
+
+def pack_array(values, type='DTS', precision='us', tz_offset=None):
+    """
+    Pack an array of ``numpy.datetime64`` values.
+
+    All values are encoded using the same *temporenc* `type`, which
+    defaults to ``DTS``. Valid types are ``D``, ``T``, ``DT``, ``DTZ``,
+    ``DTS``, or ``DTSZ``. For the types with sub-second precision, the
+    `precision` argument specifies the precision to use: ``'ms'``,
+    ``'us'`` (the default), ``'ns'``, or `None` for no sub-second
+    information. Values with a finer resolution than the requested
+    precision are truncated.
+
+    The date and time fields are encoded as-is, just like
+    :py:func:`~temporenc.packb()` does when individual fields are
+    specified. For the types with time zone information, `tz_offset`
+    specifies the time zone offset in minutes, either as a single number
+    or as an array with the same length as `values`. If not specified,
+    the time zone information is left empty.
+
+    ``NaT`` values are encoded as values without any date and time
+    information.
+
+    :param values: one-dimensional array of ``numpy.datetime64`` values
+    :param str type: *temporenc* type
+    :param str precision: sub-second precision
+    :param tz_offset: time zone offset(s) in minutes (optional)
+    :return: array of encoded values, one per row
+    :rtype: ``numpy.ndarray`` with shape ``(N, length)`` and dtype
+        ``uint8``
+    """
+
+    if type not in SUPPORTED_TYPES:
+        raise ValueError("invalid temporenc type: {0!r}".format(type))
+
+    if precision not in PRECISIONS:
+        raise ValueError("invalid precision: {0!r}".format(precision))
+
+    values = np.asarray(values)
+    if values.dtype.kind != 'M' or values.ndim != 1:
+        raise ValueError(
+            "values must be a one-dimensional datetime64 array")
+
+    #
+    # Split into components
+    #
+
+    nat = np.isnat(values)
+    dates = values.astype('datetime64[D]')
+    days = dates.astype(np.int64)
+    nanoseconds = (values - dates).astype('timedelta64[ns]').astype(np.int64)
+    days[nat] = 0
+    nanoseconds[nat] = 0
+
+    year, month, day = _civil_from_days(days)
+    if ((year < 0) | (year > YEAR_MAX))[~nat].any():
+        raise ValueError("year not within supported range")
+
+    seconds, nanosecond = np.divmod(nanoseconds, 1000000000)
+    hour, seconds = np.divmod(seconds, 3600)
+    minute, second = np.divmod(seconds, 60)
+
+    d = (year << 9 | (month - 1) << 5 | (day - 1)).astype(np.uint64)
+    t = (hour << 12 | minute << 6 | second).astype(np.uint64)
+    d[nat] = D_MASK
+    t[nat] = T_MASK
+
+    #
+    # Byte packing
+    #
+
+    hi = None
+
+    if type == 'D':
+        # 100DDDDD DDDDDDDD DDDDDDDD
+        length = D_LENGTH
+        lo = 0b100 << 21 | d
+
+    elif type == 'T':
+        # 1010000T TTTTTTTT TTTTTTTT
+        length = T_LENGTH
+        lo = 0b1010000 << 17 | t
+
+    elif type == 'DT':
+        # 00DDDDDD DDDDDDDD DDDDDDDT TTTTTTTT
+        # TTTTTTTT
+        length = DT_LENGTH
+        lo = d << 17 | t
+
+    elif type == 'DTZ':
+        # 110DDDDD DDDDDDDD DDDDDDDD TTTTTTTT
+        # TTTTTTTT TZZZZZZZ
+        length = DTZ_LENGTH
+        z = _tz_components(tz_offset, values.shape)
+        lo = 0b110 << 45 | d << 24 | t << 7 | z
+
+    elif type == 'DTS':
+        bits = PRECISIONS[precision]
+        length = DTS_LENGTHS[bits]
+        if precision == 'ns':
+            # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
+            # TTTTTTTT TTSSSSSS SSSSSSSS SSSSSSSS
+            # SSSSSSSS
+            s = nanosecond.astype(np.uint64)
+            hi = 0b0110 << 4 | d >> 17
+            lo = (d & 0x1ffff) << 47 | t << 30 | s
+        elif precision == 'us':
+            # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
+            # TTTTTTTT TTSSSSSS SSSSSSSS SSSSSS00
+            s = (nanosecond // 1000).astype(np.uint64)
+            lo = 0b0101 << 60 | d << 39 | t << 22 | s << 2
+        elif precision == 'ms':
+            # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
+            # TTTTTTTT TTSSSSSS SSSS0000
+            s = (nanosecond // 1000000).astype(np.uint64)
+            lo = 0b0100 << 52 | d << 31 | t << 14 | s << 4
+        else:
+            # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
+            # TTTTTTTT TT000000
+            lo = 0b0111 << 44 | d << 23 | t << 6
+
+    elif type == 'DTSZ':
+        bits = PRECISIONS[precision]
+        length = DTSZ_LENGTHS[bits]
+        z = _tz_components(tz_offset, values.shape)
+        if precision == 'ns':
+            # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
+            # TTTTTTTT TTTSSSSS SSSSSSSS SSSSSSSS
+            # SSSSSSSS SZZZZZZZ
+            s = nanosecond.astype(np.uint64)
+            hi = 0b11110 << 11 | d >> 10
+            lo = (d & 0x3ff) << 54 | t << 37 | s << 7 | z
+        elif precision == 'us':
+            # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
+            # TTTTTTTT TTTSSSSS SSSSSSSS SSSSSSSZ
+            # ZZZZZZ00
+            s = (nanosecond // 1000).astype(np.uint64)
+            hi = 0b11101 << 3 | d >> 18
+            lo = (d & 0x3ffff) << 46 | t << 29 | s << 9 | z << 2
+        elif precision == 'ms':
+            # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
+            # TTTTTTTT TTTSSSSS SSSSSZZZ ZZZZ0000
+            s = (nanosecond // 1000000).astype(np.uint64)
+            lo = 0b11100 << 59 | d << 38 | t << 21 | s << 11 | z << 4
+        else:
+            # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
+            # TTTTTTTT TTTZZZZZ ZZ000000
+            lo = 0b11111 << 51 | d << 30 | t << 13 | z << 6
+
+    return _to_bytes(hi, lo, length)
+
+
+def packb_array(values, type='DTS', precision='us', tz_offset=None):
+    """
+    Pack an array of ``numpy.datetime64`` values into a byte string.
+
+    This is the same as :py:func:`pack_array()`, but returns a single
+    byte string containing all encoded values back to back.
+
+    :return: concatenated encoded *temporenc* values
+    :rtype: bytes
+    """
+    return pack_array(
+        values, type=type, precision=precision, tz_offset=tz_offset).tobytes()
+
+
+def unpack_array(buffer, validate=True):
+    """
+    Unpack a buffer containing same-type values into a structured array.
+
+    The `buffer` must contain *temporenc* values of the same type (and
+    precision) back to back, e.g. as returned by :py:func:`packb_array`.
+    It can be any object supporting the buffer protocol, or a NumPy
+    array with dtype ``uint8``, either one-dimensional or with shape
+    ``(N, length)``.
+
+    The returned array uses :py:data:`DTYPE` as its data type. It has
+    a field for each component (``year``, ``month``, ``day``, ``hour``,
+    ``minute``, ``second``, ``nanosecond``, and ``tz_offset``), and a
+    boolean field for each component (e.g. ``has_year``) indicating
+    whether the component is set. The value of a component that is not
+    set is zero.
+
+    Like :py:func:`~temporenc.unpackb()`, this performs range checks
+    and raises :py:exc:`ValueError` if any value is invalid. If
+    `validate` is false, these checks are skipped, and only the tag of
+    the first value is checked. Only use this for trusted input.
+
+    :param buffer: buffer containing encoded values
+    :param bool validate: whether to validate the values
+    :return: decoded values
+    :rtype: ``numpy.ndarray`` with :py:data:`DTYPE`
+    """
+    return _unpack_array(buffer, validate)[0]
+
+
+def unpack_datetime64(buffer, unit='ns', utc=False, validate=True):
+    """
+    Unpack a buffer containing same-type values into a datetime64 array.
+
+    See :py:func:`unpack_array` for the requirements for the `buffer`.
+
+    Since ``numpy.datetime64`` does not support missing values, values
+    with incomplete date or time information result in ``NaT``. Values
+    of type ``D`` have no time information at all; these are converted
+    to midnight. Missing sub-second information is treated as zero, and
+    leap seconds are converted to the preceding second, just like
+    :py:meth:`temporenc.Moment.datetime()` does for non-strict
+    conversions. Values with a higher precision than the requested
+    `unit` are truncated.
+
+    By default the returned values contain the date and time fields
+    as-is. If `utc` is true, values with a time zone offset are
+    converted to UTC instead.
+
+    See :py:func:`unpack_array` for the meaning of `validate`.
+
+    :param buffer: buffer containing encoded values
+    :param str unit: datetime64 unit (``'s'``, ``'ms'``, ``'us'``, or
+        ``'ns'``)
+    :param bool utc: whether to convert to UTC
+    :param bool validate: whether to validate the values
+    :return: decoded values
+    :rtype: ``numpy.ndarray`` with dtype ``datetime64[unit]``
+    """
+    try:
+        per_second = UNITS_PER_SECOND[unit]
+    except KeyError:
+        raise ValueError("invalid unit: {0!r}".format(unit))
+
+    values, type = _unpack_array(buffer, validate)
+    complete = values['has_year'] & values['has_month'] & values['has_day']
+    if type != 'D':
+        complete &= (
+            values['has_hour'] & values['has_minute'] & values['has_second'])
+
+    days = _days_from_civil(
+        values['year'].astype(np.int64),
+        values['month'].astype(np.int64),
+        values['day'].astype(np.int64))
+    days[~complete] = 0
+    limit = np.iinfo(np.int64).max // (86400 * per_second) - 1
+    if (np.abs(days) > limit).any():
+        raise ValueError(
+            "value not within datetime64[{0}] range".format(unit))
+
+    seconds = (
+        values['hour'].astype(np.int64) * 3600
+        + values['minute'].astype(np.int64) * 60
+        + np.minimum(values['second'], 59))
+    if utc:
+        seconds -= values['tz_offset'].astype(np.int64) * 60
+
+    result = (
+        (days * 86400 + seconds) * per_second
+        + values['nanosecond'] // (1000000000 // per_second))
+    result[~complete] = np.iinfo(np.int64).min  # NaT
+    return result.view('datetime64[{0}]'.format(unit))
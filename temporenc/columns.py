@@ -0,0 +1,588 @@
+"""
+Columnar container format for same-type *temporenc* values.
+
+A column file contains a sequence of values of the same *temporenc* type
+and precision. Since those all have the same size, any value can be
+located directly, without reading the preceding values.
+
+The file layout is as follows (all integers are big-endian):
+
+* A 16 byte header, consisting of the magic bytes ``TENC``, a format
+  version (1 byte), flags (1 byte), the tag bits of the type (1 byte,
+  i.e. the first byte of the values with all non-tag bits cleared), the
+  size of each value in bytes (1 byte), and the number of values
+  (8 bytes).
+
+* The values, back to back.
+
+* An optional 8 byte footer (if the checksum flag is set), consisting of
+  the CRC-32 checksum of all values (4 bytes) and the magic bytes
+  ``TENC``.
+"""
+
+import datetime
+import mmap
+import struct
+import zlib
+
+from .temporenc import (
+    SUPPORTED_TYPES,
+    PRECISIONS,
+    TAG_MASKS,
+    D_MASK, T_MASK, TIMEZONE_EMPTY,
+    encoders,
+    tag_table,
+    make_packer,
+    _detect_type,
+    _read_1,
+    _moment,
+    _to_bytes,
+    Moment,
+)
+
+
+#
+# Format
+#
+
+MAGIC = b'TENC'
+VERSION = 1
+FLAG_CHECKSUM = 0b00000001
+
+HEADER = struct.Struct('>4sBBBBQ')
+FOOTER = struct.Struct('>L4s')
+
+# This maps precision bits to precision names.
+PRECISION_NAMES = dict((v, k) for k, v in PRECISIONS.items())
+
+# Number of bytes to collect before writing to the underlying file.
+WRITE_BUFFER_SIZE = 64 * 1024
+
+# Types used for file names, i.e. str, and unicode in Python 2. Byte
+# strings are treated as buffers. Path-like objects, such as
+# pathlib.Path, are supported as well.
+PATH_TYPES = (str, type(u''))
+
+
+#
+# Helpers
+#
+
+def _type_info(type, precision):
+    """
+    Get the tag bits and the size of values of a type and precision.
+    """
+    if type not in SUPPORTED_TYPES:
+        raise ValueError("invalid temporenc type: {0!r}".format(type))
+
+    if precision not in PRECISIONS:
+        raise ValueError("invalid precision: {0!r}".format(precision))
+
+    if type == 'DTS' or type == 'DTSZ':
+        encode = encoders[type, PRECISIONS[precision]]
+    else:
+        encode = encoders[type, None]
+
+    # Pack an empty value to find out the tag and size.
+    empty = encode(D_MASK, T_MASK, 0, TIMEZONE_EMPTY)
+    return _read_1(empty, 0) & TAG_MASKS[type], len(empty)
+
+
+def _make_encoder(type, precision):
+    """
+    Create a function that encodes values for a column.
+
+    The returned function accepts encoded values with the right type and
+    precision, which are returned as is, instances of the ``datetime``
+    classes, which are packed using :py:func:`make_packer`, and
+    :py:class:`Moment` instances.
+    """
+    tag, size = _type_info(type, precision)
+    tag_mask = TAG_MASKS[type]
+    packers = {}
+
+    def encode(value):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            if len(value) != size or _read_1(value, 0) & tag_mask != tag:
+                raise ValueError(
+                    "value does not match the column type and precision")
+            return value
+
+        if isinstance(value, Moment):
+            return value.pack(type, precision)
+
+        if isinstance(value, datetime.datetime):
+            source = 'datetime'
+        elif isinstance(value, datetime.date):
+            source = 'date'
+        elif isinstance(value, datetime.time):
+            source = 'time'
+        else:
+            raise ValueError("Cannot encode {0!r}".format(value))
+
+        try:
+            packer = packers[source]
+        except KeyError:
+            packer = packers[source] = make_packer(type, precision, source)
+        return packer(value)
+
+    return encode
+
+
+def _map_source(source):
+    """
+    Get a buffer for a file name, path-like object, file-like object, or
+    buffer.
+
+    Files are memory-mapped. This returns a (buffer, mmap, file) tuple,
+    where the last two items are `None` if they were not created here,
+    and must be closed by the caller otherwise.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        return source, None, None
+
+    fp = None
+    if isinstance(source, PATH_TYPES) or hasattr(source, '__fspath__'):
+        source = fp = open(source, 'rb')
+    try:
+        mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+    except Exception:
+        if fp is not None:
+            fp.close()
+        raise
+    return mapped, mapped, fp
+
+
+#
+# Writing
+#
+
+class ColumnWriter(object):
+    """
+    Writer for column files.
+
+    This writes a header to `fp` right away. Values added using
+    :py:meth:`write()` are collected in a buffer, which is written to
+    `fp` when it becomes large. Since the header contains the number of
+    values, :py:meth:`close()` updates the header after writing the
+    remaining values, which means `fp` must be seekable. Instances can
+    be used as a context manager, which calls :py:meth:`close()` on
+    successful completion.
+
+    Closing the writer does not close `fp`.
+
+    :param file-like fp: writeable and seekable file-like object
+    :param str type: *temporenc* type
+    :param str precision: sub-second precision (only for ``DTS`` and
+        ``DTSZ``)
+    :param bool checksum: whether to include a checksum footer
+    """
+
+    def __init__(self, fp, type, precision='us', checksum=True):
+        self._tag, self._size = _type_info(type, precision)
+        self._encode = _make_encoder(type, precision)
+        self._fp = fp
+        self._start = fp.tell()
+        self._checksum = checksum
+        self._crc = 0
+        self._count = 0
+        self._buffer = bytearray()
+        self._closed = False
+
+        flags = FLAG_CHECKSUM if checksum else 0
+        fp.write(HEADER.pack(MAGIC, VERSION, flags, self._tag, self._size, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+    def write(self, value):
+        """
+        Write a value.
+
+        The `value` can be an encoded value with the type and precision
+        of this column, an instance of one of the ``datetime`` classes,
+        which will be packed using :py:func:`make_packer()`, or a
+        :py:class:`Moment`, which will be packed using
+        :py:meth:`Moment.pack()`.
+
+        :param value: value to write
+        """
+        if self._closed:
+            raise ValueError("writer is closed")
+
+        self._buffer += self._encode(value)
+        self._count += 1
+        if len(self._buffer) >= WRITE_BUFFER_SIZE:
+            self._flush()
+
+    @property
+    def count(self):
+        """Number of values written so far."""
+        return self._count
+
+    def write_many(self, values):
+        """
+        Write all values from an iterable.
+
+        See :py:meth:`write()` for more information.
+
+        :param iterable values: values to write
+        """
+        for value in values:
+            self.write(value)
+
+    def close(self):
+        """
+        Write any remaining values and finish the file.
+        """
+        if self._closed:
+            return
+        self._flush()
+        self._closed = True
+
+        fp = self._fp
+        if self._checksum:
+            fp.write(FOOTER.pack(self._crc & 0xffffffff, MAGIC))
+
+        end = fp.tell()
+        fp.seek(self._start + HEADER.size - 8)
+        fp.write(struct.pack('>Q', self._count))
+        fp.seek(end)
+
+    def _flush(self):
+        if self._buffer:
+            data = _to_bytes(self._buffer)
+            self._fp.write(data)
+            if self._checksum:
+                self._crc = zlib.crc32(data, self._crc)
+            del self._buffer[:]
+
+
+def write_column(fp, values, type, precision='us', checksum=True):
+    """
+    Write a column file containing all values from an iterable.
+
+    This is a shortcut for using a :py:class:`ColumnWriter`; see its
+    documentation for more information.
+
+    :param file-like fp: writeable and seekable file-like object
+    :param iterable values: values to write
+    :param str type: *temporenc* type
+    :param str precision: sub-second precision (only for ``DTS`` and
+        ``DTSZ``)
+    :param bool checksum: whether to include a checksum footer
+    :return: number of values written
+    :rtype: int
+    """
+    with ColumnWriter(fp, type, precision, checksum) as writer:
+        writer.write_many(values)
+    return writer.count
+
+
+#
+# Reading
+#
+
+class TemporencColumn(object):
+    """
+    Reader for column files.
+
+    The `source` can be a file name (or a path-like object, e.g.
+    ``pathlib.Path``), a file-like object backed by a real file, or an
+    object supporting the buffer protocol that contains the complete
+    file contents (e.g. `bytes`). Files are memory-mapped, so only the
+    parts that are actually accessed are read from disk. Use
+    :py:meth:`frombuffer()` for buffers containing only encoded values,
+    without a header.
+
+    Instances behave like a read-only sequence of :py:class:`Moment`
+    instances: they support ``len()``, indexing, slicing, and iteration.
+    Slicing returns a list. The :py:meth:`raw()` method returns encoded
+    values instead. Instances can be used as a context manager, which
+    calls :py:meth:`close()` at the end.
+
+    If the values are sorted, :py:meth:`bisect_left()`,
+    :py:meth:`bisect_right()`, and :py:meth:`range()` can be used to
+    find values using a binary search.
+
+    :param source: file name, path, file-like object, or buffer
+    """
+
+    def __init__(self, source):
+        buffer, self._mmap, self._file = _map_source(source)
+        try:
+            self._read_header(buffer)
+        except Exception:
+            self.close()
+            raise
+
+    @classmethod
+    def frombuffer(cls, buffer, type, precision='us'):
+        """
+        Create a column from a buffer containing only encoded values.
+
+        The `buffer` must contain values of the specified type and
+        precision, back to back, without a header or footer.
+
+        :param buffer: buffer, e.g. `bytes` or ``mmap``
+        :param str type: *temporenc* type
+        :param str precision: sub-second precision (only for ``DTS`` and
+            ``DTSZ``)
+        :rtype: TemporencColumn
+        """
+        tag, size = _type_info(type, precision)
+        count, remainder = divmod(len(buffer), size)
+        if remainder:
+            raise ValueError(
+                "buffer size is not a multiple of the value size")
+        column = cls.__new__(cls)
+        column._mmap = column._file = None
+        column._setup(buffer, 0, 0, tag, count)
+        return column
+
+    def _read_header(self, buffer):
+        if len(buffer) < HEADER.size:
+            raise ValueError("not a temporenc column: too short")
+
+        magic, version, flags, tag, size, count = HEADER.unpack_from(
+            buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("not a temporenc column: invalid magic bytes")
+        if version != VERSION:
+            raise ValueError(
+                "unsupported column format version: {0}".format(version))
+
+        type, precision, length = _detect_type(tag)
+        if type is None or length != size or tag & TAG_MASKS[type] != tag:
+            raise ValueError("invalid column type information")
+
+        expected_size = HEADER.size + count * size
+        if flags & FLAG_CHECKSUM:
+            expected_size += FOOTER.size
+        if len(buffer) < expected_size:
+            raise ValueError("column file is truncated")
+
+        self._setup(buffer, HEADER.size, flags, tag, count)
+
+    def _setup(self, buffer, offset, flags, tag, count):
+        type, precision, size = _detect_type(tag)
+
+        self._buffer = buffer
+        self._offset = offset
+        self._flags = flags
+        self._count = count
+        self._precision_bits = precision
+        self._decode = tag_table[tag][3]
+        self._encoder = None
+
+        #: The *temporenc* type of the values.
+        self.type = type
+
+        #: The sub-second precision of the values, e.g. ``'us'``. This
+        #: is `None` for types without sub-second precision.
+        self.precision = PRECISION_NAMES.get(precision)
+
+        #: The size of each value in bytes.
+        self.size = size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        return "<temporenc.TemporencColumn type={0} count={1}>".format(
+            self.type, self._count)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get(i) for i in range(*index.indices(self._count))]
+
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("column index out of range")
+        return self._get(index)
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self._get(i)
+
+    def _get(self, index):
+        return _moment(self._decode(
+            self._buffer, self._offset + index * self.size))
+
+    def _raw(self, index):
+        offset = self._offset + index * self.size
+        return _to_bytes(self._buffer[offset:offset + self.size])
+
+    def raw(self, index):
+        """
+        Get the encoded value at an index.
+
+        :param int index: index
+        :return: encoded value
+        :rtype: bytes
+        """
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("column index out of range")
+        return self._raw(index)
+
+    #
+    # Searching
+    #
+
+    def _key(self, value):
+        if self._encoder is None:
+            self._encoder = _make_encoder(self.type, self.precision)
+        return _to_bytes(self._encoder(value))
+
+    def _is_truncated(self, value, key):
+        # Encoding a datetime or Moment truncates sub-second information
+        # beyond the column precision, which makes the key smaller than
+        # the value itself.
+        if isinstance(value, Moment):
+            original = value
+        elif isinstance(value, (datetime.date, datetime.time)):
+            original = Moment.from_datetime(value)
+        else:
+            return False
+        return _moment(self._decode(key, 0)) < original
+
+    def _bisect_bound(self, value, lo=0):
+        # Find the index of the first value that is not less than
+        # `value`. If the key was truncated, values equal to the key are
+        # less than `value` as well, so those are skipped.
+        key = self._key(value)
+        if self._is_truncated(value, key):
+            return self.bisect_right(key, lo)
+        return self.bisect_left(key, lo)
+
+    def _bounds(self, lo, hi):
+        if lo < 0:
+            raise ValueError("lo must be non-negative")
+        if hi is None or hi > self._count:
+            hi = self._count
+        return lo, hi
+
+    def bisect_left(self, value, lo=0, hi=None):
+        """
+        Find the leftmost insertion point for a value in a sorted column.
+
+        This works like :py:func:`bisect.bisect_left`, and assumes the
+        column is sorted. The `value` can be an encoded value with the
+        type and precision of this column, an instance of one of the
+        ``datetime`` classes, or a :py:class:`Moment`, which is encoded
+        first (truncating any sub-second information beyond the column
+        precision). The search compares encoded values, and does not
+        unpack anything.
+
+        :param value: value to search for
+        :param int lo: start index of the search range
+        :param int hi: end index of the search range
+        :return: index
+        :rtype: int
+        """
+        key = self._key(value)
+        lo, hi = self._bounds(lo, hi)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._raw(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def bisect_right(self, value, lo=0, hi=None):
+        """
+        Find the rightmost insertion point for a value in a sorted column.
+
+        This works like :py:func:`bisect.bisect_right`; see
+        :py:meth:`bisect_left()` for more information.
+
+        :param value: value to search for
+        :param int lo: start index of the search range
+        :param int hi: end index of the search range
+        :return: index
+        :rtype: int
+        """
+        key = self._key(value)
+        lo, hi = self._bounds(lo, hi)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key < self._raw(mid):
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def range(self, start=None, end=None):
+        """
+        Get all values in a half-open range from a sorted column.
+
+        This returns a list containing the unpacked values that are
+        greater than or equal to `start`, and less than `end`. If `start`
+        or `end` is `None`, the range is unbounded on that side. See
+        :py:meth:`bisect_left()` for information about the accepted
+        values. Unlike :py:meth:`bisect_left()`, this does not truncate
+        the bounds to the column precision, but compares them like
+        :py:class:`Moment` instances, e.g. for a column with millisecond
+        precision, a `start` of ``12:00:00.000500`` excludes a value of
+        ``12:00:00.000``. Only the values in the range are unpacked.
+
+        :param start: start of the range (inclusive)
+        :param end: end of the range (exclusive)
+        :return: list of unpacked values
+        :rtype: list of :py:class:`Moment`
+        """
+        lo = 0 if start is None else self._bisect_bound(start)
+        hi = self._count if end is None else self._bisect_bound(end, lo)
+        return self[lo:hi]
+
+    def verify(self):
+        """
+        Verify the checksum of all values.
+
+        This reads the complete file. If the file does not contain
+        a checksum, this does nothing.
+
+        :raise ValueError: if the checksum does not match
+        """
+        if not self._flags & FLAG_CHECKSUM:
+            return
+
+        start = self._offset
+        end = start + self._count * self.size
+        crc, magic = FOOTER.unpack_from(self._buffer, end)
+        if magic != MAGIC:
+            raise ValueError("invalid footer")
+
+        actual = 0
+        view = memoryview(self._buffer)
+        for offset in range(start, end, WRITE_BUFFER_SIZE):
+            actual = zlib.crc32(_to_bytes(
+                view[offset:min(offset + WRITE_BUFFER_SIZE, end)]), actual)
+        view.release()
+        if actual & 0xffffffff != crc:
+            raise ValueError("checksum mismatch")
+
+    def close(self):
+        """
+        Close the underlying memory map and file (if any).
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,221 @@
+"""
+Parallel decoding of large buffers using multiple processes.
+
+This module requires Python 3.8 or newer, since it uses
+``multiprocessing.shared_memory`` to share the input and output buffers
+with the worker processes, which avoids pickling any data.
+"""
+
+import array
+import concurrent.futures
+import os
+from multiprocessing import shared_memory
+
+from .temporenc import (
+    EPOCH_UNITS,
+    TAG_MASKS,
+    decoders,
+    _detect_type,
+    _read_1,
+    _days_from_civil,
+)
+from .columns import _type_info
+
+
+#
+# Output format
+#
+
+# Names of the columns returned by unpack_parallel(), in order.
+FIELDS = (
+    'year', 'month', 'day', 'hour', 'minute', 'second', 'nanosecond',
+    'tz_offset')
+
+# Value used for missing components. None of the components can be
+# negative, except tz_offset, which is always a multiple of 15.
+MISSING = -1
+
+# Buffers with at most this many values are decoded in the calling
+# process.
+PARALLEL_THRESHOLD = 10000
+
+# Number of chunks per worker, to balance the load a bit.
+CHUNKS_PER_WORKER = 4
+
+# Range of the 64-bit integers in the output. Epoch values in small
+# units (e.g. nanoseconds after the year 2262) may not fit.
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+
+#
+# Decoding
+#
+
+def _decode_range(src, out, start, stop, count, type, tag, precision, size,
+                  unit, utc):
+    """
+    Decode a range of values from `src` into `out`.
+
+    The `out` buffer is a memoryview of 64-bit integers, containing
+    either one column for epoch values, or all columns one after the
+    other, each with `count` values.
+    """
+    mask = TAG_MASKS[type]
+    decode = decoders[type, precision]
+    for i in range(start, stop):
+        offset = i * size
+        if _read_1(src, offset) & mask != tag:
+            raise ValueError(
+                "all values must have the same type and precision")
+        (year, month, day, hour, minute, second, nanosecond,
+         tz_offset) = decode(src, offset)
+
+        if unit is None:
+            for column, value in enumerate((
+                    year, month, day, hour, minute, second, nanosecond,
+                    tz_offset)):
+                out[column * count + i] = MISSING if value is None else value
+            continue
+
+        if year is None or month is None or day is None:
+            raise ValueError("value at index {0} has no date".format(i))
+        seconds = _days_from_civil(year, month, day) * 86400
+        if type != 'D':
+            if hour is None or minute is None or second is None:
+                raise ValueError(
+                    "value at index {0} has an incomplete time".format(i))
+            # Leap seconds are not supported by epoch values.
+            seconds += hour * 3600 + minute * 60 + min(second, 59)
+        if utc and tz_offset is not None:
+            seconds -= tz_offset * 60
+        value = seconds * unit
+        if nanosecond is not None:
+            value += nanosecond * unit // 1000000000
+        if not INT64_MIN <= value <= INT64_MAX:
+            raise ValueError(
+                "value at index {0} does not fit in a 64-bit integer "
+                "for this unit".format(i))
+        out[i] = value
+
+
+def _worker(src_name, out_name, length, start, stop, count, *args):
+    """
+    Decode a range of values in a worker process.
+    """
+    src_shm = shared_memory.SharedMemory(src_name)
+    out_shm = shared_memory.SharedMemory(out_name)
+    try:
+        src = src_shm.buf[:length]
+        out = out_shm.buf[:out_shm.size // 8 * 8].cast('q')
+        try:
+            _decode_range(src, out, start, stop, count, *args)
+        finally:
+            out.release()
+            src.release()
+    finally:
+        out_shm.close()
+        src_shm.close()
+
+
+def unpack_parallel(buffer, type, precision='us', workers=None, unit=None,
+                    utc=False):
+    """
+    Unpack a buffer of same-type values using multiple processes.
+
+    The `buffer` must contain *temporenc* values of the specified type
+    and precision, back to back, like the data in a column file. The
+    buffer is split into chunks, which are decoded by a pool of
+    `workers` processes (by default, the number of CPUs). The input and
+    output data are shared with the workers using shared memory. Small
+    buffers are decoded without starting any processes.
+
+    If `unit` is `None`, this returns a dictionary that maps the names
+    of the components (``'year'``, ``'month'``, ``'day'``, ``'hour'``,
+    ``'minute'``, ``'second'``, ``'nanosecond'``, and ``'tz_offset'``)
+    to ``array.array`` instances with the values of that component.
+    Missing components are set to ``-1``.
+
+    If `unit` is one of ``'s'``, ``'ms'``, ``'us'``, or ``'ns'``, this
+    returns an ``array.array`` containing the number of units since the
+    Unix epoch for each value instead. These represent the local time,
+    unless `utc` is true, in which case the time zone offset (if any)
+    is subtracted. Values of type ``D`` represent midnight, and leap
+    seconds are clamped to the previous second. Values without complete
+    date and time information cannot be converted to epoch values.
+
+    This function requires Python 3.8 or newer.
+
+    :param buffer: buffer, e.g. `bytes` or ``mmap``
+    :param str type: *temporenc* type
+    :param str precision: sub-second precision (only for ``DTS`` and
+        ``DTSZ``)
+    :param int workers: number of worker processes
+    :param str unit: unit for epoch values, or `None`
+    :param bool utc: whether to convert epoch values to UTC
+    :return: dictionary with a column for each component, or epoch values
+    :rtype: dict or ``array.array``
+    """
+    tag, size = _type_info(type, precision)
+    _, precision_bits, _ = _detect_type(tag)
+    if unit is not None and unit not in EPOCH_UNITS:
+        raise ValueError("invalid unit: {0!r}".format(unit))
+    if unit is not None and type == 'T':
+        raise ValueError("cannot convert type T values to epoch values")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    elif workers < 1:
+        raise ValueError("workers must be positive")
+
+    length = len(buffer)
+    count, remainder = divmod(length, size)
+    if remainder:
+        raise ValueError("buffer size is not a multiple of the value size")
+
+    columns = 1 if unit is not None else len(FIELDS)
+    per_second = EPOCH_UNITS[unit][0] if unit is not None else None
+    args = (type, tag, precision_bits, size, per_second, utc)
+
+    if workers == 1 or count <= PARALLEL_THRESHOLD:
+        result = array.array('q', bytes(8 * count * columns))
+        out = memoryview(result)
+        try:
+            _decode_range(buffer, out, 0, count, count, *args)
+        finally:
+            out.release()
+        return _split(result, count, unit)
+
+    src_shm = shared_memory.SharedMemory(create=True, size=length)
+    out_shm = None
+    try:
+        src_shm.buf[:length] = buffer
+        out_shm = shared_memory.SharedMemory(
+            create=True, size=8 * count * columns)
+
+        step = -(-count // (workers * CHUNKS_PER_WORKER))
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            futures = [
+                executor.submit(
+                    _worker, src_shm.name, out_shm.name, length,
+                    start, min(start + step, count), count, *args)
+                for start in range(0, count, step)]
+            for future in futures:
+                future.result()
+
+        result = array.array('q')
+        result.frombytes(out_shm.buf[:8 * count * columns])
+    finally:
+        for shm in (src_shm, out_shm):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+    return _split(result, count, unit)
+
+
+def _split(result, count, unit):
+    if unit is not None:
+        return result
+    return dict(
+        (name, result[i * count:(i + 1) * count])
+        for i, name in enumerate(FIELDS))
@@ -0,0 +1,269 @@
+"""
+Opt-in instrumentation.
+
+This module collects statistics about packing and unpacking, e.g. to
+find out which *temporenc* types are used in practice, or where invalid
+values come from::
+
+    import temporenc.stats
+
+    temporenc.stats.enable()
+    ...
+    print(temporenc.stats.snapshot())
+
+Instrumentation is disabled by default. :py:func:`enable()` replaces the
+instrumented functions in the ``temporenc`` package with wrappers that
+record statistics, and :py:func:`disable()` puts the original functions
+back, so there is no overhead at all while instrumentation is disabled.
+Note that references obtained before enabling instrumentation, e.g.
+using ``from temporenc import packb``, keep referring to the original
+functions.
+
+The instrumented functions are :py:func:`packb`, :py:func:`packb_epoch`,
+:py:func:`unpackb`, :py:func:`unpackb_datetime`,
+:py:func:`unpackb_date`, :py:func:`unpackb_time`,
+:py:func:`unpackb_epoch`, and :py:func:`unpack_from` (and hence
+:py:func:`pack`, :py:func:`unpack`, and :py:class:`Cache`, which use
+them), as well as the methods of :py:class:`Cache`. The statistics only
+cover those functions: other entry points do not use them, and are not
+counted. These are :py:func:`iter_unpack`, the functions returned by
+:py:func:`make_packer`, :py:func:`transcode`, and the classes and
+functions for columns, blocks, arrays, ``asyncio`` streams, and parallel
+decoding.
+"""
+
+import functools
+import sys
+import threading
+import time
+
+from . import temporenc as _core
+
+
+#
+# Configuration
+#
+
+ENCODE_FUNCTIONS = ('packb', 'packb_epoch')
+DECODE_FUNCTIONS = (
+    'unpackb', 'unpackb_datetime', 'unpackb_date', 'unpackb_time',
+    'unpackb_epoch', 'unpack_from')
+CACHE_METHODS = ('packb', 'unpackb')
+
+PRECISION_NAMES = dict(
+    (bits, name) for name, bits in _core.PRECISIONS.items())
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+#
+# State
+#
+
+_lock = threading.Lock()
+_originals = {}
+_timing = False
+_hook = None
+
+
+def _empty_stats():
+    def operation():
+        return {
+            'count': 0, 'bytes': 0, 'time': 0.0, 'types': {},
+            'failures': {}}
+
+    return {
+        'encode': operation(),
+        'decode': operation(),
+        'cache': {'hits': 0, 'misses': 0},
+    }
+
+
+_stats = _empty_stats()
+
+
+def _record(operation, buffer, offset, size, start):
+    elapsed = _clock() - start if start is not None else 0.0
+    type, precision = _core.tag_table[_core._read_1(buffer, offset)][:2]
+    key = (type, PRECISION_NAMES.get(precision))
+    with _lock:
+        stats = _stats[operation]
+        stats['count'] += 1
+        stats['bytes'] += size
+        stats['time'] += elapsed
+        stats['types'][key] = stats['types'].get(key, 0) + 1
+    if _hook is not None:
+        _hook(operation, key[0], key[1], size, None)
+
+
+def _record_failure(operation, exc):
+    reason = str(exc)
+    with _lock:
+        failures = _stats[operation]['failures']
+        failures[reason] = failures.get(reason, 0) + 1
+    if _hook is not None:
+        _hook(operation, None, None, None, exc)
+
+
+#
+# Wrappers
+#
+
+def _wrap_encoder(func):
+    def wrapper(*args, **kwargs):
+        start = _clock() if _timing else None
+        try:
+            result = func(*args, **kwargs)
+        except ValueError as exc:
+            _record_failure('encode', exc)
+            raise
+        _record('encode', result, 0, len(result), start)
+        return result
+
+    return functools.wraps(func)(wrapper)
+
+
+def _wrap_decoder(func):
+    is_unpack_from = func.__name__ == 'unpack_from'
+
+    def wrapper(value, *args, **kwargs):
+        start = _clock() if _timing else None
+        try:
+            result = func(value, *args, **kwargs)
+        except ValueError as exc:
+            _record_failure('decode', exc)
+            raise
+        if is_unpack_from:
+            offset = args[0] if args else kwargs.get('offset', 0)
+            _record('decode', value, offset, result[1], start)
+        else:
+            _record('decode', value, 0, len(value), start)
+        return result
+
+    return functools.wraps(func)(wrapper)
+
+
+def _wrap_cache_method(method):
+    def wrapper(self, *args, **kwargs):
+        hits = self.hits
+        result = method(self, *args, **kwargs)
+        key = 'hits' if self.hits != hits else 'misses'
+        with _lock:
+            _stats['cache'][key] += 1
+        return result
+
+    return functools.wraps(method)(wrapper)
+
+
+#
+# Public API
+#
+
+def enable(timing=False, hook=None):
+    """
+    Enable instrumentation.
+
+    If `timing` is true, the cumulative time spent in each operation is
+    recorded as well. This adds some overhead to each call.
+
+    If `hook` is specified, it is called after each instrumented
+    operation as ``hook(operation, type, precision, size, error)``.
+    The `operation` is ``'encode'`` or ``'decode'``, and `precision` is
+    the precision name, e.g. ``'us'``, or `None`. For failed operations,
+    `type`, `precision`, and `size` are `None`, and `error` is the
+    exception that is about to be raised.
+
+    Calling this again while already enabled only changes the settings.
+
+    :param bool timing: whether to record the time spent
+    :param callable hook: function to call for each operation
+    """
+    global _timing, _hook
+    # This avoids an implicit relative import of the core module, which
+    # has the same name as the package, in Python 2.
+    package = sys.modules[__name__.rpartition('.')[0]]
+
+    _timing = bool(timing)
+    _hook = hook
+    if _originals:
+        return
+
+    wrappers = [(name, _wrap_encoder) for name in ENCODE_FUNCTIONS]
+    wrappers += [(name, _wrap_decoder) for name in DECODE_FUNCTIONS]
+    for name, wrap in wrappers:
+        original = getattr(_core, name)
+        _originals[_core, name] = original
+        wrapper = wrap(original)
+        setattr(_core, name, wrapper)
+        if getattr(package, name, None) is original:
+            _originals[package, name] = original
+            setattr(package, name, wrapper)
+
+    for name in CACHE_METHODS:
+        original = _core.Cache.__dict__[name]
+        _originals[_core.Cache, name] = original
+        setattr(_core.Cache, name, _wrap_cache_method(original))
+
+
+def disable():
+    """
+    Disable instrumentation.
+
+    This restores the original functions. The collected statistics are
+    kept until :py:func:`reset()` is called.
+    """
+    global _timing, _hook
+    for (target, name), original in _originals.items():
+        setattr(target, name, original)
+    _originals.clear()
+    _timing = False
+    _hook = None
+
+
+def is_enabled():
+    """
+    Check whether instrumentation is enabled.
+
+    :rtype: bool
+    """
+    return bool(_originals)
+
+
+def reset():
+    """
+    Reset all collected statistics.
+    """
+    global _stats
+    with _lock:
+        _stats = _empty_stats()
+
+
+def snapshot():
+    """
+    Get a copy of the collected statistics.
+
+    The result is a dictionary with ``'encode'``, ``'decode'``, and
+    ``'cache'`` keys. The first two map to a dictionary with these keys:
+
+    * ``'count'``: number of successfully processed values
+    * ``'bytes'``: total size of those values in bytes
+    * ``'time'``: cumulative time in seconds (only if timing is enabled)
+    * ``'types'``: number of values per ``(type, precision)`` tuple,
+      e.g. ``('DTS', 'us')`` or ``('D', None)``
+    * ``'failures'``: number of failures per reason, i.e. the message
+      of the :py:exc:`ValueError` that was raised
+
+    The ``'cache'`` key maps to a dictionary with the number of
+    ``'hits'`` and ``'misses'`` of all :py:class:`Cache` instances.
+
+    :rtype: dict
+    """
+    with _lock:
+        result = {}
+        for key, value in _stats.items():
+            value = dict(value)
+            for name in ('types', 'failures'):
+                if name in value:
+                    value[name] = dict(value[name])
+            result[key] = value
+        return result
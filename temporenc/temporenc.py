@@ -1,5 +1,8 @@
 
+import collections
 import datetime
+import errno
+import io
 import struct
 import sys
 
@@ -40,6 +43,36 @@ DTZ_LENGTH = 6
 DTS_LENGTHS = [7, 8, 9, 6]    # indexed by precision bits
 DTSZ_LENGTHS = [8, 9, 10, 7]  # idem
 
+# Bit masks for the tag (and precision) bits in the first byte of each
+# type. Values of the same type and precision have the same bits set.
+TAG_MASKS = {
+    'D': 0b11100000,
+    'T': 0b11111110,
+    'DT': 0b11000000,
+    'DTZ': 0b11100000,
+    'DTS': 0b11110000,
+    'DTSZ': 0b11111000,
+}
+
+# Default number of bytes to read at once when reading from streams.
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+# Default maximum number of entries for each direction of a Cache.
+DEFAULT_CACHE_SIZE = 4096
+
+# This maps sub-second precision names to the precision bits used in
+# the DTS and DTSZ types. None means 'no sub-second precision'.
+PRECISIONS = {'ms': 0b00, 'us': 0b01, 'ns': 0b10, None: 0b11}
+
+# This maps units for integer Unix time to the number of units per
+# second, and to the matching sub-second precision name.
+EPOCH_UNITS = {
+    's': (1, None),
+    'ms': (1000, 'ms'),
+    'us': (1000000, 'us'),
+    'ns': (1000000000, 'ns'),
+}
+
 
 #
 # Helpers
@@ -50,34 +83,482 @@ pack_8 = struct.Struct('>Q').pack
 pack_2_8 = struct.Struct('>HQ').pack
 
 
-def unpack_4(value, _unpack=struct.Struct('>L').unpack):
-    return _unpack(value)[0]
+def _to_bytes(value):
+    """
+    Convert a buffer, e.g. a `bytearray` or `memoryview`, to `bytes`.
+    """
+    if PY2 and not isinstance(value, bytes):  # pragma: no cover
+        # bytes() returns the repr of a memoryview in Python 2
+        return bytes(bytearray(value))
+    return bytes(value)
+
+
+def _read_1(buffer, offset, _unpack_from=struct.Struct('>B').unpack_from):
+    return _unpack_from(buffer, offset)[0]
+
+
+def _read_3(buffer, offset, _unpack_from=struct.Struct('>BH').unpack_from):
+    a, b = _unpack_from(buffer, offset)
+    return a << 16 | b
+
+
+def _read_5(buffer, offset, _unpack_from=struct.Struct('>BL').unpack_from):
+    a, b = _unpack_from(buffer, offset)
+    return a << 32 | b
+
 
+def _read_6(buffer, offset, _unpack_from=struct.Struct('>HL').unpack_from):
+    a, b = _unpack_from(buffer, offset)
+    return a << 32 | b
 
-def unpack_8(value, _unpack=struct.Struct('>Q').unpack):
-    return _unpack(value)[0]
+
+def _read_7(buffer, offset, _unpack_from=struct.Struct('>BHL').unpack_from):
+    a, b, c = _unpack_from(buffer, offset)
+    return a << 48 | b << 32 | c
+
+
+def _read_8(buffer, offset, _unpack_from=struct.Struct('>Q').unpack_from):
+    return _unpack_from(buffer, offset)[0]
+
+
+def _read_9(buffer, offset, _unpack_from=struct.Struct('>BQ').unpack_from):
+    a, b = _unpack_from(buffer, offset)
+    return a << 64 | b
+
+
+def _read_10(buffer, offset, _unpack_from=struct.Struct('>HQ').unpack_from):
+    a, b = _unpack_from(buffer, offset)
+    return a << 64 | b
+
+
+# This maps value lengths to functions that read a big-endian integer of
+# that many bytes from a buffer at a given offset.
+read_int_from = {
+    1: _read_1,
+    3: _read_3,
+    5: _read_5,
+    6: _read_6,
+    7: _read_7,
+    8: _read_8,
+    9: _read_9,
+    10: _read_10,
+}
 
 
 def _detect_type(first):
     """
     Detect type information from the numerical value of the first byte.
+
+    This returns a ``(type, precision, length)`` tuple; all items are
+    `None` if the byte does not contain a valid tag.
+    """
+    return tag_table[first][:3]
+
+
+def _pack_d(d, t, s, z):
+    # 100DDDDD DDDDDDDD DDDDDDDD
+    return pack_4(0b100 << 21 | d)[-3:]
+
+
+def _pack_t(d, t, s, z):
+    # 1010000T TTTTTTTT TTTTTTTT
+    return pack_4(0b1010000 << 17 | t)[-3:]
+
+
+def _pack_dt(d, t, s, z):
+    # 00DDDDDD DDDDDDDD DDDDDDDT TTTTTTTT
+    # TTTTTTTT
+    return pack_8(d << 17 | t)[-5:]
+
+
+def _pack_dtz(d, t, s, z):
+    # 110DDDDD DDDDDDDD DDDDDDDD TTTTTTTT
+    # TTTTTTTT TZZZZZZZ
+    return pack_8(0b110 << 45 | d << 24 | t << 7 | z)[-6:]
+
+
+def _pack_dts_ms(d, t, s, z):
+    # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
+    # TTTTTTTT TTSSSSSS SSSS0000
+    return pack_8(0b0100 << 52 | d << 31 | t << 14 | s << 4)[-7:]
+
+
+def _pack_dts_us(d, t, s, z):
+    # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
+    # TTTTTTTT TTSSSSSS SSSSSSSS SSSSSS00
+    return pack_8(0b0101 << 60 | d << 39 | t << 22 | s << 2)
+
+
+def _pack_dts_ns(d, t, s, z):
+    # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
+    # TTTTTTTT TTSSSSSS SSSSSSSS SSSSSSSS
+    # SSSSSSSS
+    return pack_2_8(
+        0b0110 << 4 | d >> 17,
+        (d & 0x1ffff) << 47 | t << 30 | s)[-9:]
+
+
+def _pack_dts_none(d, t, s, z):
+    # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
+    # TTTTTTTT TT000000
+    return pack_8(0b0111 << 44 | d << 23 | t << 6)[-6:]
+
+
+def _pack_dtsz_ms(d, t, s, z):
+    # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
+    # TTTTTTTT TTTSSSSS SSSSSZZZ ZZZZ0000
+    return pack_8(0b11100 << 59 | d << 38 | t << 21 | s << 11 | z << 4)
+
+
+def _pack_dtsz_us(d, t, s, z):
+    # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
+    # TTTTTTTT TTTSSSSS SSSSSSSS SSSSSSSZ
+    # ZZZZZZ00
+    return pack_2_8(
+        0b11101 << 3 | d >> 18,
+        (d & 0x3ffff) << 46 | t << 29 | s << 9 | z << 2)[-9:]
+
+
+def _pack_dtsz_ns(d, t, s, z):
+    # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
+    # TTTTTTTT TTTSSSSS SSSSSSSS SSSSSSSS
+    # SSSSSSSS SZZZZZZZ
+    return pack_2_8(
+        0b11110 << 11 | d >> 10,
+        (d & 0x3ff) << 54 | t << 37 | s << 7 | z)
+
+
+def _pack_dtsz_none(d, t, s, z):
+    # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
+    # TTTTTTTT TTTZZZZZ ZZ000000
+    return pack_8(0b11111 << 51 | d << 30 | t << 13 | z << 6)[-7:]
+
+
+# This maps (type, precision bits) to functions that pack the D, T, S,
+# and Z components into a byte string. The S component must use the
+# unit of the precision. Types without sub-second precision use None as
+# the precision.
+encoders = {
+    ('D', None): _pack_d,
+    ('T', None): _pack_t,
+    ('DT', None): _pack_dt,
+    ('DTZ', None): _pack_dtz,
+    ('DTS', 0b00): _pack_dts_ms,
+    ('DTS', 0b01): _pack_dts_us,
+    ('DTS', 0b10): _pack_dts_ns,
+    ('DTS', 0b11): _pack_dts_none,
+    ('DTSZ', 0b00): _pack_dtsz_ms,
+    ('DTSZ', 0b01): _pack_dtsz_us,
+    ('DTSZ', 0b10): _pack_dtsz_ns,
+    ('DTSZ', 0b11): _pack_dtsz_none,
+}
+
+
+def _detect_value(value):
+    """
+    Detect type information for a complete encoded value.
+
+    Unlike :py:func:`_detect_type`, this also checks the tag and the
+    length of the value. This returns the complete entry from the
+    :py:data:`tag_table`.
+    """
+    first = value[0]
+
+    if PY2 and isinstance(first, bytes):  # pragma: no cover
+        first = ord(first)
+
+    entry = tag_table[first]
+    type, precision, expected_length = entry[:3]
+
+    if type is None:
+        raise ValueError("first byte does not contain a valid tag")
+
+    if len(value) != expected_length:
+        if precision is None:
+            raise ValueError(
+                "{0} value must be {1:d} bytes; got {2:d}".format(
+                    type, expected_length, len(value)))
+        else:
+            raise ValueError(
+                "{0} value with precision {1:02b} must be {2:d} bytes; "
+                "got {3:d}".format(
+                    type, precision, expected_length, len(value)))
+
+    return entry
+
+
+def _tag_bits(value):
+    """
+    Get the tag (and precision) bits of an encoded value.
+
+    This also checks that the value has the correct length.
+    """
+    type = _detect_value(value)[0]
+    return _read_1(value, 0) & TAG_MASKS[type]
+
+
+def _tz_component(value):
+    """
+    Get the Z component for a ``datetime`` or ``time`` instance.
+    """
+    delta = value.utcoffset()
+    if delta is None:
+        return TIMEZONE_EMPTY
+    z, remainder = divmod(delta.days * 1440 + delta.seconds // 60, 15)
+    if remainder:
+        raise ValueError("tz_offset must be a multiple of 15")
+    z += 64
+    if not 0 <= z <= TIMEZONE_MAX:
+        raise ValueError("tz_offset not within supported range")
+    return z
+
+
+def _no_tz_component(value):
+    return TIMEZONE_EMPTY
+
+
+# This maps (type, precision bits) to the length of encoded values.
+value_lengths = {
+    ('D', None): D_LENGTH,
+    ('T', None): T_LENGTH,
+    ('DT', None): DT_LENGTH,
+    ('DTZ', None): DTZ_LENGTH,
+    ('DTS', 0b00): DTS_LENGTHS[0b00],
+    ('DTS', 0b01): DTS_LENGTHS[0b01],
+    ('DTS', 0b10): DTS_LENGTHS[0b10],
+    ('DTS', 0b11): DTS_LENGTHS[0b11],
+    ('DTSZ', 0b00): DTSZ_LENGTHS[0b00],
+    ('DTSZ', 0b01): DTSZ_LENGTHS[0b01],
+    ('DTSZ', 0b10): DTSZ_LENGTHS[0b10],
+    ('DTSZ', 0b11): DTSZ_LENGTHS[0b11],
+}
+
+
+# This maps (type, precision bits) to the layout of the components in
+# a value: the shifts for the D and T components, the shift, mask, and
+# nanosecond multiplier for the S component, the shift for the Z
+# component, and the mask for the padding bits. Components that are not
+# part of the type use None.
+field_layouts = {
+    ('D', None): (0, None, None, 0, 0, None, 0),
+    ('T', None): (None, 0, None, 0, 0, None, 0),
+    ('DT', None): (17, 0, None, 0, 0, None, 0),
+    ('DTZ', None): (24, 7, None, 0, 0, 0, 0),
+    ('DTS', 0b00): (31, 14, 4, MILLISECOND_MASK, 1000000, None, 0b1111),
+    ('DTS', 0b01): (39, 22, 2, MICROSECOND_MASK, 1000, None, 0b11),
+    ('DTS', 0b10): (47, 30, 0, NANOSECOND_MASK, 1, None, 0),
+    ('DTS', 0b11): (23, 6, None, 0, 0, None, 0b111111),
+    ('DTSZ', 0b00): (38, 21, 11, MILLISECOND_MASK, 1000000, 4, 0b1111),
+    ('DTSZ', 0b01): (46, 29, 9, MICROSECOND_MASK, 1000, 2, 0b11),
+    ('DTSZ', 0b10): (54, 37, 7, NANOSECOND_MASK, 1, 0, 0),
+    ('DTSZ', 0b11): (30, 13, None, 0, 0, 6, 0b111111),
+}
+
+
+def _make_decoder(type, precision, length):
+    """
+    Create a function that unpacks a value of a specific type.
+
+    The returned function takes a buffer and an offset, and returns the
+    year, month, day, hour, minute, second, nanosecond, and tz_offset
+    fields. It does not check the tag or the length.
+    """
+    read = read_int_from[length]
+    (d_shift, t_shift, s_shift, s_mask, s_factor, z_shift,
+     padding_mask) = field_layouts[type, precision]
+
+    def decode(buffer, offset):
+        n = read(buffer, offset)
+
+        if n & padding_mask:
+            raise ValueError("padding bits must be zero")
+
+        if d_shift is None:
+            year = month = day = None
+        else:
+            date = n >> d_shift
+            year = date >> 9 & YEAR_MASK  # always within range
+            if year == YEAR_EMPTY:
+                year = None
+
+            month = date >> 5 & MONTH_MASK
+            if month == MONTH_EMPTY:
+                month = None
+            elif month > MONTH_MAX:
+                raise ValueError("month not within supported range")
+            else:
+                month += 1
+
+            day = date & DAY_MASK  # always within range
+            if day == DAY_EMPTY:
+                day = None
+            else:
+                day += 1
+
+        if t_shift is None:
+            hour = minute = second = None
+        else:
+            time = n >> t_shift
+            hour = time >> 12 & HOUR_MASK
+            if hour == HOUR_EMPTY:
+                hour = None
+            elif hour > HOUR_MAX:
+                raise ValueError("hour not within supported range")
+
+            minute = time >> 6 & MINUTE_MASK
+            if minute == MINUTE_EMPTY:
+                minute = None
+            elif minute > MINUTE_MAX:
+                raise ValueError("minute not within supported range")
+
+            second = time & SECOND_MASK
+            if second == SECOND_EMPTY:
+                second = None
+            elif second > SECOND_MAX:
+                raise ValueError("second not within supported range")
+
+        if s_shift is None:
+            nanosecond = None
+        else:
+            nanosecond = (n >> s_shift & s_mask) * s_factor
+            if nanosecond > NANOSECOND_MAX:
+                raise ValueError(
+                    "sub-second precision not within supported range")
+
+        if z_shift is None:
+            tz_offset = None
+        else:
+            tz_offset = n >> z_shift & Z_MASK
+            if tz_offset == TIMEZONE_EMPTY:
+                tz_offset = None
+            else:
+                tz_offset = 15 * (tz_offset - 64)
+
+        return year, month, day, hour, minute, second, nanosecond, tz_offset
+
+    return decode
+
+
+# This maps (type, precision bits) to functions that unpack a value into
+# separate fields; see _make_decoder().
+decoders = dict(
+    ((type, precision), _make_decoder(type, precision, length))
+    for (type, precision), length in value_lengths.items())
+
+
+# Moment instances store all components in a single integer. This uses
+# the same layout as the D, T, and Z components of encoded values, with
+# the sub-second component (in nanoseconds) in between:
+#
+#   DDDDDDDD DDDDDDDD DDDDDTTT TTTTTTTT TTTTTTSS SSSSSSSS SSSSSSSS
+#   SSSSSSSS SSSSZZZZ ZZZ
+#
+# Missing components use the same all-ones values as encoded values, so
+# comparing these integers compares the components in order, with
+# missing components sorting after all other values.
+CANONICAL_D_SHIFT = 54
+CANONICAL_T_SHIFT = 37
+CANONICAL_S_SHIFT = 7
+SUBSECOND_EMPTY = NANOSECOND_MASK
+
+
+def _make_canonical_decoder(type, precision, length, validate=True):
+    """
+    Create a function that unpacks a value into the integer used by
+    :py:class:`Moment`.
+
+    The returned function takes a buffer and an offset. It does not
+    check the tag or the length. If `validate` is false, the padding and
+    range checks are skipped, so the function must only be used for
+    values that are known to be valid. For valid values, the result is
+    identical.
     """
-    if first <= 0b00111111:
-        return 'DT', None, DT_LENGTH
-    elif first <= 0b01111111:
-        precision = first >> 4 & 0b11
-        return 'DTS', precision, DTS_LENGTHS[precision]
-    elif first <= 0b10011111:
-        return 'D', None, D_LENGTH
-    elif first <= 0b10100001:
-        return 'T', None, T_LENGTH
-    elif first <= 0b10111111:
-        return None, None, None
-    elif first <= 0b11011111:
-        return 'DTZ', None, DTZ_LENGTH
-    elif first <= 0b11111111:
-        precision = first >> 3 & 0b11
-        return 'DTSZ', precision, DTSZ_LENGTHS[precision]
+    read = read_int_from[length]
+    (d_shift, t_shift, s_shift, s_mask, s_factor, z_shift,
+     padding_mask) = field_layouts[type, precision]
+    if not validate:
+        padding_mask = 0
+
+    # Components that are not part of the type are always empty. This
+    # avoids any branching on the type in the decoder itself.
+    empty = 0
+    d_mask = t_mask = z_mask = 0
+    if d_shift is None:
+        d_shift = 0
+        empty |= D_MASK << CANONICAL_D_SHIFT
+    else:
+        d_mask = D_MASK
+    if t_shift is None:
+        t_shift = 0
+        empty |= T_MASK << CANONICAL_T_SHIFT
+    else:
+        t_mask = T_MASK
+    if s_shift is None:
+        s_shift = 0
+        empty |= SUBSECOND_EMPTY << CANONICAL_S_SHIFT
+    if z_shift is None:
+        z_shift = 0
+        empty |= TIMEZONE_EMPTY
+    else:
+        z_mask = Z_MASK
+
+    def decode(buffer, offset):
+        n = read(buffer, offset)
+
+        if n & padding_mask:
+            raise ValueError("padding bits must be zero")
+
+        date = n >> d_shift & d_mask
+        time = n >> t_shift & t_mask
+        subsecond = (n >> s_shift & s_mask) * s_factor
+
+        if validate:
+            if MONTH_MAX < date >> 5 & MONTH_MASK < MONTH_EMPTY:
+                raise ValueError("month not within supported range")
+            if HOUR_MAX < time >> 12 < HOUR_EMPTY:
+                raise ValueError("hour not within supported range")
+            if MINUTE_MAX < time >> 6 & MINUTE_MASK < MINUTE_EMPTY:
+                raise ValueError("minute not within supported range")
+            if SECOND_MAX < time & SECOND_MASK < SECOND_EMPTY:
+                raise ValueError("second not within supported range")
+            if subsecond > NANOSECOND_MAX:
+                raise ValueError(
+                    "sub-second precision not within supported range")
+
+        return (
+            date << CANONICAL_D_SHIFT
+            | time << CANONICAL_T_SHIFT
+            | subsecond << CANONICAL_S_SHIFT
+            | n >> z_shift & z_mask
+            | empty)
+
+    return decode
+
+
+def _build_tag_table():
+    # The tag bits of each type and precision are taken from an encoded
+    # value, so that the table is consistent with the encoders. Bytes
+    # that do not match any tag map to an entry with only None items.
+    table = [(None, None, None, None, None)] * 256
+    for (type, precision), length in value_lengths.items():
+        mask = TAG_MASKS[type]
+        tag = _read_1(encoders[type, precision](0, 0, 0, 0), 0) & mask
+        entry = (
+            type, precision, length,
+            _make_canonical_decoder(type, precision, length),
+            _make_canonical_decoder(
+                type, precision, length, validate=False))
+        for first in range(256):
+            if first & mask == tag:
+                table[first] = entry
+    return table
+
+
+# This maps every possible first byte of a value to a (type, precision,
+# length, decoder, trusted decoder) tuple. This is used for dispatching
+# when decoding, instead of testing the tag bits each time. The decoders
+# return the integer used by Moment; use _moment() to create an instance.
+tag_table = _build_tag_table()
 
 
 class FixedOffset(datetime.tzinfo):
@@ -126,10 +607,198 @@ def cached_tzinfo(minutes):
     return tzinfo
 
 
+def _days_from_civil(year, month, day):
+    """
+    Get the number of days since 1970-01-01 for a date.
+
+    This uses the proleptic Gregorian calendar, and works for any year
+    supported by *temporenc* (unlike ``datetime.date``, which does not
+    support year 0).
+    """
+    # See http://howardhinnant.github.io/date_algorithms.html
+    if month <= 2:
+        year -= 1
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def _civil_from_days(days):
+    """
+    Get the (year, month, day) tuple for a number of days since 1970-01-01.
+
+    This is the inverse of :py:func:`_days_from_civil`.
+    """
+    days += 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = mp + 3 if mp < 10 else mp - 9
+    year = yoe + era * 400 + (month <= 2)
+    return year, month, day
+
+
+def _to_datetime(
+        year, month, day, hour, minute, second, nanosecond, tz_offset,
+        strict):
+    """
+    Convert separate fields to a ``datetime.datetime`` instance.
+
+    See :py:meth:`Moment.datetime()` for the conversion rules.
+    """
+
+    if strict:
+        if None in (year, month, day):
+            raise ValueError("incomplete date information")
+        if None in (hour, minute, second):
+            raise ValueError("incomplete time information")
+
+    # The stdlib's datetime classes always specify microseconds.
+    us = nanosecond // 1000 if nanosecond is not None else 0
+
+    if not strict:
+        # Substitute defaults for missing values.
+        if year is None:
+            year = 1
+
+        if month is None:
+            month = 1
+
+        if day is None:
+            day = 1
+
+        if hour is None:
+            hour = 0
+
+        if minute is None:
+            minute = 0
+
+        if second is None:
+            second = 0
+        elif second == 60:  # assume that this is a leap second
+            second = 59
+
+    dt = datetime.datetime(
+        year, month, day,
+        hour, minute, second, us,
+        tzinfo=cached_tzinfo(tz_offset))
+
+    return dt
+
+
+def _to_date(
+        year, month, day, hour, minute, second, nanosecond, tz_offset,
+        strict):
+    """
+    Convert separate fields to a ``datetime.date`` instance.
+    """
+    if strict:
+        if None in (year, month, day):
+            raise ValueError("incomplete date information")
+
+        # Shortcut for performance reasons
+        return datetime.date(year, month, day)
+
+    return _to_datetime(
+        year, month, day, hour, minute, second, nanosecond, tz_offset,
+        False).date()
+
+
+def _to_time(
+        year, month, day, hour, minute, second, nanosecond, tz_offset,
+        strict):
+    """
+    Convert separate fields to a ``datetime.time`` instance.
+    """
+    if strict:
+        if None in (hour, minute, second):
+            raise ValueError("incomplete time information")
+
+        # Shortcut for performance reasons
+        return datetime.time(
+            hour, minute, second,
+            nanosecond // 1000 if nanosecond is not None else 0,
+            tzinfo=cached_tzinfo(tz_offset))
+
+    return _to_datetime(
+        year, month, day, hour, minute, second, nanosecond, tz_offset,
+        False).timetz()
+
+
+def _to_epoch(
+        year, month, day, hour, minute, second, nanosecond, tz_offset,
+        per_second):
+    """
+    Convert separate fields to the number of units since the Unix epoch.
+    """
+    if None in (year, month, day):
+        raise ValueError("incomplete date information")
+
+    seconds = _days_from_civil(year, month, day) * 86400
+    if not (hour is None and minute is None and second is None):
+        if None in (hour, minute, second):
+            raise ValueError("incomplete time information")
+
+        # Unix time has no leap seconds.
+        seconds += hour * 3600 + minute * 60 + min(second, 59)
+
+    if tz_offset is not None:
+        seconds -= tz_offset * 60
+
+    result = seconds * per_second
+    if nanosecond is not None:
+        result += nanosecond * per_second // 1000000000
+    return result
+
+
 #
 # Public API
 #
 
+def _canonical(year, month, day, hour, minute, second, nanosecond,
+               tz_offset):
+    """
+    Combine (valid) components into the integer used by Moment.
+    """
+    return (
+        (YEAR_EMPTY if year is None else year) << 63
+        | (MONTH_EMPTY if month is None else month - 1) << 59
+        | (DAY_EMPTY if day is None else day - 1) << 54
+        | (HOUR_EMPTY if hour is None else hour) << 49
+        | (MINUTE_EMPTY if minute is None else minute) << 43
+        | (SECOND_EMPTY if second is None else second) << 37
+        | (SUBSECOND_EMPTY if nanosecond is None else nanosecond) << 7
+        | (TIMEZONE_EMPTY if tz_offset is None else tz_offset // 15 + 64))
+
+
+# This maps precision bits to the number of nanoseconds per unit.
+SUBSECOND_DIVISORS = {0b00: 1000000, 0b01: 1000, 0b10: 1}
+
+
+def _utc_offset_minutes(value):
+    """
+    Get the UTC offset of a ``datetime`` or ``time`` instance in minutes.
+    """
+    delta = value.utcoffset()
+    if delta is None:
+        return None
+    return delta.days * 1440 + delta.seconds // 60
+
+
+def _moment(canonical, _new=object.__new__):
+    """
+    Create a Moment from the integer returned by the tag table decoders.
+    """
+    moment = _new(Moment)
+    moment._canonical = canonical
+    return moment
+
+
 class Moment(object):
     """
     Container to represent a parsed *temporenc* value.
@@ -144,125 +813,183 @@ class Moment(object):
     completely empty (all attributes are ``None``) or completely filled
     (no attribute is ``None``).
 
-    This class is intended to be a read-only immutable data structure;
-    assigning new values to attributes is not supported.
+    This class is an immutable data structure; the attributes are
+    read-only. Internally, all components are stored in a single
+    integer, which keeps instances small.
 
     Instances are hashable and can be used as dictionary keys or as
-    members of a set. Instances representing the same moment in time
-    have the same hash value. Time zone information is not taken into
-    account for hashing purposes, since time zone aware values must have
-    their constituent parts in UTC.
-
-    Instances of this class can be compared to each other, with earlier
-    dates sorting first. As with hashing, time zone information is not
-    taken into account, since the actual data must be in UTC in those
-    cases.
+    members of a set. Instances with the same components have the same
+    hash value, regardless of the *temporenc* type and precision they
+    were unpacked from.
+
+    Instances of this class can be compared to each other. This compares
+    the components in order (year, month, day, hour, minute, second,
+    sub-second, and time zone offset), so earlier dates sort first.
+    Missing components sort after all other values. Since the
+    components represent local time, the time zone offset is only used
+    to order values with otherwise identical components.
+
+    Instances are normally obtained using one of the unpacking functions
+    like :py:func:`unpackb()`. To create instances directly, use
+    :py:meth:`from_fields()` or :py:meth:`from_datetime()`. The
+    :py:meth:`replace()` method creates a modified copy, and
+    :py:meth:`pack()` encodes an instance again.
 
     .. note::
 
-       This class must not be instantiated directly; use one of the
-       unpacking functions like :py:func:`unpackb()` instead.
+       This class must not be instantiated directly using its
+       constructor; use one of the methods mentioned above instead.
     """
-    __slots__ = [
-        'year', 'month', 'day',
-        'hour', 'minute', 'second',
-        'millisecond', 'microsecond', 'nanosecond',
-        'tz_offset',
-        '_has_date', '_has_time', '_struct']
+    __slots__ = ['_canonical']
 
     def __init__(
             self,
             year, month, day,
             hour, minute, second, nanosecond,
             tz_offset):
+        self._canonical = _canonical(
+            year, month, day, hour, minute, second, nanosecond, tz_offset)
+
+    @property
+    def year(self):
+        """Year component."""
+        year = self._canonical >> 63
+        return None if year == YEAR_EMPTY else year
+
+    @property
+    def month(self):
+        """Month component."""
+        month = self._canonical >> 59 & MONTH_MASK
+        return None if month == MONTH_EMPTY else month + 1
+
+    @property
+    def day(self):
+        """Day component."""
+        day = self._canonical >> 54 & DAY_MASK
+        return None if day == DAY_EMPTY else day + 1
+
+    @property
+    def hour(self):
+        """Hour component."""
+        hour = self._canonical >> 49 & HOUR_MASK
+        return None if hour == HOUR_EMPTY else hour
+
+    @property
+    def minute(self):
+        """Minute component."""
+        minute = self._canonical >> 43 & MINUTE_MASK
+        return None if minute == MINUTE_EMPTY else minute
+
+    @property
+    def second(self):
+        """Second component."""
+        second = self._canonical >> 37 & SECOND_MASK
+        return None if second == SECOND_EMPTY else second
+
+    @property
+    def millisecond(self):
+        """
+        Millisecond component. If set, :py:attr:`microsecond` and
+        :py:attr:`nanosecond` are also set.
+        """
+        nanosecond = self._canonical >> 7 & NANOSECOND_MASK
+        if nanosecond == SUBSECOND_EMPTY:
+            return None
+        return nanosecond // 1000000
 
-        #: Year component.
-        self.year = year
-
-        #: Month component.
-        self.month = month
-
-        #: Day component.
-        self.day = day
-
-        #: Hour component.
-        self.hour = hour
-
-        #: Minute component.
-        self.minute = minute
-
-        #: Second component.
-        self.second = second
-
-        if nanosecond is None:
-            self.millisecond = self.microsecond = self.nanosecond = None
-        else:
-            #: Millisecond component. If set, :py:attr:`microsecond` and
-            #: :py:attr:`nanosecond` are also set.
-            self.millisecond = nanosecond // 1000000
-
-            #: Microsecond component. If set, :py:attr:`millisecond` and
-            #: :py:attr:`nanosecond` are also set.
-            self.microsecond = nanosecond // 1000
-
-            #: Nanosecond component. If set, :py:attr:`millisecond` and
-            #: :py:attr:`microsecond` are also set.
-            self.nanosecond = nanosecond
-
-        #: Time zone offset (total minutes). To calculate the hours and
-        #: minutes, use ``h, m = divmod(offset, 60)``.
-        self.tz_offset = tz_offset
+    @property
+    def microsecond(self):
+        """
+        Microsecond component. If set, :py:attr:`millisecond` and
+        :py:attr:`nanosecond` are also set.
+        """
+        nanosecond = self._canonical >> 7 & NANOSECOND_MASK
+        if nanosecond == SUBSECOND_EMPTY:
+            return None
+        return nanosecond // 1000
 
-        self._has_date = not (year is None and month is None and day is None)
-        self._has_time = not (hour is None and minute is None
-                              and second is None)
+    @property
+    def nanosecond(self):
+        """
+        Nanosecond component. If set, :py:attr:`millisecond` and
+        :py:attr:`microsecond` are also set.
+        """
+        nanosecond = self._canonical >> 7 & NANOSECOND_MASK
+        return None if nanosecond == SUBSECOND_EMPTY else nanosecond
 
-        # This 'struct' contains the values that are relevant for
-        # comparison, hashing, and so on.
-        self._struct = (
-            self.year, self.month, self.day,
-            self.hour, self.minute, self.second, self.nanosecond,
-            self.tz_offset)
+    @property
+    def tz_offset(self):
+        """
+        Time zone offset (total minutes). To calculate the hours and
+        minutes, use ``h, m = divmod(offset, 60)``.
+        """
+        z = self._canonical & Z_MASK
+        return None if z == TIMEZONE_EMPTY else 15 * (z - 64)
+
+    def _fields(self):
+        # All components at once, in the order used by the decoders.
+        n = self._canonical
+        year = n >> 63
+        month = n >> 59 & MONTH_MASK
+        day = n >> 54 & DAY_MASK
+        hour = n >> 49 & HOUR_MASK
+        minute = n >> 43 & MINUTE_MASK
+        second = n >> 37 & SECOND_MASK
+        nanosecond = n >> 7 & NANOSECOND_MASK
+        z = n & Z_MASK
+        return (
+            None if year == YEAR_EMPTY else year,
+            None if month == MONTH_EMPTY else month + 1,
+            None if day == DAY_EMPTY else day + 1,
+            None if hour == HOUR_EMPTY else hour,
+            None if minute == MINUTE_EMPTY else minute,
+            None if second == SECOND_EMPTY else second,
+            None if nanosecond == SUBSECOND_EMPTY else nanosecond,
+            None if z == TIMEZONE_EMPTY else 15 * (z - 64))
 
     def __str__(self):
+        (year, month, day, hour, minute, second, nanosecond,
+         tz_offset) = self._fields()
+        has_date = not (year is None and month is None and day is None)
+        has_time = not (hour is None and minute is None and second is None)
         buf = []
 
-        if self._has_date:
-            buf.append("{0:04d}-".format(self.year)
-                       if self.year is not None else "????-")
-            buf.append("{0:02d}-".format(self.month)
-                       if self.month is not None else "??-")
-            buf.append("{0:02d}".format(self.day)
-                       if self.day is not None else "??")
+        if has_date:
+            buf.append("{0:04d}-".format(year)
+                       if year is not None else "????-")
+            buf.append("{0:02d}-".format(month)
+                       if month is not None else "??-")
+            buf.append("{0:02d}".format(day)
+                       if day is not None else "??")
 
-        if self._has_time:
+        if has_time:
 
-            if self._has_date:
+            if has_date:
                 buf.append(" ")  # separator
 
-            buf.append("{0:02d}:".format(self.hour)
-                       if self.hour is not None else "??:")
-            buf.append("{0:02d}:".format(self.minute)
-                       if self.minute is not None else "??:")
-            buf.append("{0:02d}".format(self.second)
-                       if self.second is not None else "??")
+            buf.append("{0:02d}:".format(hour)
+                       if hour is not None else "??:")
+            buf.append("{0:02d}:".format(minute)
+                       if minute is not None else "??:")
+            buf.append("{0:02d}".format(second)
+                       if second is not None else "??")
 
-        if self.nanosecond is not None:
-            if not self._has_time:
+        if nanosecond is not None:
+            if not has_time:
                 # Weird edge case: empty hour/minute/second, but
                 # sub-second precision is set.
                 buf.append("??:??:??")
 
-            if self.nanosecond == 0:
+            if nanosecond == 0:
                 buf.append('.0')
             else:
-                buf.append(".{0:09d}".format(self.nanosecond).rstrip("0"))
+                buf.append(".{0:09d}".format(nanosecond).rstrip("0"))
 
-        if self.tz_offset is not None:
-            if self.tz_offset == 0:
+        if tz_offset is not None:
+            if tz_offset == 0:
                 buf.append('Z')
             else:
-                h, m = divmod(self.tz_offset, 60)
+                h, m = divmod(tz_offset, 60)
                 sign = '+' if h >= 0 else '-'
                 buf.append('{0}{1:02d}:{2:02d}'.format(sign, h, m))
 
@@ -272,37 +999,193 @@ class Moment(object):
         return "<temporenc.Moment '{0}'>".format(self)
 
     def __eq__(self, other):
-        if not isinstance(other, type(self)):
+        if not isinstance(other, Moment):
             return NotImplemented
-        return self._struct == other._struct
+        return self._canonical == other._canonical
 
     def __ne__(self, other):
-        if not isinstance(other, type(self)):
+        if not isinstance(other, Moment):
             return NotImplemented
-        return self._struct != other._struct
+        return self._canonical != other._canonical
 
     def __gt__(self, other):
-        if not isinstance(other, type(self)):
+        if not isinstance(other, Moment):
             return NotImplemented
-        return self._struct > other._struct
+        return self._canonical > other._canonical
 
     def __ge__(self, other):
-        if not isinstance(other, type(self)):
+        if not isinstance(other, Moment):
             return NotImplemented
-        return self._struct >= other._struct
+        return self._canonical >= other._canonical
 
     def __lt__(self, other):
-        if not isinstance(other, type(self)):
+        if not isinstance(other, Moment):
             return NotImplemented
-        return self._struct < other._struct
+        return self._canonical < other._canonical
 
     def __le__(self, other):
-        if not isinstance(other, type(self)):
+        if not isinstance(other, Moment):
             return NotImplemented
-        return self._struct <= other._struct
+        return self._canonical <= other._canonical
 
     def __hash__(self):
-        return hash(self._struct)
+        return hash(self._canonical)
+
+    @classmethod
+    def from_fields(
+            cls,
+            year=None, month=None, day=None,
+            hour=None, minute=None, second=None,
+            millisecond=None, microsecond=None, nanosecond=None,
+            tz_offset=None):
+        """
+        Create an instance from individual components.
+
+        The components are checked in the same way as by
+        :py:func:`packb()`, which raises :py:exc:`ValueError` for
+        values that are out of range. As with :py:func:`packb()`, at
+        most one of the sub-second arguments should be specified.
+
+        :return: new instance
+        :rtype: :py:class:`Moment`
+        """
+        d, t, z = _check_components(
+            year, month, day, hour, minute, second,
+            millisecond, microsecond, nanosecond, tz_offset)
+
+        if nanosecond is not None:
+            subsecond = nanosecond
+        elif microsecond is not None:
+            subsecond = microsecond * 1000
+        elif millisecond is not None:
+            subsecond = millisecond * 1000000
+        else:
+            subsecond = SUBSECOND_EMPTY
+
+        moment = object.__new__(cls)
+        moment._canonical = (
+            d << CANONICAL_D_SHIFT | t << CANONICAL_T_SHIFT
+            | subsecond << CANONICAL_S_SHIFT | z)
+        return moment
+
+    @classmethod
+    def from_datetime(cls, value):
+        """
+        Create an instance from a ``datetime.datetime``,
+        ``datetime.date``, or ``datetime.time`` instance.
+
+        This uses the same components as :py:func:`packb()` would use
+        for the same `value`, including the time zone offset of time
+        zone aware values.
+
+        :param value: instance of one of the ``datetime`` classes
+        :return: new instance
+        :rtype: :py:class:`Moment`
+        """
+        if isinstance(value, datetime.datetime):
+            return cls.from_fields(
+                value.year, value.month, value.day,
+                value.hour, value.minute, value.second,
+                microsecond=value.microsecond,
+                tz_offset=_utc_offset_minutes(value))
+        elif isinstance(value, datetime.date):
+            return cls.from_fields(value.year, value.month, value.day)
+        elif isinstance(value, datetime.time):
+            return cls.from_fields(
+                hour=value.hour, minute=value.minute, second=value.second,
+                microsecond=value.microsecond,
+                tz_offset=_utc_offset_minutes(value))
+        raise ValueError("Cannot encode {0!r}".format(value))
+
+    def replace(self, **kwargs):
+        """
+        Create a copy with some components replaced.
+
+        This accepts the same keyword arguments as
+        :py:meth:`from_fields()`. Passing `None` removes a component,
+        e.g. ``moment.replace(tz_offset=None)`` strips the time zone
+        offset. Specifying any of the sub-second arguments replaces the
+        complete sub-second information.
+
+        :return: new instance
+        :rtype: :py:class:`Moment`
+        """
+        (year, month, day, hour, minute, second, nanosecond,
+         tz_offset) = self._fields()
+        fields = dict(
+            year=year, month=month, day=day,
+            hour=hour, minute=minute, second=second,
+            nanosecond=nanosecond, tz_offset=tz_offset)
+        if ('millisecond' in kwargs or 'microsecond' in kwargs
+                or 'nanosecond' in kwargs):
+            del fields['nanosecond']
+        fields.update(kwargs)
+        return Moment.from_fields(**fields)
+
+    def pack(self, type=None, precision='auto'):
+        """
+        Pack this value into a byte string.
+
+        The `type` works like the `type` argument for :py:func:`packb()`:
+        if not specified, the most compact type that can represent all
+        components is used. Components that the type cannot represent
+        are dropped.
+
+        For types with sub-second precision, the `precision` can be
+        ``'ms'``, ``'us'``, ``'ns'``, or `None` for no sub-second
+        information. Sub-second information beyond the precision is
+        truncated. The default, ``'auto'``, uses the smallest precision
+        that represents the sub-second information without loss (or no
+        sub-second information if there is none). Specifying a
+        precision for a value without sub-second information raises
+        :py:exc:`ValueError`.
+
+        The result is the same as passing the components of this value
+        to :py:func:`packb()`, but this is faster, since no range checks
+        are necessary.
+
+        :param str type: *temporenc* type
+        :param str precision: sub-second precision
+        :return: encoded *temporenc* value
+        :rtype: bytes
+        """
+        n = self._canonical
+        d = n >> CANONICAL_D_SHIFT
+        t = n >> CANONICAL_T_SHIFT & T_MASK
+        subsecond = n >> CANONICAL_S_SHIFT & NANOSECOND_MASK
+        z = n & Z_MASK
+        has_s = subsecond != SUBSECOND_EMPTY
+
+        if type is None:
+            type = _infer_type(
+                d != D_MASK, t != T_MASK, has_s, z != TIMEZONE_EMPTY)
+        elif type not in SUPPORTED_TYPES:
+            raise ValueError("invalid temporenc type: {0!r}".format(type))
+
+        if not (type == 'DTS' or type == 'DTSZ'):
+            return encoders[type, None](d, t, 0, z)
+
+        if precision == 'auto':
+            if not has_s:
+                bits = 0b11
+            elif subsecond % 1000000 == 0:
+                bits = 0b00
+            elif subsecond % 1000 == 0:
+                bits = 0b01
+            else:
+                bits = 0b10
+        elif precision not in PRECISIONS:
+            raise ValueError("invalid precision: {0!r}".format(precision))
+        else:
+            bits = PRECISIONS[precision]
+            if bits != 0b11 and not has_s:
+                raise ValueError("value has no sub-second information")
+
+        if bits == 0b11:
+            subsecond = 0
+        else:
+            subsecond //= SUBSECOND_DIVISORS[bits]
+        return encoders[type, bits](d, t, subsecond, z)
 
     def datetime(self, strict=True):
         """
@@ -341,46 +1224,7 @@ class Moment(object):
         :rtype: `datetime.datetime`
         """
 
-        if strict:
-            if None in (self.year, self.month, self.day):
-                raise ValueError("incomplete date information")
-            if None in (self.hour, self.minute, self.second):
-                raise ValueError("incomplete time information")
-
-        hour, minute, second = self.hour, self.minute, self.second
-        year, month, day = self.year, self.month, self.day
-
-        # The stdlib's datetime classes always specify microseconds.
-        us = self.microsecond if self.microsecond is not None else 0
-
-        if not strict:
-            # Substitute defaults for missing values.
-            if year is None:
-                year = 1
-
-            if month is None:
-                month = 1
-
-            if day is None:
-                day = 1
-
-            if hour is None:
-                hour = 0
-
-            if minute is None:
-                minute = 0
-
-            if second is None:
-                second = 0
-            elif second == 60:  # assume that this is a leap second
-                second = 59
-
-        dt = datetime.datetime(
-            year, month, day,
-            hour, minute, second, us,
-            tzinfo=cached_tzinfo(self.tz_offset))
-
-        return dt
+        return _to_datetime(*self._fields(), strict=strict)
 
     def date(self, strict=True):
         """
@@ -394,14 +1238,7 @@ class Moment(object):
         :return: converted value
         :rtype: `datetime.date`
         """
-        if strict:
-            if None in (self.year, self.month, self.day):
-                raise ValueError("incomplete date information")
-
-            # Shortcut for performance reasons
-            return datetime.date(self.year, self.month, self.day)
-
-        return self.datetime(strict=False).date()
+        return _to_date(*self._fields(), strict=strict)
 
     def time(self, strict=True):
         """
@@ -415,26 +1252,162 @@ class Moment(object):
         :return: converted value
         :rtype: `datetime.time`
         """
-        if strict:
-            if None in (self.hour, self.minute, self.second):
-                raise ValueError("incomplete time information")
+        return _to_time(*self._fields(), strict=strict)
 
-            # Shortcut for performance reasons
-            return datetime.time(
-                self.hour, self.minute, self.second,
-                self.microsecond if self.microsecond is not None else 0,
-                tzinfo=cached_tzinfo(self.tz_offset))
+    def timestamp_ns(self):
+        """
+        Convert this value to the number of nanoseconds since the Unix
+        epoch, like ``time.time_ns()``.
 
-        return self.datetime(strict=False).timetz()
+        This requires complete date information. Values without any time
+        information represent midnight. If a time zone offset is present,
+        it is subtracted to obtain UTC; otherwise the value is assumed to
+        be in UTC. Leap seconds are treated as the preceding second,
+        since Unix time does not support them.
 
+        This uses integer arithmetic only, so no precision is lost.
 
-def packb(
-        value=None, type=None,
-        year=None, month=None, day=None,
-        hour=None, minute=None, second=None,
-        millisecond=None, microsecond=None, nanosecond=None,
-        tz_offset=None):
-    """
+        :return: number of nanoseconds since the Unix epoch
+        :rtype: int
+        """
+        return _to_epoch(*self._fields(), per_second=1000000000)
+
+
+class LazyMoment(Moment):
+    """
+    :py:class:`Moment` that is only decoded when it is actually used.
+
+    Instances keep the encoded value, and split it into its components
+    when any attribute or method that requires those is used for the
+    first time. Instances are returned by :py:func:`unpackb()` when
+    called with ``lazy=True``.
+    """
+    __slots__ = ['_value']
+
+    def __init__(self, value):
+        self._value = value
+
+    def __getattr__(self, name):
+        # This is only called for attributes that are not set, which
+        # means the value has not been decoded yet.
+        if name != '_canonical':
+            raise AttributeError(name)
+        value = self._value
+        decode = tag_table[_read_1(value, 0)][3]
+        self._canonical = decode(value, 0)
+        return self._canonical
+
+    def __eq__(self, other):
+        # Identical encoded values always represent the same moment.
+        if isinstance(other, LazyMoment) and self._value == other._value:
+            return True
+        return super(LazyMoment, self).__eq__(other)
+
+    def __ne__(self, other):
+        if isinstance(other, LazyMoment) and self._value == other._value:
+            return False
+        return super(LazyMoment, self).__ne__(other)
+
+    # Defining __eq__ disables the inherited __hash__ on Python 3.
+    __hash__ = Moment.__hash__
+
+
+def _infer_type(has_d, has_t, has_s, has_z):
+    """
+    Determine the most compact type for the available components.
+    """
+    if has_z and has_s:
+        return 'DTSZ'
+    elif has_z:
+        return 'DTZ'
+    elif has_s:
+        return 'DTS'
+    elif has_d and has_t:
+        return 'DT'
+    elif has_d:
+        return 'D'
+    elif has_t:
+        return 'T'
+    else:
+        # No information at all, just use the smallest type
+        return 'D'
+
+
+def _check_components(
+        year, month, day, hour, minute, second,
+        millisecond, microsecond, nanosecond, tz_offset):
+    """
+    Check the ranges of the components, and combine them into the D, T,
+    and Z components. Missing components are set to their empty value.
+    """
+    if year is None:
+        year = YEAR_EMPTY
+    elif not 0 <= year <= YEAR_MAX:
+        raise ValueError("year not within supported range")
+
+    if month is None:
+        month = MONTH_EMPTY
+    else:
+        month -= 1
+        if not 0 <= month <= MONTH_MAX:
+            raise ValueError("month not within supported range")
+
+    if day is None:
+        day = DAY_EMPTY
+    else:
+        day -= 1
+        if not 0 <= day <= DAY_MAX:
+            raise ValueError("day not within supported range")
+
+    if hour is None:
+        hour = HOUR_EMPTY
+    elif not 0 <= hour <= HOUR_MAX:
+        raise ValueError("hour not within supported range")
+
+    if minute is None:
+        minute = MINUTE_EMPTY
+    elif not 0 <= minute <= MINUTE_MAX:
+        raise ValueError("minute not within supported range")
+
+    if second is None:
+        second = SECOND_EMPTY
+    elif not 0 <= second <= SECOND_MAX:
+        raise ValueError("second not within supported range")
+
+    if (millisecond is not None
+            and not 0 <= millisecond <= MILLISECOND_MAX):
+        raise ValueError("millisecond not within supported range")
+
+    if (microsecond is not None
+            and not 0 <= microsecond <= MICROSECOND_MAX):
+        raise ValueError("microsecond not within supported range")
+
+    if (nanosecond is not None
+            and not 0 <= nanosecond <= NANOSECOND_MAX):
+        raise ValueError("nanosecond not within supported range")
+
+    if tz_offset is None:
+        z = TIMEZONE_EMPTY
+    else:
+        z, remainder = divmod(tz_offset, 15)
+        if remainder:
+            raise ValueError("tz_offset must be a multiple of 15")
+        z += 64
+        if not 0 <= z <= TIMEZONE_MAX:
+            raise ValueError("tz_offset not within supported range")
+
+    d = year << 9 | month << 5 | day
+    t = hour << 12 | minute << 6 | second
+    return d, t, z
+
+
+def packb(
+        value=None, type=None,
+        year=None, month=None, day=None,
+        hour=None, minute=None, second=None,
+        millisecond=None, microsecond=None, nanosecond=None,
+        tz_offset=None):
+    """
     Pack date and time information into a byte string.
 
     If specified, `value` must be a ``datetime.datetime``,
@@ -456,7 +1429,9 @@ def packb(
     .. note::
 
        Applications that require lexicographical ordering of encoded
-       values should always explicitly specify a type to use.
+       values should always explicitly specify a type to use, or use
+       :py:func:`ordering_key()` to get keys that sort correctly across
+       types and precisions.
 
     All other arguments can be used to specify individual pieces of
     information that make up a date or time. If both `value` and more
@@ -538,83 +1513,318 @@ def packb(
     #
 
     if type is None:
-        has_d = not (year is None and month is None and day is None)
-        has_t = not (hour is None and minute is None and second is None)
-        has_s = not (millisecond is None and microsecond is None
-                     and nanosecond is None)
-        has_z = tz_offset is not None
-
-        if has_z and has_s:
-            type = 'DTSZ'
-        elif has_z:
-            type = 'DTZ'
-        elif has_s:
-            type = 'DTS'
-        elif has_d and has_t:
-            type = 'DT'
-        elif has_d:
-            type = 'D'
-        elif has_t:
-            type = 'T'
-        else:
-            # No information at all, just use the smallest type
-            type = 'D'
+        type = _infer_type(
+            not (year is None and month is None and day is None),
+            not (hour is None and minute is None and second is None),
+            not (millisecond is None and microsecond is None
+                 and nanosecond is None),
+            tz_offset is not None)
 
     elif type not in SUPPORTED_TYPES:
         raise ValueError("invalid temporenc type: {0!r}".format(type))
 
     #
-    # Value checking
+    # Byte packing
     #
 
-    if year is None:
-        year = YEAR_EMPTY
-    elif not 0 <= year <= YEAR_MAX:
-        raise ValueError("year not within supported range")
+    d, t, z = _check_components(
+        year, month, day, hour, minute, second,
+        millisecond, microsecond, nanosecond, tz_offset)
 
-    if month is None:
-        month = MONTH_EMPTY
+    if type == 'DTS' or type == 'DTSZ':
+        if nanosecond is not None:
+            return encoders[type, 0b10](d, t, nanosecond, z)
+        elif microsecond is not None:
+            return encoders[type, 0b01](d, t, microsecond, z)
+        elif millisecond is not None:
+            return encoders[type, 0b00](d, t, millisecond, z)
+        else:
+            return encoders[type, 0b11](d, t, 0, z)
+
+    return encoders[type, None](d, t, 0, z)
+
+
+def pack(fp, *args, **kwargs):
+    """
+    Pack date and time information and write it to a file-like object.
+
+    This is a short-hand for writing a packed value directly to
+    a file-like object. There is no additional behaviour. This function
+    only exists for API parity with the :py:func:`unpack()` function.
+
+    Except for the first argument (the file-like object), all arguments
+    (both positional and keyword) are passed on to :py:func:`packb()`.
+    See :py:func:`packb()` for more information.
+
+    To write many values, use a :py:class:`TemporencWriter`, which
+    performs far fewer write operations on the underlying stream.
+
+    :param file-like fp: writeable file-like object
+    :param args: propagated to :py:func:`packb()`
+    :param kwargs: propagated to :py:func:`packb()`
+    :return: number of bytes written
+    :rtype: int
+    """
+    return fp.write(packb(*args, **kwargs))
+
+
+class TemporencWriter(object):
+    """
+    Buffered writer for *temporenc* values.
+
+    Values written using :py:meth:`write()` or :py:meth:`write_many()`
+    are packed and collected in a buffer. As soon as the buffer contains
+    at least `buffer_size` bytes, its contents are written to `fp` using
+    a single write operation. This is much more efficient than calling
+    :py:func:`pack()` for each value, especially for unbuffered streams
+    like sockets.
+
+    Call :py:meth:`flush()` to write any buffered values. Instances can
+    be used as a context manager, which calls :py:meth:`flush()` at the
+    end. The writer never closes `fp`.
+
+    If `fp` is a non-blocking stream that cannot accept more data, this
+    raises :py:exc:`BlockingIOError`. Any values that have not been
+    written yet stay in the buffer, and are written by the next call to
+    :py:meth:`flush()`.
+
+    :param file-like fp: writeable file-like object
+    :param str type: *temporenc* type used for all values (optional)
+    :param int buffer_size: number of bytes to collect before writing
+    """
+
+    def __init__(self, fp, type=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        if type is not None and type not in SUPPORTED_TYPES:
+            raise ValueError("invalid temporenc type: {0!r}".format(type))
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be positive")
+        self._fp = fp
+        self._type = type
+        self._buffer_size = buffer_size
+        self._buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def write(self, value=None, **kwargs):
+        """
+        Pack a value and add it to the buffer.
+
+        All arguments are passed on to :py:func:`packb()`, using the
+        type of this writer unless a `type` argument is specified.
+
+        :param value: instance of one of the ``datetime`` classes
+        :param kwargs: propagated to :py:func:`packb()`
+        :return: number of bytes added
+        :rtype: int
+        """
+        if 'type' not in kwargs:
+            kwargs['type'] = self._type
+        packed = packb(value, **kwargs)
+        self._buffer += packed
+        if len(self._buffer) >= self._buffer_size:
+            self._write_buffer()
+        return len(packed)
+
+    def write_many(self, values):
+        """
+        Pack all values from an iterable and add them to the buffer.
+
+        Each value is packed using ``packb(value, type=type)``, where
+        `type` is the type of this writer.
+
+        :param iterable values: instances of the ``datetime`` classes
+        :return: number of bytes added
+        :rtype: int
+        """
+        buf = self._buffer
+        buffer_size = self._buffer_size
+        type = self._type
+        total = len(buf)
+        written = 0
+        for value in values:
+            buf += packb(value, type=type)
+            if len(buf) >= buffer_size:
+                written += len(buf)
+                self._write_buffer()
+        return written + len(buf) - total
+
+    def flush(self):
+        """
+        Write all buffered values, and flush `fp` (if supported).
+        """
+        self._write_buffer()
+        flush = getattr(self._fp, 'flush', None)
+        if flush is not None:
+            flush()
+
+    def _write_buffer(self):
+        buf = self._buffer
+        if not buf:
+            return
+        view = memoryview(buf)
+        pos = 0
+        try:
+            end = len(buf)
+            while pos < end:
+                # Raw streams may perform partial writes, and non-blocking
+                # raw streams return None if nothing could be written. The
+                # chunk is released explicitly, since a traceback may still
+                # refer to it, which would prevent resizing the buffer.
+                chunk = view[pos:]
+                try:
+                    n = self._fp.write(chunk)
+                finally:
+                    chunk.release()
+                if n is None:
+                    if PY2 and not isinstance(self._fp, io.RawIOBase):
+                        # Python 2 file objects write everything, but
+                        # always return None.
+                        n = end - pos
+                    else:
+                        raise io.BlockingIOError(
+                            errno.EAGAIN,
+                            "write could not complete without blocking",
+                            pos)
+                pos += n
+        finally:
+            view.release()
+            # Only keep the part that has not been written yet, so that
+            # writing can be retried after an error.
+            del buf[:pos]
+
+
+def make_packer(type, precision='us', source='datetime'):
+    """
+    Create a specialized packing function for a fixed type and input.
+
+    This returns a function that takes a single instance of one of the
+    ``datetime`` classes and returns the encoded value. The returned
+    function is specialized for the specified `type`, `precision` and
+    `source`, which makes it considerably faster than calling
+    :py:func:`packb()` over and over again with identical arguments.
+
+    The `type` specifies the *temporenc* type, and works like the `type`
+    argument for :py:func:`packb()`, except that it is required. For
+    types with sub-second precision, the `precision` specifies the
+    precision to use: ``'ms'``, ``'us'`` (the default), ``'ns'``, or
+    `None` for no sub-second information. Since the ``datetime`` classes
+    use microsecond precision, ``'ms'`` truncates the value.
+
+    The `source` specifies the input type: ``'datetime'`` (the default)
+    for ``datetime.datetime`` instances, ``'date'`` for
+    ``datetime.date`` instances, and ``'time'`` for ``datetime.time``
+    instances. The returned function does not check the type of its
+    argument.
+
+    The result is the same as calling :py:func:`packb()` with the same
+    `type` and the sub-second value passed explicitly, e.g.
+    ``make_packer('DTS', 'ms')(value)`` is equivalent to ``packb(value,
+    type='DTS', millisecond=value.microsecond // 1000)``. Date sources
+    have a sub-second value of zero.
+
+    :param str type: *temporenc* type
+    :param str precision: sub-second precision
+    :param str source: input type
+    :return: packing function
+    :rtype: callable
+    """
+
+    if type not in SUPPORTED_TYPES:
+        raise ValueError("invalid temporenc type: {0!r}".format(type))
+
+    if precision not in PRECISIONS:
+        raise ValueError("invalid precision: {0!r}".format(precision))
+
+    if type == 'DTS' or type == 'DTSZ':
+        encode = encoders[type, PRECISIONS[precision]]
     else:
-        month -= 1
-        if not 0 <= month <= MONTH_MAX:
-            raise ValueError("month not within supported range")
+        encode = encoders[type, None]
+        precision = None
 
-    if day is None:
-        day = DAY_EMPTY
+    # Sub-second values are calculated as 'microsecond * mul // div'.
+    mul, div = {'ms': (1, 1000), 'us': (1, 1), 'ns': (1000, 1)}.get(
+        precision, (0, 1))
+
+    if type == 'DTZ' or type == 'DTSZ':
+        tz_component = _tz_component
     else:
-        day -= 1
-        if not 0 <= day <= DAY_MAX:
-            raise ValueError("day not within supported range")
+        tz_component = _no_tz_component
+
+    if source == 'datetime':
+        def packer(value):
+            year = value.year
+            if year > YEAR_MAX:
+                raise ValueError("year not within supported range")
+            return encode(
+                year << 9 | (value.month - 1) << 5 | (value.day - 1),
+                value.hour << 12 | value.minute << 6 | value.second,
+                value.microsecond * mul // div,
+                tz_component(value))
+
+    elif source == 'date':
+        def packer(value):
+            year = value.year
+            if year > YEAR_MAX:
+                raise ValueError("year not within supported range")
+            return encode(
+                year << 9 | (value.month - 1) << 5 | (value.day - 1),
+                T_MASK, 0, TIMEZONE_EMPTY)
+
+    elif source == 'time':
+        def packer(value):
+            return encode(
+                D_MASK,
+                value.hour << 12 | value.minute << 6 | value.second,
+                value.microsecond * mul // div,
+                tz_component(value))
 
-    if hour is None:
-        hour = HOUR_EMPTY
-    elif not 0 <= hour <= HOUR_MAX:
-        raise ValueError("hour not within supported range")
+    else:
+        raise ValueError("invalid source: {0!r}".format(source))
 
-    if minute is None:
-        minute = MINUTE_EMPTY
-    elif not 0 <= minute <= MINUTE_MAX:
-        raise ValueError("minute not within supported range")
+    return packer
 
-    if second is None:
-        second = SECOND_EMPTY
-    elif not 0 <= second <= SECOND_MAX:
-        raise ValueError("second not within supported range")
 
-    if (millisecond is not None
-            and not 0 <= millisecond <= MILLISECOND_MAX):
-        raise ValueError("millisecond not within supported range")
+def packb_epoch(value, unit='ns', type=None, tz_offset=None):
+    """
+    Pack an integer Unix time into a *temporenc* value.
+
+    This converts the number of `unit` (``'s'``, ``'ms'``, ``'us'``, or
+    ``'ns'``) since the Unix epoch, like the result of
+    ``time.time_ns()``, directly into a *temporenc* value, without
+    creating an intermediate ``datetime`` instance, and without losing
+    any precision. For types ``DTS`` and ``DTSZ``, the sub-second
+    precision matches the `unit`.
+
+    If `tz_offset` (in minutes) is specified, the date and time fields
+    are in local time, i.e. the offset is added to the UTC time. If
+    `type` is not specified, ``DTSZ`` is used if a `tz_offset` is
+    specified, and ``DTS`` otherwise.
+
+    :param int value: number of units since the Unix epoch
+    :param str unit: unit of `value`
+    :param str type: *temporenc* type
+    :param int tz_offset: time zone offset in minutes from UTC
+    :return: encoded value
+    :rtype: bytes
+    """
+    try:
+        per_second, precision = EPOCH_UNITS[unit]
+    except KeyError:
+        raise ValueError("invalid unit: {0!r}".format(unit))
 
-    if (microsecond is not None
-            and not 0 <= microsecond <= MICROSECOND_MAX):
-        raise ValueError("microsecond not within supported range")
+    if type is None:
+        type = 'DTS' if tz_offset is None else 'DTSZ'
+    elif type not in SUPPORTED_TYPES:
+        raise ValueError("invalid temporenc type: {0!r}".format(type))
 
-    if (nanosecond is not None
-            and not 0 <= nanosecond <= NANOSECOND_MAX):
-        raise ValueError("nanosecond not within supported range")
+    seconds, subsecond = divmod(value, per_second)
 
     if tz_offset is None:
-        tz_offset = TIMEZONE_EMPTY
+        z = TIMEZONE_EMPTY
     else:
         z, remainder = divmod(tz_offset, 15)
         if remainder:
@@ -622,297 +1832,475 @@ def packb(
         z += 64
         if not 0 <= z <= TIMEZONE_MAX:
             raise ValueError("tz_offset not within supported range")
+        seconds += tz_offset * 60
 
-    #
-    # Byte packing
-    #
+    days, seconds = divmod(seconds, 86400)
+    year, month, day = _civil_from_days(days)
+    if not 0 <= year <= YEAR_MAX:
+        raise ValueError("year not within supported range")
+    hour, seconds = divmod(seconds, 3600)
+    minute, second = divmod(seconds, 60)
 
-    d = year << 9 | month << 5 | day
+    d = year << 9 | (month - 1) << 5 | (day - 1)
     t = hour << 12 | minute << 6 | second
 
-    if type == 'D':
-        # 100DDDDD DDDDDDDD DDDDDDDD
-        return pack_4(0b100 << 21 | d)[-3:]
+    if type == 'DTS' or type == 'DTSZ':
+        return encoders[type, PRECISIONS[precision]](d, t, subsecond, z)
 
-    elif type == 'T':
-        # 1010000T TTTTTTTT TTTTTTTT
-        return pack_4(0b1010000 << 17 | t)[-3:]
+    return encoders[type, None](d, t, 0, z)
 
-    elif type == 'DT':
-        # 00DDDDDD DDDDDDDD DDDDDDDT TTTTTTTT
-        # TTTTTTTT
-        return pack_8(d << 17 | t)[-5:]
 
-    elif type == 'DTZ':
-        # 110DDDDD DDDDDDDD DDDDDDDD TTTTTTTT
-        # TTTTTTTT TZZZZZZZ
-        return pack_8(0b110 << 45 | d << 24 | t << 7 | z)[-6:]
+def _transcoder(source_type, source_precision, type, precision):
+    """
+    Get the encoder and sub-second divisor for transcoding values.
 
-    elif type == 'DTS':
-        if nanosecond is not None:
-            # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
-            # TTTTTTTT TTSSSSSS SSSSSSSS SSSSSSSS
-            # SSSSSSSS
-            return pack_2_8(
-                0b0110 << 4 | d >> 17,
-                (d & 0x1ffff) << 47 | t << 30 | nanosecond)[-9:]
-        elif microsecond is not None:
-            # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
-            # TTTTTTTT TTSSSSSS SSSSSSSS SSSSSS00
-            return pack_8(
-                0b0101 << 60 | d << 39 | t << 22 | microsecond << 2)
-        elif millisecond is not None:
-            # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
-            # TTTTTTTT TTSSSSSS SSSS0000
-            return pack_8(
-                0b0100 << 52 | d << 31 | t << 14 | millisecond << 4)[-7:]
-        else:
-            # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
-            # TTTTTTTT TT000000
-            return pack_8(0b0111 << 44 | d << 23 | t << 6)[-6:]
+    The divisor converts nanoseconds to the unit of the target
+    precision; it is None if the target has no sub-second component.
+    """
+    if type is None:
+        type = source_type
+    elif type not in SUPPORTED_TYPES:
+        raise ValueError("invalid temporenc type: {0!r}".format(type))
 
-    elif type == 'DTSZ':
-        if nanosecond is not None:
-            # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
-            # TTTTTTTT TTTSSSSS SSSSSSSS SSSSSSSS
-            # SSSSSSSS SZZZZZZZ
-            return pack_2_8(
-                0b11110 << 11 | d >> 10,
-                (d & 0x3ff) << 54 | t << 37 | nanosecond << 7 | z)
-        elif microsecond is not None:
-            # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
-            # TTTTTTTT TTTSSSSS SSSSSSSS SSSSSSSZ
-            # ZZZZZZ00
-            return pack_2_8(
-                0b11101 << 3 | d >> 18,
-                (d & 0x3ffff) << 46 | t << 29 | microsecond << 9 | z << 2)[-9:]
-        elif millisecond is not None:
-            # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
-            # TTTTTTTT TTTSSSSS SSSSSZZZ ZZZZ0000
-            return pack_8(
-                0b11100 << 59 | d << 38 | t << 21 | millisecond << 11 | z << 4)
-        else:
-            # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
-            # TTTTTTTT TTTZZZZZ ZZ000000
-            return pack_8(0b11111 << 51 | d << 30 | t << 13 | z << 6)[-7:]
+    if not (type == 'DTS' or type == 'DTSZ'):
+        return encoders[type, None], None
 
+    has_s = source_precision is not None and source_precision != 0b11
+    if precision == 'keep':
+        bits = source_precision if has_s else 0b11
+    elif precision not in PRECISIONS:
+        raise ValueError("invalid precision: {0!r}".format(precision))
+    else:
+        bits = PRECISIONS[precision]
+        if bits != 0b11 and not has_s:
+            raise ValueError("value has no sub-second information")
 
-def pack(fp, *args, **kwargs):
+    return encoders[type, bits], SUBSECOND_DIVISORS.get(bits)
+
+
+def transcode(value, type=None, precision='keep', validate=True):
     """
-    Pack date and time information and write it to a file-like object.
+    Convert an encoded value to another type or precision.
+
+    This converts the encoded value directly, without creating
+    a :py:class:`Moment` or ``datetime`` instance, which is a lot faster
+    than unpacking and packing it again.
+
+    The `type` specifies the target *temporenc* type. For types with
+    sub-second precision, the `precision` can be ``'ms'``, ``'us'``,
+    ``'ns'``, or `None` for no sub-second information. By default, the
+    type and precision of the input value are kept. Components that the
+    target type cannot represent are dropped, e.g. converting ``DTSZ``
+    to ``DTS`` drops the time zone offset, and converting ``DT`` to
+    ``D`` drops the time. Sub-second information beyond the target
+    precision is truncated. Converting a value without sub-second
+    information to a specific precision raises :py:exc:`ValueError`.
+
+    The input value is validated like :py:func:`unpackb()` does, unless
+    `validate` is false.
+
+    :param bytes value: encoded *temporenc* value
+    :param str type: *temporenc* type
+    :param str precision: sub-second precision, or ``'keep'``
+    :param bool validate: whether to validate the input value
+    :return: encoded *temporenc* value
+    :rtype: bytes
+    """
+    source_type, source_precision, _, decode, decode_trusted = (
+        _detect_value(value))
+    encode, divisor = _transcoder(
+        source_type, source_precision, type, precision)
+    n = (decode if validate else decode_trusted)(value, 0)
+    return encode(
+        n >> CANONICAL_D_SHIFT,
+        n >> CANONICAL_T_SHIFT & T_MASK,
+        0 if divisor is None else (
+            n >> CANONICAL_S_SHIFT & NANOSECOND_MASK) // divisor,
+        n & Z_MASK)
+
+
+def transcode_buffer(buffer, type=None, precision='keep', validate=True):
+    """
+    Convert a buffer of same-type encoded values to another type or
+    precision.
+
+    The `buffer` must contain values of the same type and precision,
+    back to back, like the data in a column file. The result contains
+    the converted values, back to back. See :py:func:`transcode()` for
+    a description of the other arguments.
+
+    :param buffer: buffer, e.g. `bytes`
+    :param str type: *temporenc* type
+    :param str precision: sub-second precision, or ``'keep'``
+    :param bool validate: whether to validate the input values
+    :return: encoded *temporenc* values
+    :rtype: bytes
+    """
+    size = len(buffer)
+    if not size:
+        return b''
+
+    first = _read_1(buffer, 0)
+    source_type, source_precision, length, decode, decode_trusted = (
+        tag_table[first])
+    if source_type is None:
+        raise ValueError("first byte does not contain a valid tag")
+    if size % length:
+        raise ValueError("buffer size is not a multiple of the value size")
+
+    encode, divisor = _transcoder(
+        source_type, source_precision, type, precision)
+    if not validate:
+        decode = decode_trusted
+    mask = TAG_MASKS[source_type]
+    tag = first & mask
+
+    result = []
+    append = result.append
+    for offset in range(0, size, length):
+        if validate and _read_1(buffer, offset) & mask != tag:
+            raise ValueError(
+                "all values must have the same type and precision")
+        n = decode(buffer, offset)
+        append(encode(
+            n >> CANONICAL_D_SHIFT,
+            n >> CANONICAL_T_SHIFT & T_MASK,
+            0 if divisor is None else (
+                n >> CANONICAL_S_SHIFT & NANOSECOND_MASK) // divisor,
+            n & Z_MASK))
+    return b''.join(result)
+
+
+def sort_key(value):
+    """
+    Get a sort key for an encoded *temporenc* value.
 
-    This is a short-hand for writing a packed value directly to
-    a file-like object. There is no additional behaviour. This function
-    only exists for API parity with the :py:func:`unpack()` function.
+    Encoded values of the same type and precision sort in the same order
+    as the :py:class:`Moment` instances they represent, so values can be
+    sorted without decoding them, e.g. ``sorted(values, key=sort_key)``.
+    Missing components sort after any other value. This function checks
+    that the value looks valid, and normalizes buffer types like
+    `bytearray` to `bytes`.
 
-    Except for the first argument (the file-like object), all arguments
-    (both positional and keyword) are passed on to :py:func:`packb()`.
-    See :py:func:`packb()` for more information.
+    The returned keys are only meaningful for values of the same type
+    and precision. Use :py:func:`sorted_encoded()` to sort values with
+    a check that this is the case.
 
-    :param file-like fp: writeable file-like object
-    :param args: propagated to :py:func:`packb()`
-    :param kwargs: propagated to :py:func:`packb()`
-    :return: number of bytes written
+    :param bytes value: encoded value
+    :return: sort key
+    :rtype: bytes
+    """
+    _tag_bits(value)
+    return _to_bytes(value)
+
+
+def compare_encoded(a, b):
+    """
+    Compare two encoded *temporenc* values without decoding them.
+
+    This returns a negative number if `a` sorts before `b`, zero if they
+    are equal, and a positive number if `a` sorts after `b`, using the
+    same ordering as :py:class:`Moment` instances. Both values must have
+    the same type and precision; if not, this raises
+    :py:exc:`ValueError`.
+
+    :param bytes a: encoded value
+    :param bytes b: encoded value
+    :return: comparison result
     :rtype: int
     """
-    return fp.write(packb(*args, **kwargs))
+    if _tag_bits(a) != _tag_bits(b):
+        raise ValueError(
+            "cannot compare values with different types or precisions")
+    a = _to_bytes(a)
+    b = _to_bytes(b)
+    return (a > b) - (a < b)
+
+
+def sorted_encoded(values, reverse=False, unique=False):
+    """
+    Sort encoded *temporenc* values without decoding them.
+
+    This returns a new list containing the values from the `values`
+    iterable in sorted order, as `bytes` instances. The ordering is the
+    same as for :py:class:`Moment` instances. All values must have the
+    same type and precision; if not, this raises :py:exc:`ValueError`.
+
+    If `unique` is true, duplicate values are removed.
 
+    :param iterable values: encoded values
+    :param bool reverse: whether to sort in descending order
+    :param bool unique: whether to remove duplicates
+    :return: sorted values
+    :rtype: list of bytes
+    """
+    values = [_to_bytes(value) for value in values]
+    if values:
+        tags = set(_tag_bits(value) for value in values)
+        if len(tags) > 1:
+            raise ValueError(
+                "cannot sort values with different types or precisions")
+    if unique:
+        values = set(values)
+    return sorted(values, reverse=reverse)
 
-def unpackb(value):
+
+# Ordering keys contain the integer used by Moment, followed by the type
+# and the precision bits, so that values with equal components but
+# different types still have distinct keys:
+#
+#   <75 bits: D, T, S (in nanoseconds), and Z components> TTTPP
+ORDERING_KEY_TYPES = ('D', 'T', 'DT', 'DTZ', 'DTS', 'DTSZ')
+ORDERING_KEY_SIZE = 10
+
+
+def ordering_key(value, validate=True):
+    """
+    Get a fixed-width ordering key for an encoded *temporenc* value.
+
+    Unlike :py:func:`sort_key()`, this works for values of any type and
+    precision: the keys of different values sort in the same order as
+    the :py:class:`Moment` instances they represent, and values with
+    equal components, but a different type or precision, get different
+    keys. All keys are 10 bytes long, which makes them suitable for use
+    in composite keys, e.g. in key-value stores that sort keys
+    byte-wise. Use :py:func:`from_ordering_key()` to get the original
+    value back.
+
+    The input value is validated like :py:func:`unpackb()` does, unless
+    `validate` is false.
+
+    :param bytes value: encoded *temporenc* value
+    :param bool validate: whether to validate the input value
+    :return: ordering key
+    :rtype: bytes
+    """
+    type, precision, _, decode, decode_trusted = _detect_value(value)
+    n = (decode if validate else decode_trusted)(value, 0)
+    n = n << 5 | ORDERING_KEY_TYPES.index(type) << 2
+    if precision is None:
+        n |= 0b11
+    else:
+        n |= precision
+    return pack_2_8(n >> 64, n & 0xffffffffffffffff)
+
+
+def from_ordering_key(key):
+    """
+    Get the encoded *temporenc* value for an ordering key.
+
+    This is the inverse of :py:func:`ordering_key()`. If `key` is not
+    a valid ordering key, this raises :py:exc:`ValueError`.
+
+    :param bytes key: ordering key
+    :return: encoded *temporenc* value
+    :rtype: bytes
+    """
+    if len(key) != ORDERING_KEY_SIZE:
+        raise ValueError("ordering key must be {0:d} bytes; got {1:d}".format(
+            ORDERING_KEY_SIZE, len(key)))
+    n = _read_10(key, 0)
+    code = n >> 2 & 0b111
+    if code >= len(ORDERING_KEY_TYPES):
+        raise ValueError("ordering key contains an invalid type")
+    type = ORDERING_KEY_TYPES[code]
+    precision = n & 0b11
+    n >>= 5
+
+    if type == 'DTS' or type == 'DTSZ':
+        s = n >> CANONICAL_S_SHIFT & NANOSECOND_MASK
+        if precision != 0b11:
+            s //= SUBSECOND_DIVISORS[precision]
+        encode = encoders[type, precision]
+    elif precision == 0b11:
+        s = 0
+        encode = encoders[type, None]
+    else:
+        raise ValueError("ordering key contains an invalid precision")
+
+    value = encode(
+        n >> CANONICAL_D_SHIFT, n >> CANONICAL_T_SHIFT & T_MASK, s,
+        n & Z_MASK)
+
+    # Decoding the result checks the components, and comparing the
+    # result with the key catches components that the type cannot
+    # represent, such as a time in a D value.
+    if tag_table[_read_1(value, 0)][3](value, 0) != n:
+        raise ValueError("ordering key does not represent a valid value")
+    return value
+
+
+def unpackb(value, lazy=False, validate=True):
     """
     Unpack a *temporenc* value from a byte string.
 
     If no valid value could be read, this raises :py:exc:`ValueError`.
 
+    If `validate` is false, only the tag, and whether the value is long
+    enough, are checked. Trailing data, the padding bits, and the ranges
+    of the components are not checked, which makes unpacking faster.
+    Only use this for trusted input that is known to be valid, e.g.
+    values produced by :py:func:`packb()`; for invalid input, the result
+    is undefined. Lazy unpacking always validates values.
+
+    If `lazy` is true, the value is not decoded right away. Instead, the
+    returned :py:class:`Moment` keeps a copy of the encoded value, and
+    only decodes it when one of its attributes or methods is used for
+    the first time. This is useful when many values are unpacked, but
+    only some of them are actually used. Only the tag and the length are
+    checked up front; since all other checks are postponed, accessing
+    an attribute may raise :py:exc:`ValueError` for invalid values.
+    Equality checks between lazily unpacked values with identical
+    encoded values do not decode anything.
+
     :param bytes value: a byte string (or `bytearray`) to parse
+    :param bool lazy: whether to postpone decoding
+    :param bool validate: whether to validate the value
     :return: a parsed *temporenc* structure
     :rtype: :py:class:`Moment`
     """
+    if PY26 and isinstance(value, bytearray):  # pragma: no cover
+        # struct.unpack() does not handle bytearray() in Python < 2.7
+        value = bytes(value)
 
-    #
-    # Unpack components
-    #
+    if not validate and not lazy:
+        first = value[0]
+        if PY2 and isinstance(first, bytes):  # pragma: no cover
+            first = ord(first)
+        entry = tag_table[first]
+        decode = entry[4]
+        if decode is None:
+            raise ValueError("first byte does not contain a valid tag")
+        if len(value) < entry[2]:
+            raise ValueError("value is truncated")
+        return _moment(decode(value, 0))
 
-    first = value[0]
+    decode = _detect_value(value)[3]
 
-    if PY2 and isinstance(first, bytes):  # pragma: no cover
-        first = ord(first)
+    if lazy:
+        return LazyMoment(_to_bytes(value))
+
+    return _moment(decode(value, 0))
+
+
+def unpackb_datetime(value, strict=True):
+    """
+    Unpack a *temporenc* value from a byte string into a ``datetime``.
+
+    This is the same as ``unpackb(value).datetime(strict)``, but faster,
+    since it does not create an intermediate :py:class:`Moment`. See
+    :py:meth:`Moment.datetime()` for the conversion rules.
 
+    :param bytes value: a byte string (or `bytearray`) to parse
+    :param bool strict: whether to use strict conversion rules
+    :return: converted value
+    :rtype: `datetime.datetime`
+    """
     if PY26 and isinstance(value, bytearray):  # pragma: no cover
-        # struct.unpack() does not handle bytearray() in Python < 2.7
         value = bytes(value)
+    type, precision = _detect_value(value)[:2]
+    fields = decoders[type, precision](value, 0)
+    return _to_datetime(*fields, strict=strict)
 
-    type, precision, expected_length = _detect_type(first)
 
-    if type is None:
-        raise ValueError("first byte does not contain a valid tag")
+def unpackb_date(value, strict=True):
+    """
+    Unpack a *temporenc* value from a byte string into a ``date``.
 
-    if len(value) != expected_length:
-        if precision is None:
-            raise ValueError(
-                "{0} value must be {1:d} bytes; got {2:d}".format(
-                    type, expected_length, len(value)))
-        else:
-            raise ValueError(
-                "{0} value with precision {1:02b} must be {2:d} bytes; "
-                "got {3:d}".format(
-                    type, precision, expected_length, len(value)))
+    This is the same as ``unpackb(value).date(strict)``, but faster. See
+    :py:func:`unpackb_datetime()` for more information.
 
-    date = time = tz_offset = nanosecond = padding = None
-
-    if type == 'D':
-        # 100DDDDD DDDDDDDD DDDDDDDD
-        date = unpack_4(b'\x00' + value) & D_MASK
-
-    elif type == 'T':
-        # 1010000T TTTTTTTT TTTTTTTT
-        time = unpack_4(b'\x00' + value) & T_MASK
-
-    elif type == 'DT':
-        # 00DDDDDD DDDDDDDD DDDDDDDT TTTTTTTT
-        # TTTTTTTT
-        n = unpack_8(b'\x00\x00\x00' + value)
-        date = n >> 17 & D_MASK
-        time = n & T_MASK
-
-    elif type == 'DTZ':
-        # 110DDDDD DDDDDDDD DDDDDDDD TTTTTTTT
-        # TTTTTTTT TZZZZZZZ
-        n = unpack_8(b'\x00\x00' + value)
-        date = n >> 24 & D_MASK
-        time = n >> 7 & T_MASK
-        tz_offset = n & Z_MASK
-
-    elif type == 'DTS':
-        # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
-        # TTTTTTTT TT...... (first 6 bytes)
-        n = unpack_8(b'\x00\x00' + value[:6]) >> 6
-        date = n >> 17 & D_MASK
-        time = n & T_MASK
-
-        # Extract S component from last 4 bytes
-        n = unpack_4(value[-4:])
-        if precision == 0b00:
-            # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
-            # TTTTTTTT TTSSSSSS SSSS0000
-            nanosecond = (n >> 4 & MILLISECOND_MASK) * 1000000
-            padding = n & 0b1111
-        elif precision == 0b01:
-            # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
-            # TTTTTTTT TTSSSSSS SSSSSSSS SSSSSS00
-            nanosecond = (n >> 2 & MICROSECOND_MASK) * 1000
-            padding = n & 0b11
-        elif precision == 0b10:
-            # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
-            # TTTTTTTT TTSSSSSS SSSSSSSS SSSSSSSS
-            # SSSSSSSS
-            nanosecond = n & NANOSECOND_MASK
-        elif precision == 0b11:
-            # 01PPDDDD DDDDDDDD DDDDDDDD DTTTTTTT
-            # TTTTTTTT TT000000
-            padding = n & 0b111111
-
-    elif type == 'DTSZ':
-        # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
-        # TTTTTTTT TTT..... (first 6 bytes)
-        n = unpack_8(b'\x00\x00' + value[:6]) >> 5
-        date = n >> 17 & D_MASK
-        time = n & T_MASK
-
-        # Extract S and Z components from last 5 bytes
-        n = unpack_8(b'\x00\x00\x00' + value[-5:])
-        if precision == 0b00:
-            # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
-            # TTTTTTTT TTTSSSSS SSSSSZZZ ZZZZ0000
-            nanosecond = (n >> 11 & MILLISECOND_MASK) * 1000000
-            tz_offset = n >> 4 & Z_MASK
-            padding = n & 0b1111
-        elif precision == 0b01:
-            # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
-            # TTTTTTTT TTTSSSSS SSSSSSSS SSSSSSSZ
-            # ZZZZZZ00
-            nanosecond = (n >> 9 & MICROSECOND_MASK) * 1000
-            tz_offset = n >> 2 & Z_MASK
-            padding = n & 0b11
-        elif precision == 0b10:
-            # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
-            # TTTTTTTT TTTSSSSS SSSSSSSS SSSSSSSS
-            # SSSSSSSS SZZZZZZZ
-            nanosecond = n >> 7 & NANOSECOND_MASK
-            tz_offset = n & Z_MASK
-        elif precision == 0b11:
-            # 111PPDDD DDDDDDDD DDDDDDDD DDTTTTTT
-            # TTTTTTTT TTTZZZZZ ZZ000000
-            tz_offset = n >> 6 & Z_MASK
-            padding = n & 0b111111
-
-    if padding:
-        raise ValueError("padding bits must be zero")
+    :param bytes value: a byte string (or `bytearray`) to parse
+    :param bool strict: whether to use strict conversion rules
+    :return: converted value
+    :rtype: `datetime.date`
+    """
+    if PY26 and isinstance(value, bytearray):  # pragma: no cover
+        value = bytes(value)
+    type, precision = _detect_value(value)[:2]
+    fields = decoders[type, precision](value, 0)
+    return _to_date(*fields, strict=strict)
 
-    #
-    # Split D and T components
-    #
 
-    if date is None:
-        year = month = day = None
-    else:
-        year = date >> 9 & YEAR_MASK  # always within range
-        if year == YEAR_EMPTY:
-            year = None
-
-        month = date >> 5 & MONTH_MASK
-        if month == MONTH_EMPTY:
-            month = None
-        elif month > MONTH_MAX:
-            raise ValueError("month not within supported range")
-        else:
-            month += 1
+def unpackb_time(value, strict=True):
+    """
+    Unpack a *temporenc* value from a byte string into a ``time``.
 
-        day = date & DAY_MASK  # always within range
-        if day == DAY_EMPTY:
-            day = None
-        else:
-            day += 1
+    This is the same as ``unpackb(value).time(strict)``, but faster. See
+    :py:func:`unpackb_datetime()` for more information.
 
-    if time is None:
-        hour = minute = second = None
-    else:
-        hour = time >> 12 & HOUR_MASK
-        if hour == HOUR_EMPTY:
-            hour = None
-        elif hour > HOUR_MAX:
-            raise ValueError("hour not within supported range")
-
-        minute = time >> 6 & MINUTE_MASK
-        if minute == MINUTE_EMPTY:
-            minute = None
-        elif minute > MINUTE_MAX:
-            raise ValueError("minute not within supported range")
-
-        second = time & SECOND_MASK
-        if second == SECOND_EMPTY:
-            second = None
-        elif second > SECOND_MAX:
-            raise ValueError("second not within supported range")
+    :param bytes value: a byte string (or `bytearray`) to parse
+    :param bool strict: whether to use strict conversion rules
+    :return: converted value
+    :rtype: `datetime.time`
+    """
+    if PY26 and isinstance(value, bytearray):  # pragma: no cover
+        value = bytes(value)
+    type, precision = _detect_value(value)[:2]
+    fields = decoders[type, precision](value, 0)
+    return _to_time(*fields, strict=strict)
 
-    #
-    # Normalize time zone offset
-    #
 
-    if tz_offset is not None:
-        tz_offset = 15 * (tz_offset - 64)
+def unpackb_epoch(value, unit='ns'):
+    """
+    Unpack a *temporenc* value into an integer Unix time.
 
-    #
-    # Sub-second fields are either all None, or none are None.
-    #
+    This is the same as ``unpackb(value).timestamp_ns()`` (converted to
+    the requested `unit`), but faster, since it does not create an
+    intermediate :py:class:`Moment`. See :py:meth:`Moment.timestamp_ns()`
+    for the conversion rules. Sub-second information beyond the
+    requested `unit` is truncated.
+
+    :param bytes value: a byte string (or `bytearray`) to parse
+    :param str unit: unit of the result (``'s'``, ``'ms'``, ``'us'``, or
+        ``'ns'``)
+    :return: number of units since the Unix epoch
+    :rtype: int
+    """
+    try:
+        per_second = EPOCH_UNITS[unit][0]
+    except KeyError:
+        raise ValueError("invalid unit: {0!r}".format(unit))
+    if PY26 and isinstance(value, bytearray):  # pragma: no cover
+        value = bytes(value)
+    type, precision = _detect_value(value)[:2]
+    fields = decoders[type, precision](value, 0)
+    return _to_epoch(*fields, per_second=per_second)
 
-    if nanosecond is not None and nanosecond > NANOSECOND_MAX:
-        raise ValueError("sub-second precision not within supported range")
 
-    return Moment(
-        year, month, day,
-        hour, minute, second, nanosecond,
-        tz_offset)
+def unpack_from(buffer, offset=0):
+    """
+    Unpack a *temporenc* value from a buffer, starting at `offset`.
+
+    The `buffer` can be any object supporting the buffer protocol, such
+    as `bytes`, `bytearray`, `memoryview`, or `mmap.mmap` instances. The
+    value is decoded in place, without copying any data, and may be
+    followed by arbitrary other data. This makes it possible to decode
+    values embedded in larger binary structures.
+
+    If no valid value could be read, this raises :py:exc:`ValueError`.
+
+    :param buffer: object supporting the buffer protocol
+    :param int offset: position of the value inside the buffer
+    :return: a parsed *temporenc* structure and the number of bytes used
+    :rtype: tuple of (:py:class:`Moment`, int)
+    """
+    size = len(buffer)
+    if not 0 <= offset < size:
+        raise ValueError("offset not within buffer")
+
+    type, precision, length, decode, _ = tag_table[
+        _read_1(buffer, offset)]
+
+    if type is None:
+        raise ValueError("first byte does not contain a valid tag")
+
+    if offset + length > size:
+        raise ValueError(
+            "{0} value needs {1:d} bytes; got {2:d}".format(
+                type, length, size - offset))
+
+    return _moment(decode(buffer, offset)), length
 
 
 def unpack(fp):
@@ -929,5 +2317,182 @@ def unpack(fp):
     :rtype: :py:class:`Moment`
     """
     first = fp.read(1)
-    _, _, size = _detect_type(ord(first))
+    if not first:
+        raise ValueError("unexpected end of stream")
+    size = tag_table[ord(first)][2]
+    if size is None:
+        raise ValueError("first byte does not contain a valid tag")
     return unpackb(first + fp.read(size - 1))
+
+
+def iter_unpack(fp, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Unpack all *temporenc* values from a file-like object.
+
+    This returns an iterator that reads data from `fp` in chunks of
+    `buffer_size` bytes, and yields each value contained in it, until
+    the end of the stream is reached. This is much more efficient than
+    calling :py:func:`unpack()` repeatedly, since it performs far fewer
+    read operations on the underlying stream.
+
+    Unlike :py:func:`unpack()`, this function consumes the stream until
+    the end, so it cannot be used for streams containing other data.
+
+    If no valid value could be read, or if the stream ends with an
+    incomplete value, this raises :py:exc:`ValueError`.
+
+    :param file-like fp: readable file-like object
+    :param int buffer_size: number of bytes to read at once
+    :return: iterator yielding parsed *temporenc* structures
+    :rtype: iterator of :py:class:`Moment`
+    """
+    # Reading zero bytes would look like the end of the stream.
+    if buffer_size < 1:
+        raise ValueError("buffer_size must be positive")
+    return _iter_unpack(fp, buffer_size)
+
+
+def _iter_unpack(fp, buffer_size):
+    buf = b''
+    pos = 0
+
+    while True:
+        chunk = fp.read(buffer_size)
+        if not chunk:
+            break
+
+        # Keep any trailing partial value from the previous chunk.
+        buf = buf[pos:] + chunk if pos < len(buf) else chunk
+        pos = 0
+        end = len(buf)
+
+        while pos < end:
+            _, _, size, decode, _ = tag_table[_read_1(buf, pos)]
+            if size is None:
+                raise ValueError("first byte does not contain a valid tag")
+
+            if pos + size > end:
+                break  # value continues in the next chunk
+
+            yield _moment(decode(buf, pos))
+            pos += size
+
+    if pos < len(buf):
+        raise ValueError("unexpected end of stream")
+
+
+class Cache(object):
+    """
+    Bounded cache for packing and unpacking values.
+
+    Many applications handle the same values over and over again, e.g.
+    dates within a limited range, or timestamps with second precision
+    that repeat many times. This class remembers recent results, so that
+    repeated values do not need to be packed or unpacked again.
+
+    The cache has separate least-recently-used stores for both
+    directions, each holding at most `maxsize` entries. The
+    :py:meth:`packb()` and :py:meth:`unpackb()` methods work like the
+    module level functions with the same name, but only support a subset
+    of their arguments. The ``hits`` and ``misses`` attributes count
+    cache hits and misses for both directions combined.
+
+    Instances are not thread-safe; use a separate instance per thread.
+
+    :param int maxsize: maximum number of entries for each direction
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive")
+
+        #: Maximum number of entries for each direction.
+        self.maxsize = maxsize
+
+        #: Number of cache hits.
+        self.hits = 0
+
+        #: Number of cache misses.
+        self.misses = 0
+
+        self._packed = collections.OrderedDict()
+        self._unpacked = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._packed) + len(self._unpacked)
+
+    def __repr__(self):
+        return "<temporenc.Cache hits={0} misses={1} size={2}>".format(
+            self.hits, self.misses, len(self))
+
+    def packb(self, value, type=None):
+        """
+        Pack an instance of one of the ``datetime`` classes.
+
+        This is the same as ``packb(value, type=type)``, but the result
+        is cached. See :py:func:`packb()` for more information.
+
+        :param value: instance of one of the ``datetime`` classes
+        :param str type: *temporenc* type (optional)
+        :return: encoded *temporenc* value
+        :rtype: bytes
+        """
+        # Equal datetime instances can have different time zone
+        # offsets (they represent the same point in time), and
+        # datetime.date and datetime.datetime can compare equal on some
+        # Python versions, so those are part of the key as well.
+        try:
+            tz_offset = value.utcoffset()
+        except AttributeError:
+            tz_offset = None
+        key = (value.__class__, value, tz_offset, type)
+
+        cache = self._packed
+        try:
+            result = cache.pop(key)
+        except KeyError:
+            self.misses += 1
+            result = packb(value, type=type)
+            if len(cache) >= self.maxsize:
+                cache.popitem(last=False)
+        else:
+            self.hits += 1
+
+        cache[key] = result  # (re)insert as most recently used
+        return result
+
+    def unpackb(self, value):
+        """
+        Unpack a *temporenc* value from a byte string.
+
+        This is the same as :py:func:`unpackb()`, but the result is
+        cached. Since :py:class:`Moment` instances are immutable, the
+        same instance is returned for repeated values.
+
+        :param bytes value: a byte string (or `bytearray`) to parse
+        :return: a parsed *temporenc* structure
+        :rtype: :py:class:`Moment`
+        """
+        key = value if isinstance(value, bytes) else _to_bytes(value)
+
+        cache = self._unpacked
+        try:
+            result = cache.pop(key)
+        except KeyError:
+            self.misses += 1
+            result = unpackb(key)
+            if len(cache) >= self.maxsize:
+                cache.popitem(last=False)
+        else:
+            self.hits += 1
+
+        cache[key] = result  # (re)insert as most recently used
+        return result
+
+    def clear(self):
+        """
+        Remove all entries from the cache, and reset the counters.
+        """
+        self._packed.clear()
+        self._unpacked.clear()
+        self.hits = self.misses = 0
@@ -0,0 +1,139 @@
+import datetime
+import sys
+
+import pytest
+
+import temporenc
+
+if sys.version_info < (3, 5):
+    pytest.skip("asyncio support requires Python 3.5+",
+                allow_module_level=True)
+
+import asyncio  # noqa
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    asyncio.set_event_loop(None)
+    loop.close()
+
+
+def make_reader(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+def collect(loop, iterator):
+    # Like 'async for', but usable without the Python 3.5+ syntax.
+    result = []
+    while True:
+        try:
+            result.append(loop.run_until_complete(iterator.__anext__()))
+        except StopAsyncIteration:
+            return result
+
+
+class FakeWriter(object):
+    def __init__(self):
+        self.chunks = []
+        self.drained = 0
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def drain(self):
+        self.drained += 1
+        return asyncio.sleep(0)
+
+
+def test_unpack_async(loop):
+    values = [temporenc.packb(type='D', year=1983, month=1, day=day)
+              for day in (15, 16)]
+    reader = make_reader(b''.join(values) + b'\x8f')
+
+    moment = loop.run_until_complete(temporenc.unpack_async(reader))
+    assert moment == temporenc.unpackb(values[0])
+    moment = loop.run_until_complete(temporenc.unpack_async(reader))
+    assert moment == temporenc.unpackb(values[1])
+
+    # Incomplete value
+    with pytest.raises(ValueError):
+        loop.run_until_complete(temporenc.unpack_async(reader))
+
+    # End of stream
+    with pytest.raises(ValueError):
+        loop.run_until_complete(temporenc.unpack_async(reader))
+
+    # Bogus tag
+    reader = make_reader(b'\xbb\x12\x34')
+    with pytest.raises(ValueError):
+        loop.run_until_complete(temporenc.unpack_async(reader))
+
+
+def test_iter_unpack_async(loop):
+    start = datetime.datetime(2014, 10, 23, 18, 45, 23, 612883)
+    values = [
+        temporenc.packb(start + datetime.timedelta(seconds=i), type=type)
+        for i, type in enumerate(['DTS', 'DT', 'D', 'T', 'DTS'] * 20)]
+    expected = [temporenc.unpackb(value) for value in values]
+    data = b''.join(values)
+
+    for buffer_size in (1, 7, 100, 1024):
+        iterator = temporenc.iter_unpack_async(
+            make_reader(data), buffer_size=buffer_size)
+        assert collect(loop, iterator) == expected
+
+    assert collect(loop, temporenc.iter_unpack_async(make_reader(b''))) == []
+
+    with pytest.raises(ValueError):
+        collect(loop, temporenc.iter_unpack_async(make_reader(data[:-1])))
+
+    with pytest.raises(ValueError):
+        collect(loop, temporenc.iter_unpack_async(make_reader(b'\xbb')))
+
+    for buffer_size in (0, -1):
+        with pytest.raises(ValueError):
+            temporenc.iter_unpack_async(
+                make_reader(data), buffer_size=buffer_size)
+
+
+def test_pack_async(loop):
+    writer = FakeWriter()
+    n = loop.run_until_complete(temporenc.pack_async(
+        writer, type='D', year=1983, month=1, day=15))
+    assert n == 3
+    assert writer.chunks == [temporenc.packb(
+        type='D', year=1983, month=1, day=15)]
+    assert writer.drained == 1
+
+
+def test_pack_many_async(loop):
+    values = [datetime.date(1983, 1, day) for day in range(1, 32)]
+    expected = b''.join(temporenc.packb(v) for v in values)
+
+    writer = FakeWriter()
+    n = loop.run_until_complete(
+        temporenc.pack_many_async(writer, values, buffer_size=10))
+    assert n == len(expected)
+    assert b''.join(writer.chunks) == expected
+    assert len(writer.chunks) == writer.drained == 8
+
+    writer = FakeWriter()
+    n = loop.run_until_complete(
+        temporenc.pack_many_async(writer, values, type='DTS'))
+    assert n == 6 * len(values)
+    assert writer.drained == 1
+
+    with pytest.raises(ValueError):
+        loop.run_until_complete(
+            temporenc.pack_many_async(FakeWriter(), values, buffer_size=0))
+
+    writer = FakeWriter()
+    assert loop.run_until_complete(
+        temporenc.pack_many_async(writer, [])) == 0
+    assert writer.chunks == []
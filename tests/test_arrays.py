@@ -0,0 +1,134 @@
+import datetime
+import random
+
+import pytest
+
+import temporenc
+
+
+def make_values(n):
+    start = datetime.datetime(2014, 10, 23, 18, 45, 23, 612883)
+    step = datetime.timedelta(minutes=17, microseconds=1234)
+    return [start + i * step for i in range(n)]
+
+
+def test_array_basics():
+    values = make_values(100)
+    array = temporenc.MomentArray('DTS', values=values)
+    assert len(array) == 100
+    assert array.type == 'DTS'
+    assert array.precision == 'us'
+    assert array.size == 8
+    assert array[0].datetime() == values[0]
+    assert array[-1].datetime() == values[-1]
+    assert [m.datetime() for m in array] == values
+    assert array.raw(5) == temporenc.packb(values[5], type='DTS')
+    assert array.tobytes() == b''.join(
+        temporenc.packb(value, type='DTS') for value in values)
+
+    with pytest.raises(IndexError):
+        array[100]
+    with pytest.raises(IndexError):
+        array.raw(-101)
+
+    # Slicing returns a new array.
+    part = array[10:20:3]
+    assert isinstance(part, temporenc.MomentArray)
+    assert [m.datetime() for m in part] == values[10:20:3]
+    assert array[10:20] == temporenc.MomentArray('DTS', values=values[10:20])
+    assert array[10:20] != array[10:21]
+    part.append(values[0])
+    assert len(array) == 100
+
+
+def test_array_adding_values():
+    values = make_values(10)
+    encoded = b''.join(
+        temporenc.packb(value, type='DTSZ', tz_offset=60, millisecond=0)
+        for value in values)
+
+    array = temporenc.MomentArray('DTSZ', precision='ms')
+    array.extend(encoded)
+    array.append(encoded[:8])
+    array.extend([encoded[8:16], values[0]])
+    array.extend(array[:2])
+    assert len(array) == 15
+    assert array[0].tz_offset == 60
+    assert array[10] == array[13] == array[0]
+    assert array[12].tz_offset is None
+
+    copy = temporenc.MomentArray('DTSZ', precision='ms')
+    copy.frombytes(array.tobytes(), validate=False)
+    assert copy == array
+
+    # Wrong size, type, or precision
+    with pytest.raises(ValueError):
+        array.extend(encoded[:-1])
+    with pytest.raises(ValueError):
+        array.append(encoded[:7])
+    with pytest.raises(ValueError):
+        array.append(temporenc.packb(values[0], type='DTSZ'))
+    with pytest.raises(ValueError):
+        array.frombytes(temporenc.packb(values[0], type='DTS'))
+
+    # Invalid values
+    with pytest.raises(ValueError):
+        array.append(b'\xe0\x00\x00\x00\x00\x00\x07\xff')  # padding
+    assert len(array) == 15
+
+
+def test_array_sorting_and_searching():
+    values = make_values(500)
+    shuffled = list(values)
+    random.Random(0).shuffle(shuffled)
+
+    array = temporenc.MomentArray('DT', values=shuffled)
+    expected = [value.replace(microsecond=0) for value in values]
+    assert array.min().datetime() == expected[0]
+    assert array.max().datetime() == expected[-1]
+
+    array.sort()
+    assert [m.datetime() for m in array] == expected
+    assert list(array) == sorted(array[:])
+
+    assert array.searchsorted(expected[0]) == 0
+    assert array.searchsorted(expected[0], side='right') == 1
+    assert array.searchsorted(expected[123]) == 123
+    assert array.searchsorted(expected[123] + datetime.timedelta(
+        seconds=1)) == 124
+    assert array.searchsorted(datetime.datetime(2100, 1, 1)) == 500
+    with pytest.raises(ValueError):
+        array.searchsorted(expected[0], side='middle')
+
+    array.sort(reverse=True)
+    assert array[0].datetime() == expected[-1]
+
+    empty = temporenc.MomentArray('D')
+    with pytest.raises(ValueError):
+        empty.min()
+    with pytest.raises(ValueError):
+        empty.max()
+    assert empty.searchsorted(datetime.date(2000, 1, 1)) == 0
+
+
+def test_array_moments():
+    values = make_values(10)
+    array = temporenc.MomentArray('DTS', precision='ms', values=values)
+    moments = list(array)
+
+    copy = temporenc.MomentArray('DTS', precision='ms', values=moments)
+    assert copy == array
+    assert copy.searchsorted(moments[3]) == 3
+    assert copy.searchsorted(memoryview(copy.raw(3))) == 3
+
+    # Probes with more precision than the array are not truncated.
+    probe = moments[3].datetime().replace(
+        microsecond=moments[3].microsecond + 500)
+    assert copy.searchsorted(probe) == 4
+    assert copy.searchsorted(probe, side='right') == 4
+    assert copy.searchsorted(moments[3].replace(nanosecond=(
+        moments[3].nanosecond + 1))) == 4
+    assert copy.searchsorted(moments[3].datetime(), side='right') == 4
+
+    with pytest.raises(ValueError):
+        copy.append(temporenc.Moment.from_fields(year=2000))
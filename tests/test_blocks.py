@@ -0,0 +1,185 @@
+import datetime
+import io
+import random
+import struct
+
+import pytest
+
+import temporenc
+from temporenc.temporenc import FixedOffset
+
+
+def make_values(n, seed=0):
+    rng = random.Random(seed)
+    value = datetime.datetime(1999, 12, 31, 23, 59, 59)
+    values = []
+    for _ in range(n):
+        values.append(value)
+        value += datetime.timedelta(microseconds=rng.randrange(5000))
+    return values
+
+
+def test_blocks_roundtrip():
+    values = make_values(1000)
+    aware = [
+        v.replace(tzinfo=FixedOffset(60 * (i // 300)))
+        for i, v in enumerate(values)]
+
+    for type in ('DT', 'DTZ', 'DTS', 'DTSZ'):
+        for precision in ('ms', 'us', 'ns', None):
+            packer = temporenc.make_packer(type, precision)
+            source = aware if type in ('DTZ', 'DTSZ') else values
+            encoded = [packer(v) for v in source]
+            expected = [temporenc.unpackb(v) for v in encoded]
+
+            for compression in (None, 'zlib', 'lzma'):
+                fp = io.BytesIO()
+                count = temporenc.write_blocks(
+                    fp, encoded, type=type, precision=precision,
+                    block_size=128, compression=compression)
+                assert count == len(encoded)
+
+                reader = temporenc.BlockReader(fp.getvalue())
+                assert len(reader) == len(encoded)
+                assert reader.block_count == 8
+                assert reader.type == type
+                assert reader.compression == compression
+                assert list(reader) == expected
+                assert reader.block(-1) == expected[896:]
+
+
+def test_blocks_range():
+    values = make_values(1000)
+    values[300:310] = [values[300]] * 10  # duplicates across blocks
+    values.sort()
+    fp = io.BytesIO()
+    with temporenc.BlockWriter(fp, 'DTS', 'ms', block_size=64) as writer:
+        writer.write_many(values)
+        assert writer.count == 1000
+    data = fp.getvalue()
+    expected = [temporenc.unpackb(temporenc.packb(
+        v, type='DTS', millisecond=v.microsecond // 1000)) for v in values]
+
+    for source in (data, memoryview(data)):
+        reader = temporenc.BlockReader(source)
+        assert reader.anchor(0) == expected[0]
+        assert reader.anchor(-1) == expected[960]
+        assert reader.range() == expected
+        for lo, hi in [(0, 1000), (300, 310), (100, 900), (999, 1000)]:
+            start, end = expected[lo], expected[hi - 1]
+            actual = reader.range(start, end)
+            assert actual == [m for m in expected if start <= m < end]
+            assert reader.range(start.datetime(), end.datetime()) == actual
+
+        # Bounds are not truncated to the file precision.
+        start = values[500].replace(
+            microsecond=values[500].microsecond // 1000 * 1000 + 500)
+        assert reader.range(start, values[600]) == [
+            m for m in expected
+            if temporenc.Moment.from_datetime(start) <= m
+            and m.datetime() < values[600]]
+        encoded = temporenc.make_packer('DTS', 'ms')(values[900])
+        assert reader.range(encoded) == expected[900:]
+        assert reader.range(end=values[0]) == []
+
+
+def test_blocks_size():
+    values = make_values(10000)
+    fp = io.BytesIO()
+    temporenc.write_blocks(fp, values, type='DTS')
+    assert len(fp.getvalue()) < 3 * len(values)
+
+    fp = io.BytesIO()
+    temporenc.write_blocks(fp, values, type='DTS', compression='zlib')
+    assert len(fp.getvalue()) < 2 * len(values)
+
+
+def test_blocks_unsorted():
+    tz = FixedOffset(-300)
+    values = [
+        datetime.datetime(2014, 10, 23, 18, 45, 23, 612883, tzinfo=tz),
+        datetime.datetime(1983, 1, 15, 18, 25, 12, 123456, tzinfo=tz),
+        datetime.datetime(1983, 1, 15, 18, 25, 12, 123456, tzinfo=tz),
+        datetime.datetime(2000, 2, 29, tzinfo=FixedOffset(0)),
+    ]
+    fp = io.BytesIO()
+    temporenc.write_blocks(fp, values, type='DTSZ')
+    reader = temporenc.BlockReader(fp.getvalue())
+    assert [m.datetime() for m in reader] == values
+
+
+def test_blocks_file(tmpdir):
+    values = make_values(100)
+    path = str(tmpdir.join('values.tenb'))
+    with open(path, 'wb') as fp:
+        with temporenc.BlockWriter(fp, 'DT', block_size=10) as writer:
+            writer.write_many(values)
+
+    with temporenc.BlockReader(path) as reader:
+        assert reader.block_count == 10
+        assert [m.datetime() for m in reader.block(3)] == [
+            v.replace(microsecond=0) for v in values[30:40]]
+
+        with pytest.raises(IndexError):
+            reader.block(10)
+        with pytest.raises(IndexError):
+            reader.anchor(10)
+
+
+def test_blocks_empty():
+    fp = io.BytesIO()
+    assert temporenc.write_blocks(fp, [], type='DTS') == 0
+    reader = temporenc.BlockReader(fp.getvalue())
+    assert len(reader) == 0
+    assert reader.block_count == 0
+    assert list(reader) == []
+
+
+def test_blocks_invalid():
+    with pytest.raises(ValueError):
+        temporenc.BlockWriter(io.BytesIO(), 'D')
+    with pytest.raises(ValueError):
+        temporenc.BlockWriter(io.BytesIO(), 'DTS', compression='bz2')
+    with pytest.raises(ValueError):
+        temporenc.BlockWriter(io.BytesIO(), 'DTS', block_size=0)
+
+    writer = temporenc.BlockWriter(io.BytesIO(), 'DT')
+    with pytest.raises(ValueError) as e:
+        writer.write(temporenc.packb(type='DT', year=1983))
+    assert 'incomplete' in str(e.value)
+    with pytest.raises(ValueError) as e:
+        writer.write(temporenc.packb(
+            type='DT', year=2013, month=6, day=30,
+            hour=23, minute=59, second=60))
+    assert 'leap' in str(e.value)
+    with pytest.raises(ValueError):
+        writer.write(temporenc.packb(type='DTS', millisecond=0))
+
+    fp = io.BytesIO()
+    temporenc.write_blocks(fp, make_values(10), type='DTS')
+    data = fp.getvalue()
+
+    with pytest.raises(ValueError) as e:
+        temporenc.BlockReader(data[:10])
+    assert 'too short' in str(e.value)
+
+    with pytest.raises(ValueError) as e:
+        temporenc.BlockReader(b'XXXX' + data[4:])
+    assert 'magic' in str(e.value)
+
+    with pytest.raises(ValueError) as e:
+        temporenc.BlockReader(data[:4] + b'\x02' + data[5:])
+    assert 'version' in str(e.value)
+
+    with pytest.raises(ValueError) as e:
+        temporenc.BlockReader(data[:8] + data[9:])
+    assert 'index' in str(e.value)
+
+    # Block payloads that are too short to contain the anchor value, or
+    # the deltas
+    for length in (3, 12):
+        reader = temporenc.BlockReader(
+            data[:12] + struct.pack('>L', length) + data[16:])
+        with pytest.raises(ValueError) as e:
+            reader.block(0)
+        assert 'truncated' in str(e.value)
@@ -0,0 +1,251 @@
+import binascii
+import datetime
+
+import pytest
+
+import temporenc
+
+np = pytest.importorskip('numpy')
+bulk = pytest.importorskip('temporenc.bulk')
+
+
+def from_hex(s):
+    """Compatibility helper like bytes.fromhex() in Python 3"""
+    return binascii.unhexlify(s.replace(' ', '').encode('ascii'))
+
+
+def test_pack_array_types():
+    values = np.array(
+        ['1983-01-15T18:25:12.123456789'], dtype='datetime64[ns]')
+
+    expected = {
+        ('D', None): '8f 7e 0e',
+        ('T', None): 'a1 26 4c',
+        ('DT', None): '1e fc 1d 26 4c',
+        ('DTZ', None): 'cf 7e 0e 93 26 44',
+        ('DTS', 'ms'): '47 bf 07 49 93 07 b0',
+        ('DTS', 'us'): '57 bf 07 49 93 07 89 00',
+        ('DTS', 'ns'): '67 bf 07 49 93 07 5b cd 15',
+        ('DTS', None): '77 bf 07 49 93 00',
+        ('DTSZ', 'ms'): 'e3 df 83 a4 c9 83 dc 40',
+        ('DTSZ', 'us'): 'eb df 83 a4 c9 83 c4 81 10',
+        ('DTSZ', 'ns'): 'f3 df 83 a4 c9 83 ad e6 8a c4',
+        ('DTSZ', None): 'fb df 83 a4 c9 91 00',
+    }
+    for (type, precision), value in expected.items():
+        actual = bulk.pack_array(
+            values, type=type, precision=precision, tz_offset=60)
+        assert actual.dtype == np.uint8
+        assert actual.shape == (1, len(from_hex(value)))
+        assert actual.tobytes() == from_hex(value)
+
+
+def test_pack_array_matches_packb():
+    start = np.datetime64('1900-01-01T00:00:00', 'us')
+    step = np.timedelta64(12345678901234, 'us')
+    values = start + step * np.arange(1000)
+    tz_offsets = (np.arange(1000) % 100 - 50) * 15
+
+    for type in ('DT', 'DTZ', 'DTS', 'DTSZ'):
+        actual = bulk.pack_array(values, type=type, tz_offset=tz_offsets)
+        for value, row, tz_offset in zip(values, actual, tz_offsets):
+            expected = temporenc.packb(
+                value.astype(datetime.datetime),
+                type=type, tz_offset=int(tz_offset))
+            assert row.tobytes() == expected
+
+
+def test_packb_array():
+    values = np.array(['1983-01-15', '1983-01-16'], dtype='datetime64[D]')
+    actual = bulk.packb_array(values, type='D')
+    assert actual == from_hex('8f 7e 0e 8f 7e 0f')
+
+
+def test_pack_array_nat():
+    values = np.array(['NaT'], dtype='datetime64[s]')
+    actual = bulk.packb_array(values, type='DT')
+    assert actual == temporenc.packb(type='DT')
+
+
+def test_pack_array_invalid():
+    values = np.array(['1983-01-15'], dtype='datetime64[D]')
+
+    with pytest.raises(ValueError):
+        bulk.pack_array(values, type='foo')
+
+    with pytest.raises(ValueError):
+        bulk.pack_array(values, precision='fs')
+
+    with pytest.raises(ValueError):
+        bulk.pack_array(np.arange(3))
+
+    with pytest.raises(ValueError):
+        bulk.pack_array(np.array(['5000-01-01'], dtype='datetime64[D]'))
+
+    with pytest.raises(ValueError):
+        bulk.pack_array(values, type='DTZ', tz_offset=13)
+
+    with pytest.raises(ValueError):
+        bulk.pack_array(values, type='DTZ', tz_offset=[1050])
+
+
+def test_unpack_array():
+    buf = from_hex('eb df 83 a4 c9 83 c4 81 10') + temporenc.packb(
+        type='DTSZ', microsecond=0)
+    values = bulk.unpack_array(buf)
+    assert values.dtype == bulk.DTYPE
+    assert values.shape == (2,)
+
+    v = values[0]
+    assert (v['year'], v['month'], v['day']) == (1983, 1, 15)
+    assert (v['hour'], v['minute'], v['second']) == (18, 25, 12)
+    assert v['nanosecond'] == 123456000
+    assert v['tz_offset'] == 60
+    assert all(v[name] for name in bulk.DTYPE.names if name.startswith('has_'))
+
+    v = values[1]
+    assert v['has_nanosecond'] and v['nanosecond'] == 0
+    assert not any(
+        v[name] for name in bulk.DTYPE.names
+        if name.startswith('has_') and name != 'has_nanosecond')
+
+    # Two-dimensional arrays, as returned by pack_array(), also work.
+    rows = np.frombuffer(buf, dtype=np.uint8).reshape(2, -1)
+    assert (bulk.unpack_array(rows) == values).all()
+
+    assert bulk.unpack_array(b'').shape == (0,)
+
+
+def test_unpack_array_matches_unpackb():
+    start = np.datetime64('1900-01-01T00:00:00', 'ns')
+    step = np.timedelta64(1234567890123456789, 'ns')
+    values = start + step * np.arange(100)
+    fields = ('year', 'month', 'day', 'hour', 'minute', 'second',
+              'nanosecond', 'tz_offset')
+
+    for type in ('D', 'T', 'DT', 'DTZ', 'DTS', 'DTSZ'):
+        for precision in ('ms', 'us', 'ns', None):
+            buf = bulk.packb_array(
+                values, type=type, precision=precision, tz_offset=-120)
+            actual = bulk.unpack_array(buf)
+            length = len(buf) // len(values)
+            for i, row in enumerate(actual):
+                moment = temporenc.unpackb(buf[i * length:(i + 1) * length])
+                for name in fields:
+                    expected = getattr(moment, name)
+                    assert row['has_' + name] == (expected is not None)
+                    assert row[name] == (expected or 0)
+
+
+def test_unpack_array_invalid():
+
+    # Mixed types
+    with pytest.raises(ValueError) as e:
+        bulk.unpack_array(
+            temporenc.packb(type='D') + temporenc.packb(type='T'))
+    assert 'same type' in str(e.value)
+
+    # Mixed precision
+    with pytest.raises(ValueError):
+        bulk.unpack_array(
+            temporenc.packb(type='DTS', millisecond=0)
+            + temporenc.packb(type='DTS', microsecond=0)[:7])
+
+    # Incomplete value
+    with pytest.raises(ValueError):
+        bulk.unpack_array(temporenc.packb(type='D') + b'\x8f')
+
+    # Bogus tag
+    with pytest.raises(ValueError) as e:
+        bulk.unpack_array(from_hex('bb 12 34'))
+    assert 'tag' in str(e.value)
+
+    # Padding and range checks
+    with pytest.raises(ValueError) as e:
+        bulk.unpack_array(from_hex('47 bf 07 49 93 07 b2'))
+    assert 'padding' in str(e.value)
+
+    with pytest.raises(ValueError) as e:
+        bulk.unpack_array(bytearray((0b10100001, 0b11100000, 0b00000000)))
+    assert 'hour' in str(e.value)
+
+    with pytest.raises(ValueError) as e:
+        bulk.unpack_array(bytearray((0b10000000, 0b00000001, 0b11000000)))
+    assert 'month' in str(e.value)
+
+    with pytest.raises(ValueError) as e:
+        bulk.unpack_array(bytearray((
+            0b01100000, 0b00000000, 0b00000000, 0b00000000,
+            0b00000000, 0b00111111, 0b11111111, 0b11111111,
+            0b11111111)))
+    assert 'sub-second' in str(e.value)
+
+
+def test_unpack_datetime64():
+    values = np.array([
+        '1983-01-15T18:25:12.123456789',
+        '2014-10-23T18:45:23.612883',
+        'NaT',
+    ], dtype='datetime64[ns]')
+
+    buf = bulk.packb_array(values, type='DTSZ', precision='ns', tz_offset=60)
+    actual = bulk.unpack_datetime64(buf)
+    assert actual.dtype == np.dtype('datetime64[ns]')
+    assert (actual[:2] == values[:2]).all()
+    assert np.isnat(actual[2])
+
+    actual = bulk.unpack_datetime64(buf, utc=True)
+    assert (actual[:2] == values[:2] - np.timedelta64(1, 'h')).all()
+
+    actual = bulk.unpack_datetime64(buf, unit='ms')
+    assert actual.dtype == np.dtype('datetime64[ms]')
+    assert actual[0] == np.datetime64('1983-01-15T18:25:12.123')
+
+    # Type D values are converted to midnight
+    buf = bulk.packb_array(values, type='D')
+    actual = bulk.unpack_datetime64(buf, unit='s')
+    assert actual[0] == np.datetime64('1983-01-15T00:00:00')
+
+    # Incomplete values
+    buf = temporenc.packb(type='DT', year=1983, month=1, day=15, hour=12)
+    assert np.isnat(bulk.unpack_datetime64(buf)[0])
+    buf = temporenc.packb(type='T', hour=12, minute=0, second=0)
+    assert np.isnat(bulk.unpack_datetime64(buf)[0])
+
+    # Leap second
+    buf = temporenc.packb(
+        type='DT', year=2013, month=6, day=30, hour=23, minute=59, second=60)
+    actual = bulk.unpack_datetime64(buf, unit='s')
+    assert actual[0] == np.datetime64('2013-06-30T23:59:59')
+
+    # Out of range
+    buf = temporenc.packb(type='D', year=3000, month=1, day=1)
+    with pytest.raises(ValueError):
+        bulk.unpack_datetime64(buf)
+    assert bulk.unpack_datetime64(buf, unit='us')[0] == np.datetime64(
+        '3000-01-01')
+
+    with pytest.raises(ValueError):
+        bulk.unpack_datetime64(buf, unit='fs')
+
+
+def test_unpack_array_trusted():
+    start = np.datetime64('1900-01-01T00:00:00', 'ns')
+    step = np.timedelta64(1234567890123456789, 'ns')
+    values = start + step * np.arange(1000)
+
+    for type in ('D', 'T', 'DT', 'DTZ', 'DTS', 'DTSZ'):
+        for precision in ('ms', 'us', 'ns', None):
+            buf = bulk.packb_array(
+                values, type=type, precision=precision, tz_offset=-120)
+            expected = bulk.unpack_array(buf)
+            assert (bulk.unpack_array(buf, validate=False) == expected).all()
+
+    buf = bulk.packb_array(values, type='DTSZ', precision='ns')
+    expected = bulk.unpack_datetime64(buf, unit='us')
+    actual = bulk.unpack_datetime64(buf, unit='us', validate=False)
+    assert (actual == expected).all()
+
+    # Padding and range checks are skipped.
+    buf = from_hex('47 bf 07 49 93 07 b2')
+    assert bulk.unpack_array(buf, validate=False)['nanosecond'] == 123000000
@@ -0,0 +1,219 @@
+import bisect
+import datetime
+import io
+
+import pytest
+
+import temporenc
+from temporenc.columns import HEADER, FOOTER
+
+
+def make_values(n):
+    start = datetime.datetime(2014, 10, 23, 18, 45, 23, 612883)
+    step = datetime.timedelta(minutes=17, microseconds=1234)
+    return [start + i * step for i in range(n)]
+
+
+def test_column_roundtrip(tmpdir):
+    values = make_values(1000)
+    path = str(tmpdir.join('column.tenc'))
+
+    with open(path, 'wb') as fp:
+        count = temporenc.write_column(fp, values, type='DTS')
+    assert count == len(values)
+
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    assert len(data) == HEADER.size + 8 * len(values) + FOOTER.size
+
+    with temporenc.TemporencColumn(path) as col:
+        assert len(col) == len(values)
+        assert col.type == 'DTS'
+        assert col.precision == 'us'
+        assert col.size == 8
+        assert col[0].datetime() == values[0]
+        assert col[-1].datetime() == values[-1]
+        assert col[123].datetime() == values[123]
+        assert [m.datetime() for m in col[10:20:3]] == values[10:20:3]
+        assert [m.datetime() for m in col] == values
+        assert col.raw(5) == temporenc.packb(values[5], type='DTS')
+        col.verify()
+
+        with pytest.raises(IndexError):
+            col[len(values)]
+        with pytest.raises(IndexError):
+            col.raw(-len(values) - 1)
+
+    # Path-like objects
+    with temporenc.TemporencColumn(tmpdir.join('column.tenc')) as col:
+        assert len(col) == len(values)
+
+    # File objects and buffers work as well.
+    with open(path, 'rb') as fp:
+        with temporenc.TemporencColumn(fp) as col:
+            assert col[1].datetime() == values[1]
+    col = temporenc.TemporencColumn(data)
+    assert col[2].datetime() == values[2]
+    col = temporenc.TemporencColumn(memoryview(data))
+    assert col.raw(2) == temporenc.packb(values[2], type='DTS')
+    assert col.bisect_left(values[2]) == 2
+    assert [m.datetime() for m in col.range(values[2], values[4])] == (
+        values[2:4])
+    col.verify()
+
+
+def test_column_writer():
+    fp = io.BytesIO()
+    fp.write(b'prefix')
+    encoded = temporenc.packb(type='DTZ', year=1983, tz_offset=60)
+    with temporenc.ColumnWriter(fp, 'DTZ', checksum=False) as writer:
+        writer.write(encoded)
+        writer.write_many([bytearray(encoded), memoryview(encoded)])
+        writer.write(datetime.date(1983, 1, 15))
+
+        with pytest.raises(ValueError):
+            writer.write(temporenc.packb(type='DT'))
+        with pytest.raises(ValueError):
+            writer.write(encoded[:-1])
+        with pytest.raises(ValueError):
+            writer.write('foo')
+
+    with pytest.raises(ValueError):
+        writer.write(encoded)
+
+    data = fp.getvalue()[len(b'prefix'):]
+    assert len(data) == HEADER.size + 4 * 6
+
+    col = temporenc.TemporencColumn(data)
+    assert len(col) == 4
+    assert col.type == 'DTZ'
+    assert col.precision is None
+    assert col.raw(0) == encoded
+    assert col[3].date() == datetime.date(1983, 1, 15)
+    col.verify()  # no checksum, so this is a no-op
+
+
+def test_column_types():
+    for type in ('D', 'T', 'DT', 'DTZ', 'DTS', 'DTSZ'):
+        for precision in ('ms', 'us', 'ns', None):
+            fp = io.BytesIO()
+            temporenc.write_column(fp, [], type=type, precision=precision)
+            col = temporenc.TemporencColumn(fp.getvalue())
+            assert len(col) == 0
+            assert list(col) == []
+            assert col.type == type
+            if type in ('DTS', 'DTSZ'):
+                assert col.precision == precision
+
+    with pytest.raises(ValueError):
+        temporenc.write_column(io.BytesIO(), [], type='foo')
+    with pytest.raises(ValueError):
+        temporenc.write_column(io.BytesIO(), [], type='DTS', precision='fs')
+
+
+def test_column_invalid():
+    fp = io.BytesIO()
+    temporenc.write_column(fp, make_values(10), type='DT')
+    data = fp.getvalue()
+
+    with pytest.raises(ValueError) as e:
+        temporenc.TemporencColumn(data[:10])
+    assert 'too short' in str(e.value)
+
+    with pytest.raises(ValueError) as e:
+        temporenc.TemporencColumn(b'XXXX' + data[4:])
+    assert 'magic' in str(e.value)
+
+    with pytest.raises(ValueError) as e:
+        temporenc.TemporencColumn(data[:4] + b'\x02' + data[5:])
+    assert 'version' in str(e.value)
+
+    with pytest.raises(ValueError) as e:
+        temporenc.TemporencColumn(data[:7] + b'\x07' + data[8:])
+    assert 'type' in str(e.value)
+
+    with pytest.raises(ValueError) as e:
+        temporenc.TemporencColumn(data[:-1])
+    assert 'truncated' in str(e.value)
+
+    corrupt = bytearray(data)
+    corrupt[HEADER.size + 3] ^= 0xff
+    with pytest.raises(ValueError) as e:
+        temporenc.TemporencColumn(corrupt).verify()
+    assert 'checksum' in str(e.value)
+
+
+def test_column_frombuffer():
+    values = make_values(10)
+    buf = b''.join(temporenc.packb(v, type='DTSZ', tz_offset=0)
+                   for v in values)
+    col = temporenc.TemporencColumn.frombuffer(buf, 'DTSZ', 'us')
+    assert len(col) == 10
+    assert col.size == 9
+    assert [m.datetime().replace(tzinfo=None) for m in col] == values
+    col.verify()  # no checksum, so this is a no-op
+
+    with pytest.raises(ValueError):
+        temporenc.TemporencColumn.frombuffer(buf[:-1], 'DTSZ', 'us')
+
+
+def test_column_search():
+    values = make_values(1000)
+    values = values + values[500:600]  # duplicates
+    values.sort()
+    buf = b''.join(temporenc.packb(v, type='DTS') for v in values)
+    col = temporenc.TemporencColumn.frombuffer(buf, 'DTS')
+
+    for i in (0, 1, 499, 500, 550, 599, 600, 1099):
+        value = values[i]
+        encoded = temporenc.packb(value, type='DTS')
+        assert col.bisect_left(value) == bisect.bisect_left(values, value)
+        assert col.bisect_right(value) == bisect.bisect_right(values, value)
+        assert col.bisect_left(encoded) == col.bisect_left(value)
+
+    assert col.bisect_left(values[0] - datetime.timedelta(1)) == 0
+    assert col.bisect_right(values[-1] + datetime.timedelta(1)) == 1100
+    assert col.bisect_left(values[-1], lo=1090) == 1099
+    assert col.bisect_left(values[-1], hi=100) == 100
+
+    start, end = values[100], values[200]
+    actual = [m.datetime() for m in col.range(start, end)]
+    assert actual == [v for v in values if start <= v < end]
+    assert len(col.range(end=end)) == 200
+    assert len(col.range(start=values[-1])) == 1
+    assert col.range(end, start) == []
+
+    # Range bounds are not truncated to the column precision.
+    ms_buf = b''.join(map(temporenc.make_packer('DTS', 'ms'), values))
+    ms_col = temporenc.TemporencColumn.frombuffer(ms_buf, 'DTS', 'ms')
+    start, end = [
+        v.replace(microsecond=v.microsecond // 1000 * 1000 + 500)
+        for v in (values[100], values[200])]
+    for bounds in [(start, end), (temporenc.Moment.from_datetime(start),
+                                  temporenc.Moment.from_datetime(end))]:
+        actual = [m.datetime() for m in ms_col.range(*bounds)]
+        assert actual == [
+            v for v in (v.replace(microsecond=v.microsecond // 1000 * 1000)
+                        for v in values)
+            if start <= v < end]
+
+    # Search bounds must match the column type and precision.
+    with pytest.raises(ValueError):
+        col.bisect_left(temporenc.packb(type='DTS', millisecond=0))
+    with pytest.raises(ValueError):
+        col.bisect_left(123)
+    with pytest.raises(ValueError):
+        col.bisect_left(values[0], lo=-1)
+
+
+def test_column_search_file(tmpdir):
+    values = make_values(100)
+    path = str(tmpdir.join('column.tenc'))
+    with open(path, 'wb') as fp:
+        temporenc.write_column(fp, values, type='DT')
+
+    with temporenc.TemporencColumn(path) as col:
+        bound = values[50].replace(microsecond=0)
+        assert col.bisect_left(bound) == 50
+        assert col.range(values[10], values[12])[0].datetime() == (
+            values[10].replace(microsecond=0))
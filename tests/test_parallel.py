@@ -0,0 +1,123 @@
+import datetime
+import sys
+
+import pytest
+
+import temporenc
+
+if sys.version_info < (3, 8):
+    pytest.skip("parallel decoding requires Python 3.8+",
+                allow_module_level=True)
+
+from temporenc import parallel  # noqa
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def make_values(n):
+    start = datetime.datetime(1969, 12, 31, 23, 59, 0, 123456)
+    step = datetime.timedelta(seconds=12345, microseconds=789)
+    return [start + i * step for i in range(n)]
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_unpack_parallel_fields(monkeypatch, workers):
+    monkeypatch.setattr(parallel, 'PARALLEL_THRESHOLD', 0)
+    values = make_values(100)
+    packer = temporenc.make_packer('DTSZ', 'ms')
+    buf = b''.join(
+        packer(v.replace(tzinfo=temporenc.temporenc.FixedOffset(-90)))
+        for v in values)
+    buf += temporenc.packb(type='DTSZ', millisecond=1)
+
+    columns = temporenc.unpack_parallel(buf, 'DTSZ', 'ms', workers=workers)
+    assert sorted(columns) == sorted(parallel.FIELDS)
+    for i in range(len(values)):
+        moment = temporenc.unpackb(buf[i * 8:(i + 1) * 8])
+        for name in parallel.FIELDS:
+            assert columns[name][i] == getattr(moment, name)
+
+    for name in parallel.FIELDS:
+        expected = 1000000 if name == 'nanosecond' else parallel.MISSING
+        assert columns[name][-1] == expected
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_unpack_parallel_epoch(monkeypatch, workers):
+    monkeypatch.setattr(parallel, 'PARALLEL_THRESHOLD', 0)
+    values = make_values(100)
+    buf = b''.join(temporenc.packb(v, type='DTS') for v in values)
+
+    for unit, per_second in (('s', 1), ('ms', 1000), ('us', 1000000),
+                             ('ns', 1000000000)):
+        actual = temporenc.unpack_parallel(
+            buf, 'DTS', workers=workers, unit=unit)
+        expected = [
+            (v - EPOCH) // datetime.timedelta(seconds=1) * per_second
+            + v.microsecond * per_second // 1000000
+            for v in values]
+        assert list(actual) == expected
+
+    # Time zones
+    tz = temporenc.temporenc.FixedOffset(120)
+    buf = b''.join(
+        temporenc.packb(v.replace(tzinfo=tz), type='DTZ') for v in values)
+    local = temporenc.unpack_parallel(buf, 'DTZ', workers=workers, unit='s')
+    utc = temporenc.unpack_parallel(
+        buf, 'DTZ', workers=workers, unit='s', utc=True)
+    assert [a - b for a, b in zip(local, utc)] == [7200] * len(values)
+
+
+def test_unpack_parallel_epoch_special():
+    buf = temporenc.packb(type='D', year=1970, month=1, day=2)
+    assert list(temporenc.unpack_parallel(buf, 'D', unit='s')) == [86400]
+
+    buf = temporenc.packb(
+        type='DT', year=1970, month=1, day=1, hour=0, minute=0, second=60)
+    assert list(temporenc.unpack_parallel(buf, 'DT', unit='s')) == [59]
+
+    buf = temporenc.packb(type='DT', year=1970, month=1, day=1)
+    with pytest.raises(ValueError):
+        temporenc.unpack_parallel(buf, 'DT', unit='s')
+
+    buf = temporenc.packb(type='D', year=1970)
+    with pytest.raises(ValueError):
+        temporenc.unpack_parallel(buf, 'D', unit='s')
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_unpack_parallel_epoch_overflow(monkeypatch, workers):
+    monkeypatch.setattr(parallel, 'PARALLEL_THRESHOLD', 0)
+    for year in (2263, 1677):
+        buf = temporenc.packb(datetime.date(2000, 1, 1)) * 10
+        buf += temporenc.packb(datetime.date(year, 1, 1))
+        assert len(temporenc.unpack_parallel(
+            buf, 'D', workers=workers, unit='us')) == 11
+        with pytest.raises(ValueError) as e:
+            temporenc.unpack_parallel(buf, 'D', workers=workers, unit='ns')
+        assert 'index 10' in str(e.value)
+
+
+def test_unpack_parallel_invalid(monkeypatch):
+    buf = temporenc.packb(type='D') * 10
+
+    with pytest.raises(ValueError):
+        temporenc.unpack_parallel(buf[:-1], 'D')
+    with pytest.raises(ValueError):
+        temporenc.unpack_parallel(buf, 'D', unit='fortnight')
+    with pytest.raises(ValueError):
+        temporenc.unpack_parallel(buf, 'T', unit='s')
+    with pytest.raises(ValueError):
+        temporenc.unpack_parallel(buf, 'D', workers=0)
+
+    # Mixed types, also when raised in a worker process
+    buf += temporenc.packb(type='T')
+    with pytest.raises(ValueError):
+        temporenc.unpack_parallel(buf, 'D')
+    monkeypatch.setattr(parallel, 'PARALLEL_THRESHOLD', 0)
+    with pytest.raises(ValueError):
+        temporenc.unpack_parallel(buf, 'D', workers=2)
+
+    assert temporenc.unpack_parallel(b'', 'D', unit='s') == (
+        parallel.array.array('q'))
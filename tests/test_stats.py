@@ -0,0 +1,126 @@
+import datetime
+import io
+
+import pytest
+
+import temporenc
+from temporenc import stats
+
+
+@pytest.fixture
+def instrumented():
+    stats.reset()
+    stats.enable()
+    try:
+        yield
+    finally:
+        stats.disable()
+        stats.reset()
+
+
+def test_disabled():
+    originals = (temporenc.packb, temporenc.unpackb, temporenc.Cache.packb)
+    assert not stats.is_enabled()
+
+    stats.enable()
+    assert stats.is_enabled()
+    assert temporenc.packb is not originals[0]
+    assert temporenc.unpackb is not originals[1]
+    assert temporenc.temporenc.unpackb is not originals[1]
+
+    # The public functions are instrumented.
+    stats.reset()
+    temporenc.unpackb(temporenc.packb(year=1983))
+    assert stats.snapshot()['encode']['count'] == 1
+    assert stats.snapshot()['decode']['count'] == 1
+
+    stats.disable()
+    assert not stats.is_enabled()
+    assert (temporenc.packb, temporenc.unpackb,
+            temporenc.Cache.packb) == originals
+    assert temporenc.temporenc.unpackb is originals[1]
+
+    # Nothing is recorded while disabled.
+    stats.reset()
+    temporenc.unpackb(temporenc.packb(year=1983))
+    assert stats.snapshot()['encode']['count'] == 0
+
+
+def test_counts(instrumented):
+    dt = datetime.datetime(2014, 10, 23, 18, 45, 23, 612883)
+    value = temporenc.packb(dt, type='DTS')
+    temporenc.packb(dt.date())
+    temporenc.unpackb(value)
+    temporenc.unpackb_datetime(value)
+    temporenc.unpack_from(b'\x00' + value, 1)
+    temporenc.unpack(io.BytesIO(value))
+
+    snapshot = stats.snapshot()
+    encode = snapshot['encode']
+    assert encode['count'] == 2
+    assert encode['bytes'] == 8 + 3
+    assert encode['types'] == {('DTS', 'us'): 1, ('D', None): 1}
+    assert encode['failures'] == {}
+    assert encode['time'] == 0.0
+
+    decode = snapshot['decode']
+    assert decode['count'] == 4
+    assert decode['bytes'] == 4 * 8
+    assert decode['types'] == {('DTS', 'us'): 4}
+
+    # Snapshots are copies.
+    snapshot['decode']['types'].clear()
+    assert stats.snapshot()['decode']['types'] == {('DTS', 'us'): 4}
+
+    stats.reset()
+    assert stats.snapshot()['decode']['count'] == 0
+
+
+def test_failures(instrumented):
+    with pytest.raises(ValueError):
+        temporenc.packb(hour=24)
+    for value in ('47 bf 07 49 93 07 b1', '47 bf 07 49 93 07 b2', 'ff'):
+        with pytest.raises(ValueError):
+            temporenc.unpackb(bytes(bytearray.fromhex(value)))
+
+    snapshot = stats.snapshot()
+    assert snapshot['encode']['count'] == 0
+    assert snapshot['encode']['failures'] == {
+        'hour not within supported range': 1}
+    assert snapshot['decode']['count'] == 0
+    assert snapshot['decode']['failures'] == {
+        'padding bits must be zero': 2,
+        'DTSZ value with precision 11 must be 7 bytes; got 1': 1,
+    }
+
+
+def test_cache(instrumented):
+    cache = temporenc.Cache()
+    d = datetime.date(1983, 1, 15)
+    for _ in range(3):
+        cache.unpackb(cache.packb(d))
+
+    snapshot = stats.snapshot()
+    assert snapshot['cache'] == {'hits': 4, 'misses': 2}
+    assert snapshot['encode']['count'] == 1
+    assert snapshot['decode']['count'] == 1
+
+
+def test_timing_and_hook():
+    events = []
+    stats.reset()
+    stats.enable(timing=True, hook=lambda *args: events.append(args))
+    try:
+        value = temporenc.packb(year=1983, hour=18)
+        with pytest.raises(ValueError):
+            temporenc.unpackb(value[:3])
+    finally:
+        stats.disable()
+
+    assert stats.snapshot()['encode']['time'] > 0.0
+    stats.reset()
+
+    assert events[0] == ('encode', 'DT', None, 5, None)
+    operation, type, precision, size, error = events[1]
+    assert (operation, type, precision, size) == ('decode', None, None, None)
+    assert isinstance(error, ValueError)
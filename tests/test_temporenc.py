@@ -588,3 +588,923 @@ def test_hash():
     d[v3] = 3
     assert len(d) == 2
     assert d[v1] == 2
+
+
+def test_empty_tz_offset():
+    v = temporenc.unpackb(temporenc.packb(type='DTZ'))
+    assert v.tz_offset is None
+    v = temporenc.unpackb(temporenc.packb(type='DTSZ', millisecond=0))
+    assert v.tz_offset is None
+    assert v.millisecond == 0
+
+
+def test_stream_unpacking_eof():
+    fp = io.BytesIO(from_hex('8f 7e 0e 8f 7e'))
+    assert temporenc.unpack(fp).day == 15
+    with pytest.raises(ValueError):
+        temporenc.unpack(fp)  # incomplete value
+    with pytest.raises(ValueError):
+        temporenc.unpack(fp)  # end of stream
+
+
+def test_iter_unpack():
+    values = [
+        temporenc.packb(year=1983, month=1, day=15),
+        temporenc.packb(hour=18, minute=25, second=12),
+        temporenc.packb(datetime.datetime(1983, 1, 15, 18, 25, 12, 123456)),
+        temporenc.packb(millisecond=123, tz_offset=60),
+        temporenc.packb(nanosecond=123456789, tz_offset=60),
+    ] * 20
+    data = b''.join(values)
+    expected = [temporenc.unpackb(value) for value in values]
+
+    # Buffer sizes that cause values to be split across reads
+    for buffer_size in (1, 2, 3, 7, 64, 1024):
+        fp = io.BytesIO(data)
+        actual = list(temporenc.iter_unpack(fp, buffer_size=buffer_size))
+        assert actual == expected
+
+    assert list(temporenc.iter_unpack(io.BytesIO())) == []
+
+    with pytest.raises(ValueError) as e:
+        list(temporenc.iter_unpack(io.BytesIO(data[:-1]), buffer_size=5))
+    assert 'end of stream' in str(e.value)
+
+    with pytest.raises(ValueError) as e:
+        list(temporenc.iter_unpack(io.BytesIO(data + from_hex('bb 12 34'))))
+    assert 'tag' in str(e.value)
+
+    for buffer_size in (0, -1):
+        with pytest.raises(ValueError):
+            temporenc.iter_unpack(io.BytesIO(data), buffer_size=buffer_size)
+
+
+def test_writer():
+
+    class RawStream(object):
+        # Unbuffered stream that only accepts a few bytes per write.
+        def __init__(self):
+            self.writes = []
+
+        def write(self, data):
+            self.writes.append(bytes(data[:5]))
+            return len(self.writes[-1])
+
+    values = [datetime.date(1983, 1, day) for day in range(1, 11)]
+    expected = b''.join(temporenc.packb(value) for value in values)
+
+    fp = RawStream()
+    with temporenc.TemporencWriter(fp, buffer_size=10) as writer:
+        assert writer.write(values[0]) == 3
+        assert writer.write(year=1983, month=1, day=2) == 3
+        assert fp.writes == []
+        assert writer.write_many(values[2:]) == 24
+    assert b''.join(fp.writes) == expected
+
+    fp = io.BytesIO()
+    writer = temporenc.TemporencWriter(fp, type='DTS')
+    writer.write_many(values)
+    writer.write(values[0], type='D')
+    assert fp.getvalue() == b''
+    writer.flush()
+    assert fp.getvalue() == b''.join(
+        [temporenc.packb(value, type='DTS') for value in values]
+        + [temporenc.packb(values[0], type='D')])
+    writer.flush()  # no-op
+
+    with pytest.raises(ValueError):
+        temporenc.TemporencWriter(fp, type='foo')
+    with pytest.raises(ValueError):
+        temporenc.TemporencWriter(fp, buffer_size=0)
+
+
+def test_writer_partial_writes():
+
+    class NonBlockingStream(io.RawIOBase):
+        # Non-blocking raw stream that accepts a limited number of bytes
+        # before it would block, and fails after a number of writes.
+        def __init__(self):
+            self.data = bytearray()
+            self.available = 0
+            self.fail_after = None
+
+        def writable(self):
+            return True
+
+        def write(self, data):
+            if self.fail_after is not None:
+                if not self.fail_after:
+                    raise IOError("connection reset")
+                self.fail_after -= 1
+            if not self.available:
+                return None
+            n = min(len(data), self.available, 4)
+            self.data += data[:n]
+            self.available -= n
+            return n
+
+    values = [datetime.date(1983, 1, day) for day in range(1, 11)]
+    expected = b''.join(temporenc.packb(value) for value in values)
+
+    fp = NonBlockingStream()
+    writer = temporenc.TemporencWriter(fp, buffer_size=100)
+    writer.write_many(values)
+    fp.available = 10
+    with pytest.raises(io.BlockingIOError) as e:
+        writer.flush()
+    assert e.value.characters_written == 10
+    assert bytes(fp.data) == expected[:10]
+
+    # Nothing is lost or written twice when retrying.
+    with pytest.raises(io.BlockingIOError):
+        writer.flush()
+    fp.available = 100
+    writer.flush()
+    assert bytes(fp.data) == expected
+
+    fp = NonBlockingStream()
+    fp.available = 100
+    fp.fail_after = 2
+    writer = temporenc.TemporencWriter(fp, buffer_size=100)
+    writer.write_many(values)
+    with pytest.raises(IOError):
+        writer.flush()
+    assert bytes(fp.data) == expected[:8]
+    fp.fail_after = None
+    writer.flush()
+    assert bytes(fp.data) == expected
+
+
+def test_unpack_from():
+    import mmap
+
+    data = from_hex('bb bb bb 8f 7e 0e 57 bf 07 49 93 07 89 00 bb bb')
+
+    for buffer in (data, bytearray(data), memoryview(data)):
+        moment, size = temporenc.unpack_from(buffer, 3)
+        assert size == 3
+        assert moment.date() == datetime.date(1983, 1, 15)
+        moment, size = temporenc.unpack_from(buffer, offset=6)
+        assert size == 8
+        assert moment.microsecond == 123456
+
+    mm = mmap.mmap(-1, len(data))
+    mm.write(data)
+    moment, size = temporenc.unpack_from(mm, 6)
+    assert size == 8
+    assert moment == temporenc.unpackb(data[6:14])
+    mm.close()
+
+    moment, size = temporenc.unpack_from(from_hex('8f 7e 0e'))
+    assert size == 3
+
+    with pytest.raises(ValueError) as e:
+        temporenc.unpack_from(data, 0)
+    assert 'tag' in str(e.value)
+
+    with pytest.raises(ValueError):
+        temporenc.unpack_from(data[:10], 6)  # too short
+
+    with pytest.raises(ValueError):
+        temporenc.unpack_from(data, len(data))
+
+    with pytest.raises(ValueError):
+        temporenc.unpack_from(data, -1)
+
+    with pytest.raises(ValueError) as e:
+        temporenc.unpack_from(from_hex('47 bf 07 49 93 07 b2'))
+    assert 'padding' in str(e.value)
+
+
+def test_make_packer():
+    from temporenc.temporenc import FixedOffset
+
+    values = [
+        datetime.datetime(1983, 1, 15, 18, 25, 12, 123456),
+        datetime.datetime(2014, 10, 23, 0, 0, 0, 0),
+        datetime.datetime(1, 1, 1, 0, 0, 0, 999999),
+        datetime.datetime(4094, 12, 31, 23, 59, 59, 1000),
+        datetime.datetime(
+            1983, 1, 15, 18, 25, 12, 123456, tzinfo=FixedOffset(60)),
+        datetime.datetime(
+            1983, 1, 15, 18, 25, 12, 123456, tzinfo=FixedOffset(-570)),
+    ]
+    subsecond = {
+        'ms': lambda us: {'millisecond': us // 1000},
+        'us': lambda us: {'microsecond': us},
+        'ns': lambda us: {'nanosecond': us * 1000},
+        None: lambda us: {},
+    }
+
+    def expected(type, precision, year=None, month=None, day=None,
+                 hour=None, minute=None, second=None, microsecond=0,
+                 tz_offset=None):
+        kwargs = {}
+        if type in ('DTS', 'DTSZ'):
+            kwargs = subsecond[precision](microsecond)
+        return temporenc.packb(
+            type=type, year=year, month=month, day=day,
+            hour=hour, minute=minute, second=second, tz_offset=tz_offset,
+            **kwargs)
+
+    for type in ('D', 'T', 'DT', 'DTZ', 'DTS', 'DTSZ'):
+        for precision in ('ms', 'us', 'ns', None):
+            packer = temporenc.make_packer(type, precision)
+            date_packer = temporenc.make_packer(type, precision, 'date')
+            time_packer = temporenc.make_packer(type, precision, 'time')
+            for value in values:
+                offset = value.utcoffset()
+                if offset is not None:
+                    offset = offset.days * 1440 + offset.seconds // 60
+                date_fields = dict(
+                    year=value.year, month=value.month, day=value.day)
+                time_fields = dict(
+                    hour=value.hour, minute=value.minute,
+                    second=value.second, microsecond=value.microsecond,
+                    tz_offset=offset)
+
+                assert packer(value) == expected(
+                    type, precision, **dict(date_fields, **time_fields))
+                assert time_packer(value.timetz()) == expected(
+                    type, precision, **time_fields)
+                assert date_packer(value.date()) == expected(
+                    type, precision, **date_fields)
+
+            # Defaults are the same as packb()
+            if precision == 'us':
+                for value in values:
+                    assert packer(value) == temporenc.packb(value, type=type)
+
+
+def test_make_packer_invalid():
+    with pytest.raises(ValueError):
+        temporenc.make_packer('foo')
+
+    with pytest.raises(ValueError):
+        temporenc.make_packer('DTS', precision='fs')
+
+    with pytest.raises(ValueError):
+        temporenc.make_packer('DTS', source='foo')
+
+    packer = temporenc.make_packer('DT')
+    with pytest.raises(ValueError):
+        packer(datetime.datetime(5000, 1, 1))
+
+    packer = temporenc.make_packer('D', source='date')
+    with pytest.raises(ValueError):
+        packer(datetime.date(5000, 1, 1))
+
+    from temporenc.temporenc import FixedOffset
+    packer = temporenc.make_packer('DTZ')
+    with pytest.raises(ValueError):
+        packer(datetime.datetime(2000, 1, 1, tzinfo=FixedOffset(13)))
+
+
+def test_lazy_unpacking():
+    value = temporenc.packb(
+        datetime.datetime(1983, 1, 15, 18, 25, 12, 123456), type='DTSZ',
+        tz_offset=60)
+    expected = temporenc.unpackb(value)
+
+    moment = temporenc.unpackb(value, lazy=True)
+    assert isinstance(moment, temporenc.Moment)
+    assert moment.year == 1983
+    assert moment == expected
+    assert str(moment) == str(expected)
+    assert moment.datetime() == expected.datetime()
+
+    for name in ('month', 'day', 'hour', 'minute', 'second', 'millisecond',
+                 'microsecond', 'nanosecond', 'tz_offset'):
+        lazy = temporenc.unpackb(value, lazy=True)
+        assert getattr(lazy, name) == getattr(expected, name)
+
+    # Comparison and hashing are consistent with regular instances
+    assert temporenc.unpackb(value, lazy=True) == expected
+    assert expected == temporenc.unpackb(value, lazy=True)
+    assert not (temporenc.unpackb(value, lazy=True) != expected)
+    assert hash(temporenc.unpackb(value, lazy=True)) == hash(expected)
+    assert len(set([
+        expected,
+        temporenc.unpackb(value, lazy=True),
+        temporenc.unpackb(bytearray(value), lazy=True),
+        temporenc.unpackb(memoryview(value), lazy=True)])) == 1
+    assert temporenc.unpackb(memoryview(value), lazy=True).datetime() == (
+        expected.datetime())
+    later = temporenc.unpackb(temporenc.packb(
+        datetime.datetime(2000, 1, 1), type='DTSZ', tz_offset=60), lazy=True)
+    assert later != temporenc.unpackb(value, lazy=True)
+    assert later > temporenc.unpackb(value, lazy=True)
+    assert later > expected
+
+    # Equal encoded values do not need decoding to compare equal
+    a = temporenc.unpackb(value, lazy=True)
+    b = temporenc.unpackb(value, lazy=True)
+    assert a == b
+    assert not (a != b)
+    with pytest.raises(AttributeError):
+        object.__getattribute__(a, '_canonical')
+
+    with pytest.raises(AttributeError):
+        a.foo
+
+    # Tag and length errors are raised immediately, but range checks
+    # are postponed
+    with pytest.raises(ValueError):
+        temporenc.unpackb(from_hex('bb 12 34'), lazy=True)
+    with pytest.raises(ValueError):
+        temporenc.unpackb(value[:-1], lazy=True)
+    moment = temporenc.unpackb(from_hex('47 bf 07 49 93 07 b2'), lazy=True)
+    with pytest.raises(ValueError):
+        moment.year
+
+
+def test_encoded_ordering():
+    start = datetime.datetime(1983, 1, 15, 18, 25, 12, 123456)
+    values = [
+        start + datetime.timedelta(seconds=n * 123457, microseconds=n * 7)
+        for n in range(-50, 50)
+    ]
+    values.extend(values[:10])  # duplicates
+
+    for type in ('D', 'T', 'DT', 'DTZ', 'DTS', 'DTSZ'):
+        encoded = [temporenc.packb(v, type=type, tz_offset=60) for v in values]
+        expected = sorted(encoded, key=temporenc.unpackb)
+        assert sorted(encoded, key=temporenc.sort_key) == expected
+        assert temporenc.sorted_encoded(encoded) == expected
+        assert temporenc.sorted_encoded(
+            map(bytearray, encoded), reverse=True) == expected[::-1]
+        unique = temporenc.sorted_encoded(encoded, unique=True)
+        assert len(unique) == len(set(encoded))
+        assert unique == sorted(set(expected), key=temporenc.unpackb)
+
+        for a, b in zip(encoded, encoded[1:]):
+            actual = temporenc.compare_encoded(a, b)
+            ma, mb = temporenc.unpackb(a), temporenc.unpackb(b)
+            if ma < mb:
+                assert actual < 0
+            elif ma > mb:
+                assert actual > 0
+            else:
+                assert actual == 0
+
+    assert temporenc.sorted_encoded([]) == []
+    assert isinstance(temporenc.sort_key(bytearray(encoded[0])), bytes)
+    assert temporenc.sort_key(memoryview(encoded[0])) == encoded[0]
+    assert temporenc.sorted_encoded(
+        [memoryview(value) for value in encoded]) == sorted(encoded)
+
+    # Missing components sort last
+    a = temporenc.packb(type='D', year=1983, month=1, day=15)
+    b = temporenc.packb(type='D', year=1983, month=1)
+    assert temporenc.compare_encoded(a, b) < 0
+    assert temporenc.compare_encoded(bytearray(b), a) > 0
+    assert temporenc.compare_encoded(a, memoryview(a)) == 0
+
+
+def test_encoded_ordering_mixed_types():
+    d = temporenc.packb(type='D', year=1983)
+    dt = temporenc.packb(type='DT', year=1983)
+    dts_ms = temporenc.packb(type='DTS', year=1983, millisecond=0)
+    dts_us = temporenc.packb(type='DTS', year=1983, microsecond=0)
+
+    with pytest.raises(ValueError):
+        temporenc.compare_encoded(d, dt)
+    with pytest.raises(ValueError):
+        temporenc.compare_encoded(dts_ms, dts_us)
+    with pytest.raises(ValueError):
+        temporenc.sorted_encoded([d, d, dt])
+    with pytest.raises(ValueError):
+        temporenc.sort_key(d + b'foo')
+    with pytest.raises(ValueError):
+        temporenc.sort_key(from_hex('bb 12 34'))
+
+
+def test_cache():
+    from temporenc.temporenc import FixedOffset
+
+    cache = temporenc.Cache(maxsize=2)
+    assert len(cache) == 0
+
+    # Packing
+    dt = datetime.datetime(1983, 1, 15, 18, 25, 12, 123456)
+    assert cache.packb(dt) == temporenc.packb(dt)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert cache.packb(dt) == temporenc.packb(dt)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.packb(dt, type='DT') == temporenc.packb(dt, type='DT')
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # Equal values with different time zones are different
+    utc = dt.replace(tzinfo=FixedOffset(0))
+    dutch = (utc + datetime.timedelta(hours=1)).replace(
+        tzinfo=FixedOffset(60))
+    assert utc == dutch
+    assert cache.packb(utc, 'DTZ') == temporenc.packb(utc, type='DTZ')
+    assert cache.packb(dutch, 'DTZ') == temporenc.packb(dutch, type='DTZ')
+    assert cache.packb(utc, 'DTZ') != cache.packb(dutch, 'DTZ')
+
+    # Dates
+    date = dt.date()
+    assert cache.packb(date) == temporenc.packb(date)
+
+    # Unpacking
+    cache.clear()
+    assert (cache.hits, cache.misses, len(cache)) == (0, 0, 0)
+    value = temporenc.packb(dt)
+    moment = cache.unpackb(value)
+    assert moment == temporenc.unpackb(value)
+    assert cache.unpackb(bytearray(value)) is moment
+    assert cache.unpackb(memoryview(value)) is moment
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    with pytest.raises(ValueError):
+        cache.unpackb(value[:-1])
+    with pytest.raises(ValueError):
+        cache.packb(object())
+
+    # Least recently used entries are evicted
+    cache.clear()
+    a = temporenc.packb(year=2001)
+    b = temporenc.packb(year=2002)
+    c = temporenc.packb(year=2003)
+    cache.unpackb(a)
+    cache.unpackb(b)
+    cache.unpackb(a)
+    cache.unpackb(c)  # evicts b
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (1, 3)
+    cache.unpackb(a)
+    assert (cache.hits, cache.misses) == (2, 3)
+    cache.unpackb(b)
+    assert (cache.hits, cache.misses) == (2, 4)
+
+    assert 'hits=2' in repr(cache)
+
+    with pytest.raises(ValueError):
+        temporenc.Cache(maxsize=0)
+
+
+def test_unpackb_native():
+    from temporenc.temporenc import FixedOffset
+
+    values = [
+        temporenc.packb(datetime.datetime(1983, 1, 15, 18, 25, 12, 123456)),
+        temporenc.packb(
+            datetime.datetime(1983, 1, 15, 18, 25, 12, tzinfo=FixedOffset(60)),
+            type='DTZ'),
+        temporenc.packb(year=1983, month=1, day=15),
+        temporenc.packb(hour=18, minute=25, second=12, nanosecond=123456789),
+        temporenc.packb(year=1983, hour=18),
+        temporenc.packb(
+            year=2013, month=6, day=30, hour=23, minute=59, second=60),
+        temporenc.packb(),
+    ]
+
+    functions = [
+        (temporenc.unpackb_datetime, temporenc.Moment.datetime),
+        (temporenc.unpackb_date, temporenc.Moment.date),
+        (temporenc.unpackb_time, temporenc.Moment.time),
+    ]
+
+    for value in values:
+        moment = temporenc.unpackb(value)
+        for func, method in functions:
+            for strict in (True, False):
+                try:
+                    expected = method(moment, strict=strict)
+                except ValueError:
+                    with pytest.raises(ValueError):
+                        func(value, strict=strict)
+                else:
+                    actual = func(bytearray(value), strict=strict)
+                    assert actual == expected
+                    assert type(actual) is type(expected)
+                    if hasattr(expected, 'utcoffset'):
+                        assert actual.utcoffset() == expected.utcoffset()
+
+    assert temporenc.unpackb_datetime(values[0]) == datetime.datetime(
+        1983, 1, 15, 18, 25, 12, 123456)
+
+    with pytest.raises(ValueError):
+        temporenc.unpackb_datetime(values[0][:-1])
+    with pytest.raises(ValueError):
+        temporenc.unpackb_date(from_hex('bb 12 34'))
+    with pytest.raises(ValueError):
+        temporenc.unpackb_time(from_hex('47 bf 07 49 93 07 b2'))
+
+
+def test_epoch():
+    from temporenc.temporenc import FixedOffset
+
+    epoch = datetime.datetime(1970, 1, 1)
+    ns = 1414089923612883456  # 2014-10-23 18:45:23.612883456 UTC
+
+    value = temporenc.packb_epoch(ns)
+    moment = temporenc.unpackb(value)
+    assert moment.datetime() == datetime.datetime(
+        2014, 10, 23, 18, 45, 23, 612883)
+    assert moment.nanosecond == 612883456
+    assert moment.timestamp_ns() == ns
+    assert temporenc.unpackb_epoch(value) == ns
+    assert temporenc.unpackb_epoch(value, unit='us') == ns // 1000
+    assert temporenc.unpackb_epoch(value, unit='s') == ns // 10 ** 9
+
+    # Other units use the corresponding precision
+    for unit, divisor, length in (('s', 10 ** 9, 6), ('ms', 10 ** 6, 7),
+                                  ('us', 1000, 8), ('ns', 1, 9)):
+        value = temporenc.packb_epoch(ns // divisor, unit=unit)
+        assert len(value) == length
+        assert temporenc.unpackb_epoch(value, unit=unit) == ns // divisor
+
+    # Time zones and other types
+    value = temporenc.packb_epoch(ns, tz_offset=120)
+    moment = temporenc.unpackb(value)
+    assert (moment.hour, moment.tz_offset) == (20, 120)
+    assert moment.timestamp_ns() == ns
+    assert temporenc.unpackb_epoch(bytearray(value)) == ns
+    assert temporenc.packb_epoch(
+        ns // 10 ** 9, 's', type='DTZ', tz_offset=0) == (
+        temporenc.packb(
+            datetime.datetime(2014, 10, 23, 18, 45, 23,
+                              tzinfo=FixedOffset(0)), type='DTZ'))
+    assert temporenc.packb_epoch(ns, type='D') == temporenc.packb(
+        year=2014, month=10, day=23)
+    assert temporenc.packb_epoch(ns, type='T') == temporenc.packb(
+        hour=18, minute=45, second=23)
+
+    # Values before the epoch, and the full year range
+    for dt in (datetime.datetime(1969, 12, 31, 23, 59, 59, 999999),
+               datetime.datetime(1, 1, 1),
+               datetime.datetime(4094, 12, 31, 23, 59, 59)):
+        us = (dt - epoch) // datetime.timedelta(microseconds=1)
+        value = temporenc.packb_epoch(us, unit='us')
+        assert temporenc.unpackb(value).datetime() == dt
+        assert temporenc.unpackb_epoch(value, unit='us') == us
+    value = temporenc.packb(year=0, month=1, day=1)
+    assert temporenc.unpackb_epoch(value, unit='s') == -62167219200
+    assert temporenc.packb_epoch(-62167219200, 's', type='D') == value
+
+    # Conversion rules
+    value = temporenc.packb(
+        year=2013, month=6, day=30, hour=23, minute=59, second=60)
+    assert temporenc.unpackb_epoch(value, unit='s') == 1372636799
+    with pytest.raises(ValueError):
+        temporenc.unpackb_epoch(temporenc.packb(hour=12, minute=0, second=0))
+    with pytest.raises(ValueError):
+        temporenc.unpackb(temporenc.packb(
+            year=2000, month=1, day=1, hour=12)).timestamp_ns()
+
+    with pytest.raises(ValueError):
+        temporenc.packb_epoch(ns, unit='fortnight')
+    with pytest.raises(ValueError):
+        temporenc.unpackb_epoch(value, unit='fortnight')
+    with pytest.raises(ValueError):
+        temporenc.packb_epoch(ns, type='foo')
+    with pytest.raises(ValueError):
+        temporenc.packb_epoch(ns, tz_offset=7)
+    with pytest.raises(ValueError):
+        temporenc.packb_epoch(ns, tz_offset=15 * 64)
+    with pytest.raises(ValueError):
+        temporenc.packb_epoch(-62167219201, 's')
+    with pytest.raises(ValueError):
+        temporenc.packb_epoch(67090396800, 's')  # 4095-01-01
+
+
+def test_unpackb_trusted():
+    import random
+
+    rng = random.Random(0)
+    names = ('year', 'month', 'day', 'hour', 'minute', 'second',
+             'millisecond', 'microsecond', 'nanosecond', 'tz_offset')
+    ranges = {
+        'year': (0, 4094), 'month': (1, 12), 'day': (1, 31),
+        'hour': (0, 23), 'minute': (0, 59), 'second': (0, 60),
+        'millisecond': (0, 999), 'microsecond': (0, 999999),
+        'nanosecond': (0, 999999999), 'tz_offset': (-64, 61),
+    }
+
+    for _ in range(20000):
+        kwargs = {}
+        for name in ('year', 'month', 'day', 'hour', 'minute', 'second',
+                     'tz_offset'):
+            if rng.random() < 0.8:
+                kwargs[name] = rng.randint(*ranges[name])
+        if 'tz_offset' in kwargs:
+            kwargs['tz_offset'] *= 15
+        subsecond = rng.choice(
+            ['millisecond', 'microsecond', 'nanosecond', None])
+        if subsecond is not None:
+            kwargs[subsecond] = rng.randint(*ranges[subsecond])
+        kwargs['type'] = rng.choice(['D', 'T', 'DT', 'DTZ', 'DTS', 'DTSZ'])
+
+        value = temporenc.packb(**kwargs)
+        expected = temporenc.unpackb(value)
+        actual = temporenc.unpackb(value, validate=False)
+        assert actual == expected
+        for name in names:
+            assert getattr(actual, name) == getattr(expected, name)
+
+    # Only the tag and the minimum length are checked.
+    with pytest.raises(ValueError):
+        temporenc.unpackb(from_hex('bb 12 34'), validate=False)
+    for value in (temporenc.packb(year=1983, type='DTSZ'),
+                  temporenc.packb(year=1983, type='D')):
+        with pytest.raises(ValueError):
+            temporenc.unpackb(value[:-1], validate=False)
+        assert temporenc.unpackb(
+            value + b'\x00', validate=False) == temporenc.unpackb(value)
+    value = from_hex('47 bf 07 49 93 07 b2')  # invalid padding
+    moment = temporenc.unpackb(value, validate=False)
+    assert moment.millisecond == 123
+
+
+def test_tag_table():
+    from temporenc.temporenc import tag_table
+
+    # Tag bits per the format specification; precision bits are shown
+    # as 'pp', and all other bits as 'x'.
+    def matches(first, pattern):
+        bits = format(first, '08b')
+        return all(p in 'xp' or p == b for p, b in zip(pattern, bits))
+
+    patterns = {
+        'DT': '00xxxxxx', 'DTS': '01ppxxxx', 'D': '100xxxxx',
+        'T': '1010000x', 'DTZ': '110xxxxx', 'DTSZ': '111ppxxx',
+    }
+
+    for first in range(256):
+        type, precision, length, decode, decode_trusted = tag_table[first]
+        expected = [t for t, p in patterns.items() if matches(first, p)]
+        if not expected:
+            assert type is None
+            assert decode is None
+            with pytest.raises(ValueError):
+                temporenc.unpack_from(bytes(bytearray([first] * 10)))
+            continue
+
+        assert [type] == expected
+        if type == 'DTS':
+            assert precision == first >> 4 & 0b11
+        elif type == 'DTSZ':
+            assert precision == first >> 3 & 0b11
+        else:
+            assert precision is None
+
+        # An encoded value with this first byte and all-zero remaining
+        # bits is valid for every type; it decodes the same either way.
+        value = bytes(bytearray([first] + [0] * (length - 1)))
+        moment, size = temporenc.unpack_from(value + b'\xff')
+        assert size == length
+        assert decode(value, 0) == decode_trusted(value, 0)
+        assert moment == temporenc.unpackb(value)
+
+
+def test_moment_representation():
+    dt = datetime.datetime(1983, 1, 15, 18, 25, 12, 123000)
+    ms = temporenc.unpackb(temporenc.packb(dt, type='DTS', millisecond=123))
+    us = temporenc.unpackb(temporenc.packb(dt, type='DTS'))
+    dtsz = temporenc.unpackb(temporenc.packb(dt, type='DTSZ'))
+
+    # Only the components matter, not the type or precision.
+    assert ms == us == dtsz
+    assert hash(ms) == hash(us) == hash(dtsz)
+    assert (ms.millisecond, ms.microsecond, ms.nanosecond) == (
+        123, 123000, 123000000)
+
+    # Attributes are read-only, and there is no per-instance dict.
+    with pytest.raises(AttributeError):
+        ms.year = 2000
+    assert not hasattr(ms, '__dict__')
+
+    # Components are compared in order; missing components sort last,
+    # and the time zone offset is only used as a tie breaker.
+    values = [
+        temporenc.unpackb(temporenc.packb(**kwargs)) for kwargs in [
+            dict(year=1983, month=1, day=15, hour=18),
+            dict(year=1983, month=1, day=15),
+            dict(year=1983, month=1),
+            dict(year=1983, day=1),
+            dict(year=1984),
+            dict(month=1),
+            dict(hour=12, tz_offset=-60),
+            dict(hour=12, tz_offset=60),
+            dict(hour=12),
+            dict(),
+        ]]
+    assert sorted(reversed(values)) == values
+    assert all(a < b for a, b in zip(values, values[1:]))
+
+
+def test_moment_construction():
+    import random
+
+    def detect_type(value):
+        return temporenc.temporenc._detect_type(bytearray(value)[0])
+
+    # from_fields() is equivalent to a packb() and unpackb() round trip
+    rng = random.Random(0)
+    for _ in range(5000):
+        kwargs = {}
+        for name, low, high in [
+                ('year', 0, 4094), ('month', 1, 12), ('day', 1, 31),
+                ('hour', 0, 23), ('minute', 0, 59), ('second', 0, 60),
+                ('tz_offset', -64, 61)]:
+            if rng.random() < 0.7:
+                kwargs[name] = rng.randint(low, high)
+        if 'tz_offset' in kwargs:
+            kwargs['tz_offset'] *= 15
+        subsecond, high = rng.choice([
+            ('millisecond', 999), ('microsecond', 999999),
+            ('nanosecond', 999999999), (None, None)])
+        if subsecond is not None:
+            kwargs[subsecond] = rng.randint(0, high)
+
+        expected = temporenc.packb(**kwargs)
+        moment = temporenc.Moment.from_fields(**kwargs)
+        assert moment == temporenc.unpackb(expected)
+
+        # pack() uses the same type as packb(), and is lossless
+        packed = moment.pack()
+        assert detect_type(packed)[0] == detect_type(expected)[0]
+        assert temporenc.unpackb(packed) == moment
+        type = rng.choice(['D', 'T', 'DT', 'DTZ', 'DTS', 'DTSZ'])
+        if subsecond is not None or type not in ('DTS', 'DTSZ'):
+            assert moment.pack(type) == temporenc.unpackb(
+                temporenc.packb(type=type, **kwargs)).pack(type)
+
+    with pytest.raises(ValueError):
+        temporenc.Moment.from_fields(hour=24)
+    with pytest.raises(ValueError):
+        temporenc.Moment.from_fields(tz_offset=7)
+
+    # from_datetime() uses the same components as packb()
+    tz = temporenc.temporenc.FixedOffset(60)
+    for value in [
+            datetime.datetime(1983, 1, 15, 18, 25, 12, 123456),
+            datetime.datetime(1983, 1, 15, 18, 25, 12, tzinfo=tz),
+            datetime.date(1983, 1, 15),
+            datetime.time(18, 25, 12, 123456, tzinfo=tz)]:
+        moment = temporenc.Moment.from_datetime(value)
+        assert moment == temporenc.unpackb(temporenc.packb(value))
+    with pytest.raises(ValueError):
+        temporenc.Moment.from_datetime('junk')
+
+    # Precision selection
+    moment = temporenc.Moment.from_fields(
+        2014, 10, 23, 18, 45, 23, microsecond=612000, tz_offset=120)
+    assert len(moment.pack()) == 8  # DTSZ, milliseconds
+    assert moment.pack() == temporenc.packb(
+        type='DTSZ', millisecond=612, year=2014, month=10, day=23,
+        hour=18, minute=45, second=23, tz_offset=120)
+    assert len(moment.pack(precision='us')) == 9
+    assert len(moment.pack(precision=None)) == 7
+    assert temporenc.unpackb(moment.pack('DTS', 'ms')).tz_offset is None
+    assert temporenc.unpackb(moment.pack('DT')).nanosecond is None
+    with pytest.raises(ValueError):
+        moment.pack('DTS', 'seconds')
+    with pytest.raises(ValueError):
+        moment.pack('XYZ')
+    with pytest.raises(ValueError):
+        moment.replace(nanosecond=None).pack('DTS', 'ms')
+
+    # Modification
+    assert moment.replace(tz_offset=None).pack() == temporenc.packb(
+        type='DTS', millisecond=612, year=2014, month=10, day=23,
+        hour=18, minute=45, second=23)
+    changed = moment.replace(year=2000, nanosecond=1)
+    assert (changed.year, changed.month, changed.nanosecond) == (2000, 10, 1)
+    assert moment.year == 2014
+    with pytest.raises(ValueError):
+        moment.replace(month=13)
+    with pytest.raises(TypeError):
+        moment.replace(foo=1)
+
+
+def test_transcode():
+    import random
+
+    types = ['D', 'T', 'DT', 'DTZ', 'DTS', 'DTSZ']
+    precisions = ['ms', 'us', 'ns', None]
+    rng = random.Random(0)
+    for _ in range(5000):
+        kwargs = dict(
+            year=rng.randint(0, 4094), month=rng.randint(1, 12),
+            day=rng.randint(1, 31), hour=rng.randint(0, 23),
+            minute=rng.randint(0, 59), second=rng.randint(0, 60),
+            nanosecond=rng.randint(0, 999999999),
+            tz_offset=rng.randint(-64, 61) * 15)
+        moment = temporenc.Moment.from_fields(**kwargs)
+        source = moment.pack(rng.choice(types), rng.choice(precisions))
+        unpacked = temporenc.unpackb(source)
+        type = rng.choice(types)
+        precision = rng.choice(precisions)
+
+        try:
+            expected = unpacked.pack(type, precision)
+        except ValueError:
+            with pytest.raises(ValueError):
+                temporenc.transcode(source, type, precision)
+            continue
+        assert temporenc.transcode(source, type, precision) == expected
+        assert temporenc.transcode(
+            source, type, precision, validate=False) == expected
+
+    # Defaults keep the type and precision
+    value = temporenc.packb(
+        datetime.datetime(1983, 1, 15, 18, 25, 12, 123456), type='DTSZ',
+        tz_offset=60)
+    assert temporenc.transcode(value) == value
+    dts = temporenc.transcode(value, type='DTS')
+    assert dts == temporenc.packb(
+        datetime.datetime(1983, 1, 15, 18, 25, 12, 123456), type='DTS')
+    assert temporenc.unpackb(
+        temporenc.transcode(value, precision='ms')).microsecond == 123000
+    assert temporenc.transcode(
+        temporenc.packb(year=1983, hour=18), type='DTS') == temporenc.packb(
+        year=1983, hour=18, type='DTS')
+
+    with pytest.raises(ValueError):
+        temporenc.transcode(value, type='XYZ')
+    with pytest.raises(ValueError):
+        temporenc.transcode(value, precision='s')
+    with pytest.raises(ValueError):
+        temporenc.transcode(value[:-1])
+    with pytest.raises(ValueError):
+        temporenc.transcode(from_hex('47 bf 07 49 93 07 b2'))  # padding
+
+
+def test_transcode_buffer():
+    values = [
+        datetime.datetime(2014, 10, 23, 18, 45, 23, 612883)
+        + i * datetime.timedelta(minutes=17, microseconds=1234)
+        for i in range(100)]
+    buffer = b''.join(
+        temporenc.packb(value, type='DTSZ', tz_offset=60, nanosecond=(
+            value.microsecond * 1000 + 789)) for value in values)
+
+    result = temporenc.transcode_buffer(buffer, type='DTS', precision='ms')
+    assert result == b''.join(
+        temporenc.packb(value, type='DTS', millisecond=(
+            value.microsecond // 1000)) for value in values)
+    assert temporenc.transcode_buffer(buffer) == buffer
+    assert temporenc.transcode_buffer(
+        buffer, 'D', validate=False) == b''.join(
+        temporenc.packb(value.date()) for value in values)
+    assert temporenc.transcode_buffer(b'') == b''
+
+    with pytest.raises(ValueError):
+        temporenc.transcode_buffer(buffer[:-1])
+    with pytest.raises(ValueError):
+        temporenc.transcode_buffer(buffer + temporenc.packb(
+            values[0], type='DTSZ', tz_offset=60, millisecond=0, hour=0))
+    with pytest.raises(ValueError):
+        temporenc.transcode_buffer(b'\xbb' * 10)
+
+
+def test_ordering_key():
+    import random
+
+    types = ['D', 'T', 'DT', 'DTZ', 'DTS', 'DTSZ']
+    precisions = ['ms', 'us', 'ns', None]
+    rng = random.Random(0)
+    values = set()
+    for _ in range(2000):
+        moment = temporenc.Moment.from_fields(
+            year=rng.randint(2000, 2001), month=rng.randint(1, 2),
+            day=rng.randint(1, 2), hour=rng.randint(0, 1),
+            minute=rng.randint(0, 1), second=rng.randint(0, 1),
+            nanosecond=rng.choice([0, 1000000, 1001000, 1001001]),
+            tz_offset=rng.choice([0, 60]))
+        values.add(moment.pack(rng.choice(types), rng.choice(precisions)))
+    values.add(temporenc.packb(year=2000))
+    values.add(temporenc.packb(hour=1, type='DTSZ'))
+
+    keys = [temporenc.ordering_key(value) for value in values]
+    assert all(len(key) == 10 for key in keys)
+    assert len(set(keys)) == len(values)
+    assert keys == [
+        temporenc.ordering_key(value, validate=False) for value in values]
+    for key, value in zip(keys, values):
+        assert temporenc.from_ordering_key(key) == value
+
+    # Keys sort like the Moment instances.
+    moments = [temporenc.unpackb(temporenc.from_ordering_key(key))
+               for key in sorted(keys)]
+    assert moments == sorted(moments)
+
+    with pytest.raises(ValueError):
+        temporenc.ordering_key(from_hex('47 bf 07 49 93 07 b2'))  # padding
+    with pytest.raises(ValueError):
+        temporenc.from_ordering_key(keys[0][:-1])
+
+    key = bytearray(temporenc.ordering_key(temporenc.packb(year=2000)))
+    for last in (0b11111, 0b00111, 0b00001):
+        # Invalid type, date in a T value, and precision in a D value
+        key[-1] = key[-1] & 0b11100000 | last
+        with pytest.raises(ValueError):
+            temporenc.from_ordering_key(bytes(key))
+    key = bytearray(temporenc.ordering_key(temporenc.packb(
+        year=2000, nanosecond=123456789, type='DTS')))
+    key[-1] = key[-1] & 0b11111100  # millisecond precision
+    with pytest.raises(ValueError):
+        temporenc.from_ordering_key(bytes(key))